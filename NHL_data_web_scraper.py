@@ -1,7 +1,38 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Comment
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlparse
 from urllib.request import urlopen
+import os
 import pandas as pd
+import random
 import re
+import threading
+import time
+
+BASE_URL = 'https://www.hockey-reference.com'
+
+# Range of seasons (by the year they end in) that can be scraped.
+FIRST_YEAR = 1917
+LAST_YEAR = 2021
+
+# Seconds to wait for a page before giving up on the request.
+TIMEOUT = 30
+
+# Number of times a failed request is retried, with exponential backoff (in seconds) and full jitter between tries.
+RETRIES = 4
+BACKOFF_BASE = 2
+BACKOFF_MAX = 60
+
+# HTTP status codes worth retrying (rate limiting and server errors). Other errors, such as 404, are permanent.
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# A host is not contacted for BREAKER_COOLDOWN seconds after BREAKER_THRESHOLD requests to it fail in a row.
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 120
+
+# Circuit breaker of each host: the number of failures in a row and the time until which the circuit is open.
+breakers = {}
+breakers_lock = threading.Lock()
 
 
 def main():
@@ -16,38 +47,110 @@ def main():
         try:
             year = int(input('Please enter the year to analyze the penalties: '))
 
-            if 1917 > year > 2021:
+            if year < FIRST_YEAR or year > LAST_YEAR:
                 raise ValueError
             valid_year = True
         except ValueError:
-            print('Please enter a number between 1917 and 2021.')
+            print('Please enter a number between ' + str(FIRST_YEAR) + ' and ' + str(LAST_YEAR) + '.')
 
-    df = extract_season_penalties('https://www.hockey-reference.com/leagues/NHL_' + str(year) + '_games.html')
+    dead_letter = []
+    df = extract_season_penalties(season_url(year), dead_letter)
     df.to_csv('penalties_' + str(year) + '.csv', encoding='utf-8')
+    save_dead_letter(year, dead_letter)
 
 
-def extract_season_penalties(url):
+def extract_season_penalties(url, dead_letter=None):
     """
-    Extract all the penalties from this season and return it as a pandas dataframe.
+    Extract all the penalties from this season and return it as a pandas dataframe. Games whose box score cannot be
+    downloaded or parsed are skipped and added to the dead-letter list, so one bad page does not stop the season.
 
     :param url: The hockey-reference URL containing all the games for the season of interest.
+    :param dead_letter: A list that failed games are appended to as (url, date, error) tuples (optional).
     :return: Return all the penalties from this season as a pandas dataframe.
     """
 
     # Open up the website with all the hockey games of interest (listed under "Date" column).
-    html = urlopen(url).read().decode('utf-8')
-    soup = BeautifulSoup(html, 'html.parser')
-
-    # Include regular season games and playoffs.
-    all_games = soup.find('table', id='games').select('a[href*=boxscores]')
-    all_games.extend(soup.find('table', id='games_playoffs').select('a[href*=boxscores]'))
+    all_games = parse_season_games(fetch(url))
 
     # Extract the penalty data for each game and save it in a list
     all_penalties = []
-    for link in all_games:
-        all_penalties.extend(
-            extract_game_penalties('https://www.hockey-reference.com' + link.get('href'), link.get_text()))
+    for href, date in all_games:
+        try:
+            all_penalties.extend(extract_game_penalties(urljoin(url, href), date))
+        except Exception as e:
+            print('Skipping ' + urljoin(url, href) + ' (' + repr(e) + ')')
+            if dead_letter is not None:
+                dead_letter.append((urljoin(url, href), date, repr(e)))
 
+    return penalties_data_frame(all_penalties)
+
+
+def save_dead_letter(year, dead_letter):
+    """
+    Saves the games that failed during a scrape as dead_letter_YYYY.csv so they can be retried later with
+    retry_dead_letter. Nothing is saved (and an old file is removed) if no game failed.
+
+    :param year: The year the season ends in.
+    :param dead_letter: A list of (url, date, error) tuples.
+    """
+    filename = 'dead_letter_' + str(year) + '.csv'
+    if dead_letter:
+        pd.DataFrame(dead_letter, columns=['URL', 'Date', 'Error']).to_csv(filename, encoding='utf-8', index=False)
+        print(str(len(dead_letter)) + ' games failed and were saved to ' + filename)
+    elif os.path.exists(filename):
+        os.remove(filename)
+
+
+def retry_dead_letter(year):
+    """
+    Retries the games in dead_letter_YYYY.csv and adds their penalties to penalties_YYYY.csv. Games that fail again
+    stay in the dead-letter file.
+
+    :param year: The year the season ends in.
+    """
+    failed = pd.read_csv('dead_letter_' + str(year) + '.csv', dtype=str)
+    penalties = pd.read_csv('penalties_' + str(year) + '.csv', index_col=0, dtype=str)
+
+    dead_letter = []
+    recovered = []
+    for url, date in zip(failed['URL'], failed['Date']):
+        try:
+            recovered.extend(extract_game_penalties(url, date))
+        except Exception as e:
+            dead_letter.append((url, date, repr(e)))
+
+    # Keep the penalties in date order (the order of the season page).
+    df = pd.concat([penalties, penalties_data_frame(recovered).astype(str)], ignore_index=True)
+    df = df.sort_values('Date', kind='mergesort').reset_index(drop=True)
+    df.to_csv('penalties_' + str(year) + '.csv', encoding='utf-8')
+    save_dead_letter(year, dead_letter)
+
+
+def parse_season_games(html):
+    """
+    Finds the box score links of every game (regular season and playoffs) on a hockey-reference season page.
+
+    :param html: The HTML of the page listing all the games of the season.
+    :return: A list of (box score path, date) tuples in the order they appear on the page.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Include regular season games and playoffs (there is no playoff table before the playoffs start).
+    all_games = find_table(soup, 'games').select('a[href*=boxscores]')
+    playoffs = find_table(soup, 'games_playoffs', required=False)
+    if playoffs is not None:
+        all_games.extend(playoffs.select('a[href*=boxscores]'))
+
+    return [(link.get('href'), link.get_text()) for link in all_games]
+
+
+def penalties_data_frame(all_penalties):
+    """
+    Puts the penalties of a season into the DataFrame saved as penalties_YYYY.csv.
+
+    :param all_penalties: A list of lists containing the penalties of every game.
+    :return: A pandas DataFrame of penalties.
+    """
     return pd.DataFrame(all_penalties, columns=['Date', 'Period', 'Time', 'Team', 'Player', 'Summary', 'Duration'])
 
 
@@ -60,12 +163,26 @@ def extract_game_penalties(url, date):
     :return: A list of lists containing the penalties for that game and which period they occurred in.
     """
 
-    # Extract the HTML from the page and create a BeautifulSoup objects.
-    html = urlopen(url).read().decode('utf-8')
+    return parse_game_penalties(fetch(url), date)
+
+
+def parse_game_penalties(html, date):
+    """
+    Extracts the penalty table from the HTML of a box score page.
+
+    :param html: The HTML of the box score page.
+    :param date: A String representing the date that the game occurred on in the form YYYY-MM-DD
+    :return: A list of lists containing the penalties for that game and which period they occurred in.
+    """
+
+    # Create a BeautifulSoup object from the page.
     soup = BeautifulSoup(html, 'html.parser')
 
-    # Get all the rows in the penalty tables (<tr> elements).
-    penalty_rows = soup.find('table', id='penalty').find_all('tr', recursive=False)
+    # Get all the rows in the penalty tables (<tr> elements). Box scores of games without penalties have no table.
+    table = find_table(soup, 'penalty', required=False)
+    if table is None:
+        return []
+    penalty_rows = table.find_all('tr', recursive=False)
     penalty_data = []
 
     # Extract the current period from the first row of the table. Make sure there are penalties first.
@@ -99,5 +216,106 @@ def extract_game_penalties(url, date):
     return penalty_data
 
 
+def season_url(year, base_url=BASE_URL):
+    """
+    Returns the URL of the hockey-reference page listing all the games of a season.
+
+    :param year: The year the season ends in (YYYY).
+    :param base_url: The address of hockey-reference (or of a local server replaying its pages).
+    :return: The URL of the season page.
+    """
+    return base_url + '/leagues/NHL_' + str(year) + '_games.html'
+
+
+def find_table(soup, table_id, required=True):
+    """
+    Finds a table by its id. hockey-reference.com ships some tables inside HTML comments (they are uncommented by
+    JavaScript), so the comments are searched as well.
+
+    :param soup: The BeautifulSoup object of the page.
+    :param table_id: The id of the table.
+    :param required: Whether a missing table is an error.
+    :return: The table element (None if it is missing and not required).
+    """
+    table = soup.find('table', id=table_id)
+    if table is None:
+        for comment in soup.find_all(string=lambda text: isinstance(text, Comment) and table_id in text):
+            table = BeautifulSoup(comment, 'html.parser').find('table', id=table_id)
+            if table is not None:
+                break
+
+    if table is None and required:
+        raise ValueError('No table with id "' + table_id + '" on the page')
+    return table
+
+
+def fetch(url, wait=None):
+    """
+    Downloads a page. Timeouts, connection errors, rate limiting and server errors are retried with exponential backoff
+    and full jitter. Each host has a circuit breaker: once too many requests to it fail in a row with one of these
+    transient errors, requests to it fail immediately until the cooldown is over instead of piling up on a host that is
+    down. Other HTTP errors (e.g., a missing page) are raised at once and do not count as failures.
+
+    :param url: The URL of the page.
+    :param wait: A function called before every attempt (e.g., to wait for a shared request budget).
+    :return: The HTML of the page as a string.
+    """
+    host = urlparse(url).netloc
+
+    for attempt in range(RETRIES + 1):
+        check_breaker(host)
+        if wait is not None:
+            wait()
+
+        try:
+            html = urlopen(url, timeout=TIMEOUT).read().decode('utf-8')
+            record_result(host, True)
+            return html
+        except HTTPError as e:
+
+            # Only transient errors count toward the breaker: a permanent error (e.g., 404) means the host answered.
+            record_result(host, e.code not in RETRY_STATUS_CODES)
+            if e.code not in RETRY_STATUS_CODES or attempt == RETRIES:
+                raise
+        except (URLError, TimeoutError, ConnectionError):
+            record_result(host, False)
+            if attempt == RETRIES:
+                raise
+
+        time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+
+def check_breaker(host):
+    """
+    Raises an error if the circuit breaker of a host is open.
+
+    :param host: The host of the request.
+    """
+    with breakers_lock:
+        breaker = breakers.get(host)
+        if breaker is not None and breaker['open until'] > time.monotonic():
+            raise ConnectionError('Circuit breaker open for ' + host)
+
+
+def record_result(host, success):
+    """
+    Updates the circuit breaker of a host after a request. The circuit opens after BREAKER_THRESHOLD failures in a row
+    and any success closes it.
+
+    :param host: The host of the request.
+    :param success: Whether the request succeeded.
+    """
+    with breakers_lock:
+        breaker = breakers.setdefault(host, {'failures': 0, 'open until': 0})
+        if success:
+            breaker['failures'] = 0
+            return
+
+        breaker['failures'] += 1
+        if breaker['failures'] >= BREAKER_THRESHOLD:
+            breaker['open until'] = time.monotonic() + BREAKER_COOLDOWN
+            breaker['failures'] = 0
+
+
 if __name__ == "__main__":
     main()
@@ -1,6 +1,10 @@
 import pandas as pd
 import numpy as np
 
+import game_query
+import moneypuck_schema
+import report_pipeline
+
 NUM_TEAMS = 31
 NUM_SEASON_YEARS = 10
 
@@ -17,11 +21,10 @@ def main():
                      ['penalityMinutesFor'], ['penaltiesFor'], ['reboundsFor']]
     save_names = ['High Danger Shots', 'Low Danger Shots', 'Low and High Danger Shots', 'Penalty Minutes',
                   'Total Penalties', 'Rebounds']
-    save_data(variable_sets, save_names, True)
-    save_data(variable_sets, save_names, False)
+    report_pipeline.run([workbook(variable_sets, save_names, True), workbook(variable_sets, save_names, False)])
 
 
-def save_data(variable_sets, save_names, by_team):
+def save_data(variable_sets, save_names, by_team, chunksize=None, processes=None):
     """
     Saves data in an Excel file about the sets of variables passed in where each set is in a separate sheet. Each sheet
     is organized by team if by_team is True, otherwise it is organized by year.
@@ -29,62 +32,93 @@ def save_data(variable_sets, save_names, by_team):
     :param variable_sets: List of lists containing the variable sets
     :param save_names: List of Strings containing the names of the variable sets (parallel to variable_sets)
     :param by_team: Boolean indicating whether the data within each sheet should be organized by team or by year.
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file for each total).
+    :param processes: The number of worker processes (None uses one per CPU).
+    """
+    report_pipeline.run([workbook(variable_sets, save_names, by_team, chunksize)], processes)
+
+
+def workbook(variable_sets, save_names, by_team, chunksize=None):
+    """
+    Returns the workbook produced by save_data for report_pipeline.
+
+    :param variable_sets: List of lists containing the variable sets
+    :param save_names: List of Strings containing the names of the variable sets (parallel to variable_sets)
+    :param by_team: Boolean indicating whether the data within each sheet should be organized by team or by year.
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file for each total).
+    :return: A tuple containing the filename and a list of (sheet name, function, arguments) tuples.
     """
     name = 'Team' if by_team else 'Year'
-    writer = pd.ExcelWriter('Produced Totals By ' + name + '.xlsx')
-    for i in range(0, len(variable_sets)):
-        if by_team:
-            collected_data = collect_var_data_by_team(variable_sets[i])
-            df = pd.DataFrame(collected_data, columns=['Team', 'Year', 'Totals'])
-        else:
-            collected_data = collect_var_data_by_year(variable_sets[i])
-            df = pd.DataFrame(collected_data, columns=['Year', 'Team', 'Totals'])
-        df.to_excel(writer, sheet_name=save_names[i])
-    writer.save()
+    sheets = [(save_names[i], totals_sheet, (variable_sets[i], by_team, chunksize))
+              for i in range(0, len(variable_sets))]
+    return 'Produced Totals By ' + name + '.xlsx', sheets
 
 
-def collect_var_data_by_team(variables):
+def totals_sheet(variables, by_team, chunksize=None):
+    """
+    Produces the sheet of a variable set in the workbook of save_data.
+
+    :param variables: A list containing the variables to be analyzed.
+    :param by_team: Boolean indicating whether the data should be organized by team or by year.
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file for each total).
+    :return: The sheet as a DataFrame.
+    """
+    if by_team:
+        collected_data = collect_var_data_by_team(variables, chunksize)
+        return pd.DataFrame(collected_data, columns=['Team', 'Year', 'Totals'])
+    collected_data = collect_var_data_by_year(variables, chunksize)
+    return pd.DataFrame(collected_data, columns=['Year', 'Team', 'Totals'])
+
+
+def collect_var_data_by_team(variables, chunksize=None):
     """
     Returns a list of lists, where the first column contains the team name, the second column contains the year, and
     the third column contains the totals for the variables.
 
     :param variables: A list containing the variables to be analyzed.
+    :param chunksize: The number of rows of all_teams.csv read at a time. If specified, the totals of every team-season
+    are aggregated in a single streaming pass instead of reading the file for each total.
     :return: A list of lists containing the aggregated data.
     """
     collected_data = []
+    totals = season_totals(variables, chunksize) if chunksize is not None else None
 
     for team in teams:
         for year in range(2008, 2008 + NUM_SEASON_YEARS):
             print(team + ' ' + str(year))
-            total = total_var(team, year, variables)
+            total = total_var(team, year, variables) if chunksize is None else lookup_total(totals, team, year)
             collected_data.append([team, year, total])
     return collected_data
 
 
-def collect_var_data_by_year(variables):
+def collect_var_data_by_year(variables, chunksize=None):
     """
     Returns a list of lists, where the first column contains the year, the second column contains the team name, and
     the third column contains the totals for the variables.
 
     :param variables: A list containing the variables to be analyzed.
+    :param chunksize: The number of rows of all_teams.csv read at a time. If specified, the totals of every team-season
+    are aggregated in a single streaming pass instead of reading the file for each total.
     :return: A list of lists containing the aggregated data.
     """
     collected_data = []
+    totals = season_totals(variables, chunksize) if chunksize is not None else None
     for year in range(2008, 2008 + NUM_SEASON_YEARS):
         for team in teams:
             print(team + ' ' + str(year))
-            total = total_var(team, year, variables)
+            total = total_var(team, year, variables) if chunksize is None else lookup_total(totals, team, year)
             collected_data.append([year, team, total])
     return collected_data
 
 
-def total_var(team, year, variables):
+def total_var(team, year, variables, chunksize=None):
     """
     Returns the total count for the specified variable(s) during the specified year for the specified team.
 
     :param team: A string of the three-letter team name.
     :param year: An int of the year being analyzed. Must be between 2008 and 2017.
     :param variables: A list of strings with the variables being summed
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file at once).
     :return: An integer sum of the counts for this variable during this season. -1 if invalid variable(s), team, or year
     """
 
@@ -94,21 +128,54 @@ def total_var(team, year, variables):
 
     # Handles invalid variable names.
     try:
-        df = pd.read_csv(filepath_or_buffer='all_teams.csv', delimiter=',', header=0,
-                         usecols=['team', 'season', 'situation', 'playoffGame'].append(variables))
-
         # Extract all non-playoff games that this team played in during the specified year.
-        df = df[
-            np.logical_and(np.logical_and(np.logical_and(df.team == team, df.situation == 'all'), df.playoffGame == 0),
-                           df.season == year)]
-        df = df[variables]
+        query = game_query.GameQuery('all_teams.csv').select(*variables)
+        df = query.team(team).season(year).situation('all').regular_season().rows(chunksize)[variables]
 
         total = 0
         for var in variables:
             total += df[var].sum()
         return total
-    except KeyError:
+    except (KeyError, ValueError):
+        return -1
+
+
+def season_totals(variables, chunksize=moneypuck_schema.CHUNK_SIZE):
+    """
+    Streams all_teams.csv in chunks and returns the regular season total of the specified variable(s) for every
+    team-season. The partial totals of each chunk are combined per (team, season), so only one chunk of the file is in
+    memory at once.
+
+    :param variables: A list of strings with the variables being summed.
+    :param chunksize: The number of rows of all_teams.csv read at a time.
+    :return: A pandas Series of totals indexed by (team, season). None if invalid variable(s).
+    """
+
+    def aggregate(df):
+        df = df[np.logical_and(df.situation == 'all', df.playoffGame == 0)]
+        return df[variables].astype('float64').groupby([df.team.astype(str), df.season.astype('int64')]).sum()
+
+    # Handles invalid variable names.
+    try:
+        totals = moneypuck_schema.aggregate_chunks('all_teams.csv', ['team', 'season', 'situation', 'playoffGame'] +
+                                                   variables, aggregate, chunksize)
+    except (KeyError, ValueError):
+        return None
+    return totals.sum(axis=1)
+
+
+def lookup_total(totals, team, year):
+    """
+    Returns the total for the specified team and year from the totals produced by season_totals.
+
+    :param totals: A pandas Series of totals indexed by (team, season), or None if the variables were invalid.
+    :param team: A string of the three-letter team name.
+    :param year: An int of the year being analyzed. Must be between 2008 and 2017.
+    :return: The total for this team during this season. -1 if invalid variable(s), team, or year.
+    """
+    if totals is None or team not in teams or year < 2008 or year > 2017:
         return -1
+    return totals.get((team, year), 0)
 
 
 if __name__ == "__main__":
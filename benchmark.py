@@ -0,0 +1,226 @@
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import NHL_data_web_scraper as scraper
+import moneypuck_schema
+import scrape_orchestrator
+import scraper_fixtures
+import weight_fitting
+import weight_sweep
+import window_kernels
+
+teams = ['ANA', 'ARI', 'BOS', 'BUF', 'CAR', 'CBJ', 'CGY', 'CHI', 'COL', 'DAL', 'DET', 'EDM', 'FLA', 'L.A', 'MIN', 'MTL',
+         'N.J', 'NSH', 'NYI', 'NYR', 'OTT', 'PHI', 'PIT', 'S.J', 'STL', 'T.B', 'TOR', 'VAN', 'VGK', 'WPG', 'WSH']
+
+# Number of times each benchmark is run (the best time is reported).
+REPEAT = 5
+
+# Modules whose import cost is measured (each one in a new interpreter).
+STARTUP_MODULES = ['lookup', 'result_cache', 'produce_team_record', 'single_var_hypothesis_tests',
+                   'save_hypothesis_tests', 'NHL_data_web_scraper', 'pandas', 'numpy', 'colorama', 'bs4']
+
+# Average seconds the replay server delays each page (roughly a round trip to hockey-reference.com), and the numbers
+# of concurrent workers the scraper is measured with.
+SCRAPER_LATENCY = 0.05
+SCRAPER_WORKERS = [1, 4, 16]
+
+
+def main():
+    """
+    Runs every benchmark on the team files (and the scraper fixture archive, if any) in the current directory.
+    """
+    filepaths = [team + '.csv' for team in teams if os.path.exists(team + '.csv')]
+    benchmark_startup(STARTUP_MODULES)
+    benchmark_window_kernels(filepaths)
+    benchmark_weight_fitting(filepaths)
+    if os.path.exists(scraper_fixtures.FIXTURE_ARCHIVE):
+        benchmark_scraper(scraper_fixtures.FIXTURE_ARCHIVE)
+
+
+def best_time(f, repeat=REPEAT):
+    """
+    Returns the best wall-clock time of several runs of a function.
+
+    :param f: A function with no arguments.
+    :param repeat: The number of runs.
+    :return: A tuple containing the best time in seconds and the result of the last run.
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_startup(modules):
+    """
+    Measures the import cost of each module in a new interpreter (so nothing is imported yet), and the total time of a
+    lookup.py query answered from the results store (if all_teams.csv is in the current directory).
+
+    :param modules: A list of module names.
+    :return: A dictionary mapping each module name (and 'lookup.py query') to its best time in seconds.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = 'import sys, time; sys.path.insert(0, {!r}); start = time.perf_counter(); import {}; ' \
+           'print(time.perf_counter() - start)'
+
+    print('Import cost:')
+    times = {}
+    for module in modules:
+        try:
+            runs = [float(subprocess.run([sys.executable, '-c', code.format(here, module)], capture_output=True,
+                                         text=True, check=True).stdout) for _ in range(REPEAT)]
+        except subprocess.CalledProcessError:
+            print('  ' + module + ': not installed')
+            continue
+        times[module] = min(runs)
+        print('  ' + module + ': ' + str(round(times[module] * 1000, 1)) + ' ms')
+
+    if os.path.exists('all_teams.csv'):
+        command = [sys.executable, os.path.join(here, 'lookup.py'), 'wins', 'BOS', '2010']
+
+        # The first run stores the result if it is not stored yet.
+        subprocess.run(command, capture_output=True, check=True)
+        times['lookup.py query'] = best_time(lambda: subprocess.run(command, capture_output=True, check=True))[0]
+        interpreter = best_time(lambda: subprocess.run([sys.executable, '-c', 'pass'], check=True))[0]
+        print('  lookup.py query: ' + str(round(times['lookup.py query'] * 1000, 1)) + ' ms (interpreter alone: ' +
+              str(round(interpreter * 1000, 1)) + ' ms)')
+    return times
+
+
+def benchmark_window_kernels(filepaths):
+    """
+    Times the window_majority kernels over every team-season of the league history (the medium/high danger and low
+    danger windows of last_five_med_high_low_danger): the original pure Python loop, the NumPy kernel and, if Numba is
+    installed, the compiled kernel. Also checks that every kernel gives exactly the same predictions.
+
+    :param filepaths: A list of paths to team CSV files from MoneyPuck.
+    :return: A dictionary mapping each kernel name to its best time in seconds.
+    """
+    columns = ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor', 'mediumDangerShotsAgainst',
+               'highDangerShotsFor', 'highDangerShotsAgainst', 'lowDangerShotsFor', 'lowDangerShotsAgainst']
+
+    # Load every team-season once so that only the kernels are timed.
+    seasons = []
+    for filepath in filepaths:
+        df = moneypuck_schema.read_moneypuck(filepath, columns)
+        df = df[df.situation == 'all']
+        for season in pd.unique(df.season):
+            games = df[df.season == season]
+            mh_for = games.mediumDangerShotsFor + games.highDangerShotsFor
+            mh_against = games.mediumDangerShotsAgainst + games.highDangerShotsAgainst
+            seasons.append((games.goalsFor.to_numpy(), games.goalsAgainst.to_numpy(),
+                            np.logical_and(mh_for > mh_against,
+                                           games.lowDangerShotsFor < games.lowDangerShotsAgainst).to_numpy(),
+                            np.logical_and(mh_for < mh_against,
+                                           games.lowDangerShotsFor > games.lowDangerShotsAgainst).to_numpy()))
+
+    kernels = {'Python loop': window_kernels.loop_majority_kernel, 'NumPy': window_kernels.numpy_majority_kernel}
+    if window_kernels.numba is not None and seasons:
+
+        # Compile the kernel before timing it.
+        start = time.perf_counter()
+        window_kernels.compiled_majority_kernel(*seasons[0])
+        print('Numba compilation: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+        kernels['Numba'] = window_kernels.compiled_majority_kernel
+
+    print('Window kernels (' + str(len(seasons)) + ' team-seasons):')
+    times = {}
+    expected = None
+    for name, kernel in kernels.items():
+        times[name], results = best_time(lambda: [kernel(*season) for season in seasons])
+        if expected is None:
+            expected = results
+        elif any(not np.array_equal(a, b) for a, b in zip(expected, results)):
+            raise AssertionError(name + ' kernel does not match the Python loop')
+        print('  ' + name + ': ' + str(round(times[name] * 1000, 2)) + ' ms (' +
+              str(round(times['Python loop'] / times[name], 1)) + 'x)')
+    return times
+
+
+def benchmark_weight_fitting(filepaths):
+    """
+    Times the grid sweeps of calculate_weights for the medium/high and low danger shots formula (100 values of each
+    weight with the other held at 1) against fitting both weights at once with weight_fitting, and compares the best
+    accuracy each finds over all team-seasons together.
+
+    :param filepaths: A list of paths to team CSV files from MoneyPuck.
+    :return: A dictionary mapping each method to its best time in seconds.
+    """
+    grids = np.vstack([weight_sweep.weight_grid(0), weight_sweep.weight_grid(1)])
+    games = np.array([stop - start - 5 for _, _, start, stop in weight_sweep.load_games(filepaths)[1]])
+
+    times = {}
+    times['Grid sweep'], results = best_time(lambda: weight_sweep.sweep(filepaths, 'med_high_low_danger', grids), 1)
+    # The fit uses the same windows as the swept formula (ending with the predicted game), so both accuracies compare.
+    times['Fit'], weights = best_time(lambda: weight_fitting.fit(
+        weight_fitting.load_samples(filepaths, weight_fitting.FORMULA_VARIABLES, include_game=True)))
+
+    # Accuracies of the sweep are per team-season, so they are weighted by the number of games of each team-season.
+    counted = games > 0
+    grid_accuracy = np.nanmax(results.to_numpy()[counted].T @ games[counted] / games[counted].sum())
+    fit_accuracy = weight_fitting.accuracy(weight_fitting.load_samples(filepaths, weight_fitting.FORMULA_VARIABLES,
+                                                                       include_game=True), weights)
+
+    print('Weight fitting (' + str(len(grids)) + ' grid points):')
+    print('  Grid sweep: ' + str(round(times['Grid sweep'], 3)) + ' s, best accuracy ' + str(round(grid_accuracy, 4)))
+    print('  Fit: ' + str(round(times['Fit'], 3)) + ' s (' + str(round(times['Grid sweep'] / times['Fit'], 1)) +
+          'x), accuracy ' + str(round(fit_accuracy, 4)))
+    return times
+
+
+def benchmark_scraper(archive, latency=SCRAPER_LATENCY, workers=SCRAPER_WORKERS):
+    """
+    Measures the end-to-end throughput (games per second) of the scraper on the seasons of a fixture archive replayed
+    by a local server, so no network is needed: the serial extract_season_penalties and scrape_orchestrator with each
+    number of workers (without a request budget). Also checks that every run finds exactly the same penalties.
+
+    :param archive: The path to a fixture archive recorded by scraper_fixtures.
+    :param latency: The average seconds the server delays each page.
+    :param workers: A list of numbers of concurrent workers.
+    :return: A dictionary mapping each run to its games per second.
+    """
+    server, base_url = scraper_fixtures.serve(archive, latency=latency)
+    try:
+        years = sorted(year for year in range(scraper.FIRST_YEAR, scraper.LAST_YEAR + 1)
+                       if scraper_fixtures.page_path(scraper.season_url(year)) in server.pages)
+        games = sum(len(scraper.parse_season_games(server.pages[scraper_fixtures.page_path(scraper.season_url(year))]
+                                                   .decode('utf-8'))) for year in years)
+
+        runs = {'Serial': lambda: [scraper.extract_season_penalties(scraper.season_url(year, base_url))
+                                   for year in years]}
+        for n in workers:
+            runs[str(n) + ' workers'] = lambda n=n: list(scrape_orchestrator.scrape_seasons(
+                years, base_url, workers=n, requests_per_minute=float('inf'), save=False).values())
+
+        throughput = {}
+        expected = None
+        for name, run in runs.items():
+            seconds, frames = best_time(run, 1)
+            if expected is None:
+                expected = frames
+            elif any(not a.equals(b) for a, b in zip(expected, frames)):
+                raise AssertionError(name + ' does not find the same penalties as the serial scraper')
+            throughput[name] = games / seconds
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print('Scraper (' + str(games) + ' games in ' + str(len(years)) + ' seasons, ' + str(round(latency * 1000)) +
+          ' ms latency):')
+    for name in throughput:
+        print('  ' + name + ': ' + str(round(throughput[name], 1)) + ' games/s (' +
+              str(round(throughput[name] / throughput['Serial'], 1)) + 'x)')
+    return throughput
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,32 @@
 import pandas as pd
 import numpy as np
+import glob
 import os
 from colorama import Fore, Style
 
+import feature_matrix
+import penalty_features
+import result_cache
+
 # Does not include "exit".
-TOTAL_OPTIONS = 5
+TOTAL_OPTIONS = 6
+
+# Default answer of the menu's search prompt: True searches each weight adaptively (coarse scan, then zooming in on
+# the best intervals) instead of evaluating the fixed grid of 100 weights from 0.05 to 5.
+ADAPTIVE_SEARCH = False
+
+# Range of weights searched, number of weights in the coarse scan, number of best intervals refined in each round of
+# the adaptive search, and the interval width it stops at (finer than the 0.05 steps of the grid).
+WEIGHT_RANGE = (0.05, 5.0)
+COARSE_POINTS = 11
+TOP_INTERVALS = 3
+TOLERANCE = 0.01
+
+# Number of weights evaluated by the fixed grid.
+GRID_POINTS = 100
+
+# Formulas that read penalty features, so their cached results also depend on the scraped penalty files.
+PENALTY_FORMULAS = ['last_five_med_high_danger_power_play_formula']
 
 
 def main():
@@ -58,63 +80,57 @@ def main():
                     print(Fore.RED + 'Please enter a year between 2008 and 2017.\n')
                     print(Style.RESET_ALL)
 
-            if choice == 1:
+            # Obtain the search mode from the user.
+            adaptive = get_search_mode()
 
-                p_results = [0] * 100
+            if choice == 1:
 
                 # Parametric analysis changing the weight on medium/high danger shots.
-                for weight in range(5, 505, 5):
-                    mh_weight = weight / 100.0
-                    p_results[int(weight / 5 - 1)] = last_five_med_high_low_danger_formula(filepath, season, mh_weight, 1)
+                results = sweep_weight(last_five_med_high_low_danger_formula, filepath, season, 0, 2, adaptive)
 
                 # Write the results to an Excel file.
                 writer = pd.ExcelWriter('Medium High Danger Weights.xlsx')
-                results = pd.Series(p_results)
                 results.to_excel(writer, sheet_name=filepath[:-4])
                 writer.save()
 
             elif choice == 2:
 
-                p_results = [0] * 100
-
                 # Parametric analysis changing the weight on low danger shots.
-                for weight in range(5, 505, 5):
-                    l_weight = weight / 100.0
-                    p_results[int(weight / 5 - 1)] = last_five_med_high_low_danger_formula(filepath, season, 1, l_weight)
+                results = sweep_weight(last_five_med_high_low_danger_formula, filepath, season, 1, 2, adaptive)
 
                 # Write the results to an Excel file.
                 writer = pd.ExcelWriter('Low Danger Weights.xlsx')
-                results = pd.Series(p_results)
                 results.to_excel(writer, sheet_name=filepath[:-4])
                 writer.save()
 
             elif choice == 3:
 
-                p_results = [0] * 100
-
                 # Parametric analysis changing the weight on penalty minutes.
-                for weight in range(5, 505, 5):
-                    mh_weight = weight / 100.0
-                    p_results[int(weight / 5 - 1)] = last_five_med_high_danger_penalty_minutes_formula(filepath, season, mh_weight, 1)
+                results = sweep_weight(last_five_med_high_danger_penalty_minutes_formula, filepath, season, 0, 2,
+                                       adaptive)
 
                 # Write the results to an Excel file.
                 writer = pd.ExcelWriter('Penalty Minutes Weights.xlsx')
-                results = pd.Series(p_results)
                 results.to_excel(writer, sheet_name=filepath[:-4])
                 writer.save()
 
             elif choice == 4:
-                p_results = [0] * 100
-
                 # Parametric analysis changing the weight on penalty minutes.
-                for weight in range(5, 505, 5):
-                    s_weight = weight / 100.0
-                    p_results[int(weight / 5 - 1)] = last_five_med_high_danger_shots_on_goal_formula(filepath, season,
-                                                                                                       s_weight)
+                results = sweep_weight(last_five_med_high_danger_shots_on_goal_formula, filepath, season, 0, 1,
+                                       adaptive)
 
                 # Write the results to an Excel file.
                 writer = pd.ExcelWriter('Shots On Goal Weights.xlsx')
-                results = pd.Series(p_results)
+                results.to_excel(writer, sheet_name=filepath[:-4])
+                writer.save()
+
+            elif choice == 5:
+
+                # Parametric analysis changing the weight on power play time.
+                results = sweep_weight(last_five_med_high_danger_power_play_formula, filepath, season, 1, 2, adaptive)
+
+                # Write the results to an Excel file.
+                writer = pd.ExcelWriter('Power Play Weights.xlsx')
                 results.to_excel(writer, sheet_name=filepath[:-4])
                 writer.save()
 
@@ -123,6 +139,93 @@ def main():
         print()
 
 
+def sweep_weight(formula, filepath, season_year, varying, num_weights, adaptive=ADAPTIVE_SEARCH):
+    """
+    Evaluates one of the formula functions while one of its weights varies and the others are held at 1, either on the
+    fixed grid of weights or with the adaptive search.
+
+    :param formula: One of the formula functions below.
+    :param filepath: The filepath to the team that is being analyzed.
+    :param season_year: The season to be analyzed.
+    :param varying: The index of the weight that varies.
+    :param num_weights: The number of weights of the formula.
+    :param adaptive: A boolean indicating whether the weight is searched adaptively (see adaptive_search).
+    :return: A Series of the percentage of wins/losses accurately predicted (indexed by position on the grid, or by
+    weight for the adaptive search).
+    """
+    def evaluate(weight):
+        weights = [1] * num_weights
+        weights[varying] = weight
+        return cached_formula(formula, filepath, season_year, *weights)
+
+    if adaptive:
+        results = adaptive_search(evaluate)
+        best = results.idxmax()
+        print('Best weight: ' + str(round(best, 4)) + ' (' + str(round(results[best], 4)) + ') after ' +
+              str(results.size) + ' evaluations (the grid takes ' + str(GRID_POINTS) + ')')
+        return results
+
+    return pd.Series([evaluate(weight / 100.0) for weight in range(5, 5 * GRID_POINTS + 5, 5)])
+
+
+def adaptive_search(evaluate, weight_range=WEIGHT_RANGE, coarse_points=COARSE_POINTS, top_intervals=TOP_INTERVALS,
+                    tolerance=TOLERANCE):
+    """
+    Searches for the weight with the best accuracy from coarse to fine. Evenly spaced weights are evaluated first. Each
+    round then ranks the intervals between neighbouring evaluated weights by the accuracy of their better end (then of
+    their other end) and evaluates the midpoint of each of the best intervals that is still wider than the tolerance.
+    Refining several intervals keeps the search from locking onto one local peak, since the accuracy is a step function
+    of the weight. The search stops when all of the best intervals are narrower than the tolerance.
+
+    :param evaluate: A function taking a weight and returning the percentage of wins/losses accurately predicted.
+    :param weight_range: A tuple containing the smallest and largest weights searched.
+    :param coarse_points: The number of evenly spaced weights evaluated first.
+    :param top_intervals: The number of best intervals refined in each round.
+    :param tolerance: The interval width below which an interval is not refined any further.
+    :return: A Series of the percentage of wins/losses accurately predicted, indexed by every weight evaluated (sorted).
+    The number of evaluations is its size.
+    """
+    results = {float(weight): evaluate(float(weight))
+               for weight in np.linspace(weight_range[0], weight_range[1], coarse_points)}
+
+    while True:
+        weights = sorted(results)
+        intervals = [(weights[i], weights[i + 1]) for i in range(len(weights) - 1)]
+
+        # The best intervals (the ones with smaller weights first if several are equally good).
+        ranked = sorted(intervals, key=lambda interval: (-max(results[interval[0]], results[interval[1]]),
+                                                         -min(results[interval[0]], results[interval[1]])))
+        wide = [interval for interval in ranked[:top_intervals] if interval[1] - interval[0] >= tolerance]
+        if not wide:
+            break
+
+        for low, high in wide:
+            midpoint = (low + high) / 2
+            results[midpoint] = evaluate(midpoint)
+
+    return pd.Series(results).sort_index()
+
+
+def cached_formula(formula, filepath, season_year, *weights):
+    """
+    Returns the percentage of games predicted correctly by one of the formula functions, or its stored value if the
+    formula was already evaluated with the same weights on the same data (including the penalty files for
+    PENALTY_FORMULAS).
+
+    :param formula: One of the formula functions below.
+    :param filepath: The filepath to the team that is being analyzed.
+    :param season_year: The season to be analyzed.
+    :param weights: The weights passed to the formula function.
+    :return p: The percentage of wins/losses that were accurately predicted using the formula.
+    """
+    files = [filepath]
+    if formula.__name__ in PENALTY_FORMULAS:
+        files += sorted(glob.glob(penalty_features.PENALTY_FILES))
+
+    return result_cache.cached(formula.__name__, {'season': season_year, 'weights': weights}, files,
+                               lambda: formula(filepath, season_year, *weights), ['calculate_weights'])
+
+
 def last_five_med_high_low_danger_formula(filepath, season_year, mh_weight, l_weight):
     """
     Calculate the percentage of winning games in the given season (except the first five games) that abide by a
@@ -137,14 +240,14 @@ def last_five_med_high_low_danger_formula(filepath, season_year, mh_weight, l_we
     """
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'mediumDangerShotsAgainst', 'highDangerShotsFor', 'highDangerShotsAgainst',
-                                 'lowDangerShotsFor', 'lowDangerShotsAgainst'],
-                      season_year)
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst', 'mediumHighDangerShotsFor',
+                                                    'mediumHighDangerShotsAgainst',
+                                                    'lowDangerShotsFor', 'lowDangerShotsAgainst'],
+                                         season_year)
 
     # Calculate prefix sums for medium/high danger shots (for and against) and low danger shots (for and against).
-    for_team = mh_weight * (df['mediumDangerShotsFor'] + df['highDangerShotsFor']) - l_weight * df['lowDangerShotsFor']
-    against_team = mh_weight * (df['mediumDangerShotsAgainst'] + df['highDangerShotsAgainst']) - l_weight * df['lowDangerShotsAgainst']
+    for_team = mh_weight * df['mediumHighDangerShotsFor'] - l_weight * df['lowDangerShotsFor']
+    against_team = mh_weight * df['mediumHighDangerShotsAgainst'] - l_weight * df['lowDangerShotsAgainst']
 
     fteam = np.cumsum(for_team)
     ateam = np.cumsum(against_team)
@@ -179,14 +282,14 @@ def last_five_med_high_danger_penalty_minutes_formula(filepath, season_year, mh_
     """
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'mediumDangerShotsAgainst', 'highDangerShotsFor', 'highDangerShotsAgainst',
-                                 'penalityMinutesFor', 'penalityMinutesAgainst'],
-                      season_year)
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst', 'mediumHighDangerShotsFor',
+                                                    'mediumHighDangerShotsAgainst',
+                                                    'penalityMinutesFor', 'penalityMinutesAgainst'],
+                                         season_year)
 
     # Calculate prefix sums for medium/high danger shots (for and against) and low danger shots (for and against).
-    for_team = mh_weight * (df['mediumDangerShotsFor'] + df['highDangerShotsFor']) * df['penalityMinutesFor'] / (p_weight * (df['penalityMinutesFor'] + 1) ** 2)
-    against_team = mh_weight * (df['mediumDangerShotsAgainst'] + df['highDangerShotsAgainst']) * df['penalityMinutesAgainst']  / (p_weight * (df['penalityMinutesAgainst'] + 1) ** 2)
+    for_team = mh_weight * df['mediumHighDangerShotsFor'] * df['penalityMinutesFor'] / (p_weight * (df['penalityMinutesFor'] + 1.0) ** 2)
+    against_team = mh_weight * df['mediumHighDangerShotsAgainst'] * df['penalityMinutesAgainst']  / (p_weight * (df['penalityMinutesAgainst'] + 1.0) ** 2)
 
     fteam = np.cumsum(for_team)
     ateam = np.cumsum(against_team)
@@ -220,14 +323,14 @@ def last_five_med_high_danger_shots_on_goal_formula(filepath, season_year, s_wei
     """
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'mediumDangerShotsAgainst', 'highDangerShotsFor', 'highDangerShotsAgainst',
-                                 'shotsOnGoalFor', 'shotsOnGoalAgainst'],
-                      season_year)
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst', 'mediumHighDangerShotsFor',
+                                                    'mediumHighDangerShotsAgainst',
+                                                    'shotsOnGoalFor', 'shotsOnGoalAgainst'],
+                                         season_year)
 
     # Calculate prefix sums for medium/high danger shots (for and against) and low danger shots (for and against).
-    for_team = (df['mediumDangerShotsFor'] + df['highDangerShotsFor']) - s_weight * df['shotsOnGoalFor']
-    against_team = (df['mediumDangerShotsAgainst'] + df['highDangerShotsAgainst']) - s_weight * df['shotsOnGoalAgainst']
+    for_team = df['mediumHighDangerShotsFor'] - s_weight * df['shotsOnGoalFor']
+    against_team = df['mediumHighDangerShotsAgainst'] - s_weight * df['shotsOnGoalAgainst']
 
     fteam = np.cumsum(for_team)
     ateam = np.cumsum(against_team)
@@ -248,24 +351,48 @@ def last_five_med_high_danger_shots_on_goal_formula(filepath, season_year, s_wei
     return p / n
 
 
-def extract_data(filepath, columns, season_year):
+def last_five_med_high_danger_power_play_formula(filepath, season_year, mh_weight, pp_weight):
     """
-    Extract the relevant data from the CSV file. Games are indexed by their ID automatically (do not pass in as column).
+    Calculate the percentage of winning games in the given season (except the first five games) that abide by a
+    formula involving medium and high danger shots and power play time scraped from hockey-reference.com (see
+    penalty_features): (medium danger shots + high danger shots) * (mh_weight) + (power play minutes) * (pp_weight).
+    Games on dates without scraped penalties count as having no power play time.
 
-    :param filepath: The path that contains the hockey data.
-    :param columns: The column names that should be included.
-    :param season_year: The season to be included.
-    :return: A DataFrame containing only the relevant rows and columns.
+    :param filepath: The filepath to the team that is being analyzed.
+    :param season_year: The season to be analyzed.
+    :param mh_weight: The weight on the medium/high danger shots in the formula.
+    :param pp_weight: The weight on the power play minutes in the formula.
+    :return p: The percentage of wins/losses that were accurately predicted using our formula.
     """
 
-    # Extract relevant columns.
-    df = pd.read_csv(filepath_or_buffer=filepath, delimiter=',', header=0, usecols=columns.append('gameId'))
+    # Extract the relevant data.
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst', 'mediumHighDangerShotsFor',
+                                                    'mediumHighDangerShotsAgainst',
+                                                    'powerPlaySecondsFor', 'powerPlaySecondsAgainst'],
+                                         season_year)
+
+    # Calculate prefix sums of the formula for the team and for its opponents.
+    for_team = mh_weight * df['mediumHighDangerShotsFor'] + pp_weight * df['powerPlaySecondsFor'].fillna(0) / 60
+    against_team = (mh_weight * df['mediumHighDangerShotsAgainst'] +
+                    pp_weight * df['powerPlaySecondsAgainst'].fillna(0) / 60)
+
+    fteam = np.cumsum(for_team)
+    ateam = np.cumsum(against_team)
+
+    n = fteam.size - 5
+    p = 0
 
-    # Only extract the rows containing all data for each game.
-    df = df[np.logical_and(df.situation == 'all', df.season == season_year)]
+    for i in range(6, n):
 
-    df = df.reset_index()
-    return df
+        f = fteam[i] - fteam[i - 5]
+        a = ateam[i] - ateam[i - 5]
+
+        if df['goalsFor'][i] > df['goalsAgainst'][i] and f > a:
+            p += 1
+        elif df['goalsFor'][i] < df['goalsAgainst'][i] and f < a:
+            p += 1
+
+    return p / n
 
 
 def get_file():
@@ -287,6 +414,23 @@ def get_file():
             print(Style.RESET_ALL)
 
 
+def get_search_mode():
+    """
+    Asks the user whether the weights should be searched adaptively instead of on the fixed grid.
+
+    :return: A boolean indicating whether the adaptive search is used (ADAPTIVE_SEARCH if the user just presses enter).
+    """
+    while True:
+        answer = input('Search the weights adaptively instead of on the fixed grid? (y/n, default ' +
+                       ('y' if ADAPTIVE_SEARCH else 'n') + '): ').strip().lower()
+        if answer == '':
+            return ADAPTIVE_SEARCH
+        if answer in ['y', 'n']:
+            return answer == 'y'
+        print(Fore.RED + 'Please enter y or n.\n')
+        print(Style.RESET_ALL)
+
+
 def print_menu():
     """
     Prints a menu of options for the user to choose from.
@@ -296,8 +440,9 @@ def print_menu():
     print('2. Produce low danger shots weight plots.')
     print('3. Produce penalty minutes weight plots.')
     print('4. Produce shots on goal weight plots.')
-    print('5. Switch filepath')
-    print('6. Exit')
+    print('5. Produce power play weight plots.')
+    print('6. Switch filepath')
+    print('7. Exit')
     print()
 
 
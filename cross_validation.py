@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+import weight_sweep
+
+# Seasons used for training and testing (the seasons analyzed by calculate_weights and later ones).
+FIRST_SEASON = 2008
+
+# Ways of splitting the seasons: each season is held out in turn and the weights are fitted on all the others
+# ('leave_one_season_out'), or only on the seasons before it ('rolling_origin', as when predicting a new season).
+SPLITS = ['leave_one_season_out', 'rolling_origin']
+
+# Number of seasons a rolling-origin split trains on before it starts testing.
+MIN_TRAINING_SEASONS = 1
+
+
+def main():
+    """
+    Cross-validates the weights of every calculate_weights formula with both kinds of splits and saves the
+    out-of-sample accuracy of each team in an Excel file with one sheet per split.
+    """
+    filepaths = [team + '.csv' for team in weight_sweep.teams]
+
+    with pd.ExcelWriter('Cross Validation.xlsx') as writer:
+        for split in SPLITS:
+            results = cross_validate(filepaths, split)
+            summary = summarize(results)
+            print(split + ':')
+            print(summary.to_string())
+            print()
+            summary.to_excel(writer, sheet_name=split)
+
+
+def formula_weights(formula):
+    """
+    Returns the weights calculate_weights evaluates for a formula: each of its weights from 0.05 to 5 in steps of 0.05
+    with the other held at 1.
+
+    :param formula: The name of the formula (a key of weight_sweep.FORMULAS).
+    :return: A numpy array with one (weight, weight) row per candidate.
+    """
+    if weight_sweep.FORMULAS[formula][1] == 'unused':
+        return weight_sweep.weight_grid(0)
+    return np.vstack([weight_sweep.weight_grid(0), weight_sweep.weight_grid(1)])
+
+
+def split_seasons(seasons, split):
+    """
+    Splits the seasons of a team into folds.
+
+    :param seasons: A sorted list of seasons.
+    :param split: One of SPLITS.
+    :return: A list of (training seasons, test season) tuples.
+    """
+    if split == 'leave_one_season_out':
+        return [([s for s in seasons if s != season], season) for season in seasons if len(seasons) > 1]
+    elif split == 'rolling_origin':
+        return [(seasons[:i], seasons[i]) for i in range(MIN_TRAINING_SEASONS, len(seasons))]
+    raise ValueError('Unknown split: ' + split)
+
+
+def cross_validate(filepaths, split, formulas=None, processes=None):
+    """
+    Fits the weights of each formula on the training seasons of every fold and scores them on the held-out season, for
+    every team. The accuracy of a formula in a season only depends on that season's games, so every candidate weight
+    is evaluated once per team-season (in parallel, on one shared copy of the games) and each fold only has to pick
+    the weights that did best on its training seasons. The formula that did best on the training seasons is also
+    scored, as 'selected', so choosing between the hypotheses is validated too.
+
+    :param filepaths: A list of paths to team CSV files from MoneyPuck.
+    :param split: One of SPLITS.
+    :param formulas: The names of the formulas (keys of weight_sweep.FORMULAS, None for all of them).
+    :param processes: The number of worker processes (None uses one per CPU).
+    :return: A DataFrame with one row per team, fold and formula.
+    """
+    formulas = formulas or list(weight_sweep.FORMULAS)
+    loaded = weight_sweep.load_games(filepaths)
+
+    # Number of games each accuracy is divided by (as in the formulas, the number of games minus five).
+    segments = loaded[1]
+    games = pd.Series([stop - start - 5 for _, _, start, stop in segments],
+                      index=pd.MultiIndex.from_tuples([segment[:2] for segment in segments], names=['File', 'Season']))
+    games = games[np.logical_and(games > 0, games.index.get_level_values('Season') >= FIRST_SEASON)]
+
+    weights = {formula: formula_weights(formula) for formula in formulas}
+    accuracies = {formula: weight_sweep.sweep(filepaths, formula, weights[formula], processes, loaded)
+                  for formula in formulas}
+
+    rows = []
+    for filepath in games.index.unique('File'):
+        team_games = games.loc[filepath]
+
+        for training, test in split_seasons(sorted(team_games.index), split):
+            fold = []
+            for formula in formulas:
+                table = accuracies[formula].loc[filepath]
+
+                # Pick the weights with the best accuracy over all training games.
+                training_accuracy = table.loc[training].T @ team_games[training] / team_games[training].sum()
+                best = int(np.nanargmax(training_accuracy.to_numpy()))
+
+                fold.append({'File': filepath, 'Test season': test, 'Formula': formula,
+                             'Weights': tuple(weights[formula][best]), 'Training accuracy': training_accuracy[best],
+                             'Training games': team_games[training].sum(), 'Test accuracy': table.loc[test, best],
+                             'Games': team_games[test]})
+
+            selected = dict(max(fold, key=lambda row: row['Training accuracy']))
+            selected['Formula'] = 'selected (' + selected['Formula'] + ')'
+            rows.extend(fold + [selected])
+
+    return pd.DataFrame(rows)
+
+
+def summarize(results):
+    """
+    Combines the folds of each team into its out-of-sample accuracy (over all its held-out games) for each formula,
+    next to the accuracy the same weights had on the seasons they were fitted on.
+
+    :param results: A DataFrame returned by cross_validate.
+    :return: A DataFrame indexed by team with a (Training, Test) pair of columns per formula.
+    """
+    results = results.assign(Formula=results.Formula.str.replace(r' \(.*\)', '', regex=True),
+                             Training=results['Training accuracy'] * results['Training games'],
+                             Test=results['Test accuracy'] * results.Games)
+    totals = results.groupby(['File', 'Formula'])[['Training', 'Training games', 'Test', 'Games']].sum()
+    totals['Training'] = totals.Training / totals['Training games']
+    totals['Test'] = totals.Test / totals.Games
+    return totals[['Training', 'Test']].unstack('Formula').swaplevel(axis=1).sort_index(axis=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import game_query
+import moneypuck_schema
+import penalty_features
+import window_kernels
+
+# Set to True to read the features of calculate_weights and predictive_variables from the stored matrix instead of
+# computing them from the raw columns every time.
+USE_FEATURE_MATRIX = False
+
+# Sums of MoneyPuck count columns, computed for each side of a game (e.g., mediumHighDangerShotsFor and
+# mediumHighDangerShotsAgainst).
+SUM_FEATURES = {'goals': ['goals'], 'shotsOnGoal': ['shotsOnGoal'], 'lowDangerShots': ['lowDangerShots'],
+                'mediumHighDangerShots': ['mediumDangerShots', 'highDangerShots'], 'rebounds': ['rebounds'],
+                'penalityMinutes': ['penalityMinutes']}
+
+# Differences between the two sides of a game (e.g., goalsDiff is goalsFor - goalsAgainst).
+DIFF_FEATURES = ['goals', 'shotsOnGoal', 'lowDangerShots', 'mediumHighDangerShots']
+
+# Ratios of two sums on the same side of a game (e.g., reboundsPerLowDangerShotFor is reboundsFor / lowDangerShotsFor).
+# They are missing (NaN) when the denominator is zero.
+RATIO_FEATURES = {'reboundsPerLowDangerShot': ['rebounds', 'lowDangerShots'],
+                  'goalsPerShotOnGoal': ['goals', 'shotsOnGoal']}
+
+# Sums over the WINDOW games of the team's season ending with each game, the game itself included (e.g.,
+# mediumHighDangerShotsForLast5), as in the original predictive_variables loops. They are missing (NaN) for the first
+# games of a season. The trailing windows of incremental_update (e.g., goalsForPrevious5) end before the game instead.
+WINDOW = window_kernels.WINDOW
+WINDOW_FEATURES = ['goals', 'shotsOnGoal', 'lowDangerShots', 'mediumHighDangerShots', 'rebounds', 'penalityMinutes']
+
+# Every feature stored in the matrix, in column order.
+FEATURES = ([var + side for var in SUM_FEATURES for side in ['For', 'Against']] +
+            [var + 'Diff' for var in DIFF_FEATURES] +
+            [var + side for var in RATIO_FEATURES for side in ['For', 'Against']] +
+            [var + side + 'Last' + str(WINDOW) for var in WINDOW_FEATURES for side in ['For', 'Against']])
+
+# MoneyPuck columns the features are computed from.
+SOURCE_COLUMNS = [col + side for var in SUM_FEATURES for col in SUM_FEATURES[var] for side in ['For', 'Against']]
+
+# Columns identifying each row of the matrix (stored as integers next to it).
+KEY_COLUMNS = ['season', 'gameId', 'gameDate']
+
+# Feature matrices loaded by this process, keyed by the absolute path of the CSV file.
+matrices = {}
+
+
+def main():
+    """
+    Builds the feature matrix of all_teams.csv.
+    """
+    build(moneypuck_schema.DATA_FILE)
+
+
+def select(filepath, features, season_year, team=None):
+    """
+    Returns features of every game of a season (the 'all' situation rows, in the order of the file). The matrix is
+    stored as float32, which holds every count exactly; the selected columns are returned as float64 so that formulas
+    give the same results as with the raw columns.
+
+    :param filepath: The path to a MoneyPuck CSV file (a team file or all_teams.csv).
+    :param features: The names of the features to include (from FEATURES).
+    :param season_year: The season to be included.
+    :param team: The three-letter name of the team to include (None for every team in the file).
+    :return: A DataFrame containing the KEY_COLUMNS and the features, with one row per game.
+    """
+    matrix = load(filepath)
+    missing = [feature for feature in features if feature not in matrix['features']]
+    if missing:
+        raise ValueError('Features not found in the feature matrix: ' + ', '.join(missing))
+
+    rows = matrix['keys'][:, 0] == season_year
+    if team is not None:
+        rows = np.logical_and(rows, matrix['teams'][matrix['keys'][:, len(KEY_COLUMNS)]] == team)
+    rows = np.flatnonzero(rows)
+
+    df = pd.DataFrame({col: matrix['keys'][rows, i] for i, col in enumerate(KEY_COLUMNS)})
+    for feature in features:
+        df[feature] = matrix['values'][rows, matrix['features'].index(feature)].astype('float64')
+    return df
+
+
+def extract_features(filepath, features, season_year):
+    """
+    Extract derived features (see FEATURES) of every game in a season from the stored feature matrix, or compute them
+    from the raw columns if the matrix is disabled. Penalty features (see penalty_features.PENALTY_COLUMNS) are joined
+    onto the games as well.
+
+    :param filepath: The path that contains the hockey data.
+    :param features: The names of the features that should be included (penalty_features.PENALTY_COLUMNS can be
+    included too).
+    :param season_year: The season to be included.
+    :return: A DataFrame containing the season, gameId, gameDate and the features of each game (as float64, and the
+    penalty features as returned by penalty_features.join_penalties).
+    """
+    requested = list(features)
+    penalty_columns = [feature for feature in requested if feature in penalty_features.PENALTY_COLUMNS]
+    features = [feature for feature in requested if feature not in penalty_columns]
+    teams = ['team', 'opposingTeam'] if penalty_columns else []
+
+    # Only extract the columns of the rows containing all data for each game. The matrix has the same rows in the same
+    # order, so only the teams the penalty features are joined on are read if the features come from it.
+    query = game_query.GameQuery(filepath).situation('all').season(season_year)
+    if USE_FEATURE_MATRIX:
+        df = select(filepath, features, season_year)
+        if teams:
+            df = pd.concat([df, query.select(*teams).rows().reset_index(drop=True)], axis=1)
+    else:
+        raw = query.select(*SOURCE_COLUMNS, *KEY_COLUMNS, *teams).rows().reset_index(drop=True)
+        df = pd.concat([raw[KEY_COLUMNS + teams], compute(raw)[features]], axis=1)
+
+    if penalty_columns:
+        df = penalty_features.join_penalties(df, penalty_columns)
+    return df[KEY_COLUMNS + requested]
+
+
+def compute(df):
+    """
+    Computes every feature from the raw columns of the 'all' situation rows of a MoneyPuck file. Windows are computed
+    within each team's season, so the rows of each team must be in chronological order (as in MoneyPuck's files).
+
+    :param df: A DataFrame containing the SOURCE_COLUMNS and season (and team if it has several teams).
+    :return: A DataFrame of FEATURES (as float64) with the same index as df.
+    """
+    features = pd.DataFrame(index=df.index)
+
+    for var in SUM_FEATURES:
+        for side in ['For', 'Against']:
+            features[var + side] = sum(df[col + side].astype('float64') for col in SUM_FEATURES[var])
+
+    for var in DIFF_FEATURES:
+        features[var + 'Diff'] = features[var + 'For'] - features[var + 'Against']
+
+    for var in RATIO_FEATURES:
+        numerator, denominator = RATIO_FEATURES[var]
+        for side in ['For', 'Against']:
+            features[var + side] = features[numerator + side] / features[denominator + side].replace(0, np.nan)
+
+    # Window sums are the difference of two prefix sums within each team's season.
+    keys = [df.team.astype(str), df.season] if 'team' in df.columns else [df.season]
+    position = df.groupby(keys).cumcount().to_numpy()
+    for var in WINDOW_FEATURES:
+        for side in ['For', 'Against']:
+            totals = features[var + side].groupby(keys).cumsum()
+            previous = totals.groupby(keys).shift(WINDOW, fill_value=0)
+            features[var + side + 'Last' + str(WINDOW)] = (totals - previous).where(position >= WINDOW - 1)
+
+    return features[FEATURES]
+
+
+def load(filepath):
+    """
+    Returns the feature matrix of a MoneyPuck file, memory-mapping it from the files next to it. It is (re)built if it
+    does not exist yet, the file has changed since it was built, or the declared features have changed.
+
+    :param filepath: The path to a MoneyPuck CSV file.
+    :return: A dictionary holding the matrix (values), its keys, the feature names and the team names.
+    """
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    source = [stat.st_size, stat.st_mtime_ns]
+
+    if path in matrices and matrices[path]['source'] == source:
+        return matrices[path]
+
+    metadata = None
+    if os.path.exists(matrix_files(path)[2]):
+        with open(matrix_files(path)[2]) as f:
+            metadata = json.load(f)
+        if metadata['source'] != source or metadata['features'] != FEATURES or metadata['keys'] != KEY_COLUMNS:
+            metadata = None
+
+    if metadata is None:
+        build(path)
+        with open(matrix_files(path)[2]) as f:
+            metadata = json.load(f)
+
+    matrices[path] = {
+        'source': metadata['source'],
+        'features': metadata['features'],
+        'teams': np.array(metadata['teams'], dtype=object),
+        'values': np.load(matrix_files(path)[0], mmap_mode='r'),
+        'keys': np.load(matrix_files(path)[1], mmap_mode='r')
+    }
+    return matrices[path]
+
+
+def build(filepath):
+    """
+    Computes the features of every (team, game) of a MoneyPuck file and saves them next to it: a dense float32 matrix
+    with one column per feature (X.features.npy), the keys of its rows (X.features.keys.npy) and the column metadata
+    (X.features.json).
+
+    :param filepath: The path to a MoneyPuck CSV file.
+    :return: A tuple containing the matrix and its keys as numpy arrays.
+    """
+    stat = os.stat(filepath)
+    df = moneypuck_schema.read_moneypuck(filepath, KEY_COLUMNS + ['team', 'situation'] + SOURCE_COLUMNS)
+    df = df[df.situation == 'all'].reset_index(drop=True)
+
+    values = compute(df).to_numpy(dtype='float32')
+    teams = sorted(df.team.astype(str).unique())
+    keys = np.column_stack([df[col].to_numpy(dtype='int64') for col in KEY_COLUMNS] +
+                           [np.searchsorted(teams, df.team.astype(str).to_numpy())])
+
+    metadata = {'source': [stat.st_size, stat.st_mtime_ns], 'features': FEATURES, 'keys': KEY_COLUMNS,
+                'teams': teams}
+
+    # Write to temporary files first, and the metadata last, so that an interrupted build is never loaded.
+    values_file, keys_file, metadata_file = matrix_files(filepath)
+    for array, target in [(values, values_file), (keys, keys_file)]:
+        with open(target + '.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(target + '.tmp', target)
+    with open(metadata_file + '.tmp', 'w') as f:
+        json.dump(metadata, f)
+    os.replace(metadata_file + '.tmp', metadata_file)
+
+    return values, keys
+
+
+def matrix_files(filepath):
+    """
+    Returns the paths of the feature matrix files of a CSV file (e.g., all_teams.features.npy next to all_teams.csv).
+
+    :param filepath: The path to a MoneyPuck CSV file.
+    :return: A tuple containing the paths to the matrix, its keys and its metadata.
+    """
+    base = os.path.splitext(filepath)[0]
+    return base + '.features.npy', base + '.features.keys.npy', base + '.features.json'
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import moneypuck_schema
+
+# Columns shared by both rows of a game.
+KEY_COLUMNS = ['gameId', 'season', 'gameDate', 'situation', 'playoffGame']
+
+# Columns that are not "For"/"Against" pairs but differ between the two rows of a game.
+SIDE_COLUMNS = ['team', 'iceTime']
+
+# Pair tables loaded by this process, keyed by the absolute path of the CSV file.
+tables = {}
+
+
+def main():
+    """
+    Builds the game-pair table of all_teams.csv.
+    """
+    build('all_teams.csv')
+
+
+def winner_games(filepath, columns, season_year, situation='all'):
+    """
+    Returns one row per game of a season, seen from the side of the team that won it (its stats are the "For" columns
+    and its opponent's are the "Against" columns). Only games that did not go into overtime are included, as in
+    single_var_hypothesis_tests.extract_data. The winner is decided by the 'all' situation row even when another
+    situation is requested.
+
+    :param filepath: The path to all_teams.csv.
+    :param columns: The column names that should be included (as they are named in all_teams.csv).
+    :param season_year: The season to be included.
+    :param situation: The situation to be analyzed (default is 'all').
+    :return: A DataFrame with one row per game, indexed by gameId.
+    """
+    games = select_pairs(filepath, season_year, 'all')
+    games = games[games.iceTimeHome == 3600]
+    home_won = pd.Series((games.goalsHome > games.goalsAway).to_numpy(), index=games.gameId.to_numpy())
+
+    if situation != 'all':
+        games = select_pairs(filepath, season_year, situation)
+        games = games[games.gameId.isin(home_won.index)]
+
+    return orient(games, home_won.reindex(games.gameId.to_numpy()).to_numpy(), columns)
+
+
+def team_games(filepath, team, columns, season_year, situation='all'):
+    """
+    Returns the games of one team in a season seen from its side, in the same layout as a team file from MoneyPuck.
+
+    :param filepath: The path to all_teams.csv.
+    :param team: The three-letter name of the team.
+    :param columns: The column names that should be included (as they are named in all_teams.csv).
+    :param season_year: The season to be included.
+    :param situation: The situation to be analyzed (default is 'all').
+    :return: A DataFrame with one row per game, indexed by gameId.
+    """
+    games = select_pairs(filepath, season_year, situation)
+    games = games[np.logical_or(games.teamHome == team, games.teamAway == team)]
+    return orient(games, (games.teamHome == team).to_numpy(), columns)
+
+
+def orient(games, home_for, columns):
+    """
+    Turns rows of the game-pair table into "For" and "Against" columns seen from one side of each game.
+
+    :param games: Rows of the game-pair table.
+    :param home_for: A boolean numpy array indicating whether each game should be seen from the home team's side.
+    :param columns: The column names that should be included (as they are named in all_teams.csv). Duplicates are
+    ignored.
+    :return: A DataFrame with compact dtypes, indexed by gameId.
+    """
+    df = pd.DataFrame(index=pd.Index(games.gameId.to_numpy(), name='gameId'))
+
+    for col in dict.fromkeys(columns):
+        if col in KEY_COLUMNS:
+            df[col] = games[col].to_numpy()
+        elif col == 'opposingTeam':
+            df[col] = np.where(home_for, games.teamAway, games.teamHome)
+        elif col.endswith('Against') and col[:-7] + 'Home' in games.columns:
+            df[col] = np.where(home_for, games[col[:-7] + 'Away'], games[col[:-7] + 'Home'])
+        elif col.endswith('For') and col[:-3] + 'Home' in games.columns:
+            df[col] = np.where(home_for, games[col[:-3] + 'Home'], games[col[:-3] + 'Away'])
+        elif col + 'Home' in games.columns:
+            df[col] = np.where(home_for, games[col + 'Home'], games[col + 'Away'])
+        else:
+            raise ValueError('Column not found in the game-pair table: ' + col)
+
+    return moneypuck_schema.compact(df)
+
+
+def select_pairs(filepath, season_year, situation):
+    """
+    Returns the rows of the game-pair table for one season and situation.
+
+    :param filepath: The path to all_teams.csv.
+    :param season_year: The season to be included.
+    :param situation: The situation to be included.
+    :return: A DataFrame of game pairs.
+    """
+    pairs = load(filepath)
+    return pairs[np.logical_and(pairs.season == season_year, pairs.situation == situation)]
+
+
+def load(filepath):
+    """
+    Returns the game-pair table of all_teams.csv, loading it from the file next to it. It is (re)built if it does not
+    exist yet or all_teams.csv has changed since it was built.
+
+    :param filepath: The path to all_teams.csv.
+    :return: A DataFrame of game pairs.
+    """
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    source = [stat.st_size, stat.st_mtime_ns]
+
+    if path in tables and tables[path].attrs['source'] == source:
+        return tables[path]
+
+    pairs = None
+    if os.path.exists(pairs_file(path)):
+        pairs = pd.read_pickle(pairs_file(path))
+        if pairs.attrs.get('source') != source:
+            pairs = None
+
+    if pairs is None:
+        pairs = build(path)
+
+    tables[path] = pairs
+    return pairs
+
+
+def build(filepath):
+    """
+    Joins the home and away rows of every game and situation in all_teams.csv into one row holding both teams' stats
+    side by side (e.g., goalsHome and goalsAway), and saves the table next to the file. Each row of all_teams.csv
+    already holds the opponent's stats as "Against" columns, so only the "For" columns of each row are kept.
+
+    :param filepath: The path to all_teams.csv.
+    :return: A DataFrame of game pairs.
+    """
+    stat = os.stat(filepath)
+    df = moneypuck_schema.read_moneypuck(filepath)
+
+    for_columns = [col for col in df.columns if col.endswith('For') and col[:-3] + 'Against' in df.columns]
+    side_columns = SIDE_COLUMNS + for_columns
+
+    sides = []
+    for side in ['Home', 'Away']:
+        rows = df[df.home_or_away == side.upper()]
+        rows = rows[KEY_COLUMNS + side_columns] if side == 'Home' else rows[['gameId', 'situation'] + side_columns]
+        sides.append(rows.rename(columns={col: (col[:-3] if col in for_columns else col) + side
+                                          for col in side_columns}))
+
+    # Every game has exactly one home and one away row per situation.
+    pairs = sides[0].merge(sides[1], on=['gameId', 'situation'], how='inner', validate='one_to_one')
+    pairs = moneypuck_schema.compact(pairs)
+    pairs.attrs['source'] = [stat.st_size, stat.st_mtime_ns]
+
+    # Write to a temporary file first so that an interrupted build never leaves a partial table.
+    pairs.to_pickle(pairs_file(filepath) + '.tmp')
+    os.replace(pairs_file(filepath) + '.tmp', pairs_file(filepath))
+    return pairs
+
+
+def pairs_file(filepath):
+    """
+    Returns the path of the game-pair table of a CSV file (e.g., all_teams.pairs.pkl next to all_teams.csv).
+
+    :param filepath: The path to all_teams.csv.
+    :return: The path to the game-pair table.
+    """
+    return os.path.splitext(filepath)[0] + '.pairs.pkl'
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import operator
+
+import numpy as np
+
+import moneypuck_db
+import moneypuck_schema
+import sorted_layout
+
+# Operators a condition can use (the same ones as moneypuck_db).
+OPERATORS = {'=': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt,
+             '>=': operator.ge}
+
+# A regulation game lasts 60 minutes. Games that went to a shootout have more than 65 minutes of ice time.
+REGULATION_ICE_TIME = 3600
+SHOOTOUT_ICE_TIME = 3900
+
+
+class GameQuery:
+    """
+    A lazy query on the rows of a MoneyPuck CSV file. Each method returns a new query with one more condition or
+    column, and nothing is read until rows() is called. The conditions are then evaluated together: as one WHERE clause
+    if the indexed database is enabled, as block lookups in the sorted layout if it is enabled, or as one combined mask
+    over the CSV file otherwise. Only the selected columns and the columns of the conditions are read.
+    """
+
+    def __init__(self, filepath=moneypuck_schema.DATA_FILE, columns=(), conditions=()):
+        """
+        Creates a query selecting every row of a file.
+
+        :param filepath: The path to the MoneyPuck CSV file (default is all_teams.csv).
+        :param columns: The column names that should be included.
+        :param conditions: A list of (column, operator, value) tuples that every row must satisfy.
+        """
+        self.filepath = filepath
+        self.columns = list(dict.fromkeys(columns))
+        self.conditions = list(conditions)
+
+    def select(self, *columns):
+        """
+        Adds columns to the query.
+
+        :param columns: The column names that should be included.
+        :return: The new query.
+        """
+        return GameQuery(self.filepath, self.columns + list(columns), self.conditions)
+
+    def where(self, column, op, value):
+        """
+        Adds a condition to the query.
+
+        :param column: The column name.
+        :param op: One of OPERATORS.
+        :param value: The value the column is compared to.
+        :return: The new query.
+        """
+        if op not in OPERATORS:
+            raise ValueError('Unsupported operator: ' + op)
+        return GameQuery(self.filepath, self.columns, self.conditions + [(column, op, value)])
+
+    def season(self, year):
+        """
+        Keeps the rows of one season.
+
+        :param year: The season year.
+        :return: The new query.
+        """
+        return self.where('season', '=', year)
+
+    def situation(self, situation):
+        """
+        Keeps the rows of one situation (e.g., 'all' or '5on4').
+
+        :param situation: The situation.
+        :return: The new query.
+        """
+        return self.where('situation', '=', situation)
+
+    def team(self, team):
+        """
+        Keeps the rows of one team.
+
+        :param team: The three-letter name of the team.
+        :return: The new query.
+        """
+        return self.where('team', '=', team)
+
+    def regular_season(self):
+        """
+        Keeps the rows of regular season games.
+
+        :return: The new query.
+        """
+        return self.where('playoffGame', '=', 0)
+
+    def regulation_only(self):
+        """
+        Keeps the rows of games that did not go into overtime.
+
+        :return: The new query.
+        """
+        return self.where('iceTime', '=', REGULATION_ICE_TIME)
+
+    def no_shootouts(self):
+        """
+        Keeps the rows of games that did not go to a shootout (games decided in overtime are kept).
+
+        :return: The new query.
+        """
+        return self.where('iceTime', '<', SHOOTOUT_ICE_TIME)
+
+    def mask(self, df):
+        """
+        Evaluates every condition of the query on a DataFrame at once.
+
+        :param df: A DataFrame containing the columns of the conditions.
+        :return: A boolean numpy array of the rows that satisfy every condition.
+        """
+        mask = np.ones(df.shape[0], dtype=bool)
+        for col, op, value in self.conditions:
+            mask &= np.asarray(OPERATORS[op](df[col], value), dtype=bool)
+        return mask
+
+    def rows(self, chunksize=None):
+        """
+        Runs the query.
+
+        :param chunksize: The number of rows of the CSV file read at a time (None reads the whole file at once).
+        :return: A DataFrame with compact dtypes containing the selected columns (in file order) of the matching rows
+        (in file order), indexed by their row number in the file.
+        """
+        if moneypuck_db.USE_DATABASE:
+            return moneypuck_db.query(self.filepath, self.columns, self.conditions)
+
+        if sorted_layout.USE_LAYOUT:
+
+            # An equality condition on a sort column selects blocks if it is the only condition on that column; the
+            # other conditions (including several conditions on the same sort column) filter the blocks' rows.
+            columns = [col for col, _, _ in self.conditions]
+            keys = {col: value for col, op, value in self.conditions
+                    if op == '=' and col in sorted_layout.SORT_COLUMNS and columns.count(col) == 1}
+            rest = GameQuery(self.filepath, conditions=[condition for condition in self.conditions
+                                                        if condition[0] not in keys])
+            return sorted_layout.select(self.filepath, self.columns, keys, rest.mask if rest.conditions else None)
+
+        df = moneypuck_schema.read_filtered(self.filepath, self.columns + [c[0] for c in self.conditions], self.mask,
+                                            chunksize)
+        return df[[col for col in df.columns if col in self.columns]]
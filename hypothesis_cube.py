@@ -0,0 +1,209 @@
+import json
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+import lookup
+import result_cache
+
+# Axes of the cube, in order.
+AXES = ['test', 'team', 'season', 'metric']
+
+# Metrics stored for each test, team and season: the number of results, the number of successes, the number the
+# successes are divided by (the number of results for all_teams and the team's wins otherwise) and the p value.
+METRICS = ['n', 'successes', 'wins', 'p']
+
+# Files the cube is saved in: a dense float64 array and the labels of its axes.
+CUBE_FILES = ('hypothesis_results.npy', 'hypothesis_results.json')
+
+# Cube loaded by this process.
+loaded_cube = None
+
+
+class HypothesisCube:
+    """
+    The results of every hypothesis test for every team and season, held in a dense (test x team x season x metric)
+    array. Selecting labels returns a smaller cube, and totals pool the counts over any axes, so any view of the results
+    (e.g., a sheet of the Excel reports) is a slice of the same array.
+    """
+
+    def __init__(self, values, tests, teams, seasons):
+        """
+        Creates a cube from an array of results.
+
+        :param values: A numpy array with one axis per entry of AXES.
+        :param tests: The labels of the test axis (the test numbers).
+        :param teams: The labels of the team axis.
+        :param seasons: The labels of the season axis.
+        """
+        self.values = values
+        self.labels = {'test': list(tests), 'team': list(teams), 'season': list(seasons), 'metric': list(METRICS)}
+        self.positions = {axis: {label: i for i, label in enumerate(labels)} for axis, labels in self.labels.items()}
+
+    def sel(self, **labels):
+        """
+        Selects labels along one or more axes (e.g., cube.sel(team='BOS', season=[2016, 2017])).
+
+        :param labels: For each axis to select along, a label or a list of labels.
+        :return: The new cube (a single label keeps its axis with one entry).
+        """
+        values = self.values
+        selected = dict(self.labels)
+        for axis, keep in labels.items():
+            keep = list(keep) if isinstance(keep, (list, tuple, range)) else [keep]
+            values = np.take(values, [self.positions[axis][label] for label in keep], axis=AXES.index(axis))
+            selected[axis] = keep
+        return HypothesisCube(values, selected['test'], selected['team'], selected['season'])
+
+    def metric(self, name):
+        """
+        Returns one metric of every test, team and season in the cube.
+
+        :param name: One of METRICS.
+        :return: A numpy array with the test, team and season axes.
+        """
+        return self.values[..., METRICS.index(name)]
+
+    def total(self, *axes):
+        """
+        Pools the results over one or more axes: the counts are summed and the p value is recomputed from the sums.
+
+        :param axes: The axes to pool over (test, team and/or season).
+        :return: The new cube, with a single 'total' label on each pooled axis.
+        """
+        summed = self.values.sum(axis=tuple(AXES.index(axis) for axis in axes), keepdims=True)
+        wins = summed[..., METRICS.index('wins')]
+        summed[..., METRICS.index('p')] = np.divide(summed[..., METRICS.index('successes')], wins,
+                                                    out=np.zeros_like(wins), where=wins != 0)
+
+        labels = {axis: ['total'] if axis in axes else self.labels[axis] for axis in AXES}
+        return HypothesisCube(summed, labels['test'], labels['team'], labels['season'])
+
+    def rank(self, name='p'):
+        """
+        Ranks the tests by a metric pooled over every team and season in the cube.
+
+        :param name: One of METRICS.
+        :return: A Series indexed by test, sorted from the highest value to the lowest.
+        """
+        totals = self.total('team', 'season').metric(name)[:, 0, 0]
+        return pd.Series(totals, index=pd.Index(self.labels['test'], name='test'), name=name).sort_values(
+            ascending=False, kind='mergesort')
+
+    def to_frame(self):
+        """
+        Returns the cube as a table.
+
+        :return: A DataFrame with one column per metric, indexed by (test, team, season).
+        """
+        index = pd.MultiIndex.from_product([self.labels['test'], self.labels['team'], self.labels['season']],
+                                           names=AXES[:3])
+        return pd.DataFrame(self.values.reshape(-1, len(METRICS)), index=index, columns=METRICS)
+
+
+def load(tests, teams, seasons, processes=None):
+    """
+    Returns the results cube, memory-mapping it from CUBE_FILES. It is (re)built if it does not exist yet, its axes
+    differ, or one of the team files or the code of the tests has changed since it was built.
+
+    :param tests: The numbers of the hypothesis tests.
+    :param teams: The names of the teams (all_teams can be included).
+    :param seasons: The season years.
+    :param processes: The number of worker processes used if the cube is built (None uses one per CPU).
+    :return: A HypothesisCube.
+    """
+    global loaded_cube
+
+    labels = metadata_labels(tests, teams, seasons)
+    if loaded_cube is not None and loaded_cube[0] == labels:
+        return loaded_cube[1]
+
+    metadata = None
+    if os.path.exists(CUBE_FILES[1]):
+        with open(CUBE_FILES[1]) as f:
+            metadata = json.load(f)
+        if metadata != labels:
+            metadata = None
+
+    if metadata is None:
+        build(tests, teams, seasons, processes)
+
+    cube = HypothesisCube(np.load(CUBE_FILES[0], mmap_mode='r'), tests, teams, seasons)
+    loaded_cube = (labels, cube)
+    return cube
+
+
+def build(tests, teams, seasons, processes=None):
+    """
+    Runs every hypothesis test for every team and season (or looks up their stored counts) and saves the cube. The
+    teams are spread over a pool of worker processes.
+
+    :param tests: The numbers of the hypothesis tests.
+    :param teams: The names of the teams (all_teams can be included).
+    :param seasons: The season years.
+    :param processes: The number of worker processes (None uses one per CPU).
+    :return: The cube as a numpy array.
+    """
+    with multiprocessing.Pool(processes) as pool:
+        blocks = pool.map(team_results, [(list(tests), team, list(seasons)) for team in teams])
+    values = np.stack(blocks, axis=1)
+
+    # Write to a temporary file first, and the metadata last, so that an interrupted build is never loaded.
+    with open(CUBE_FILES[0] + '.tmp', 'wb') as f:
+        np.save(f, values)
+    os.replace(CUBE_FILES[0] + '.tmp', CUBE_FILES[0])
+    with open(CUBE_FILES[1] + '.tmp', 'w') as f:
+        json.dump(metadata_labels(tests, teams, seasons), f)
+    os.replace(CUBE_FILES[1] + '.tmp', CUBE_FILES[1])
+
+    return values
+
+
+def team_results(task):
+    """
+    Computes the metrics of every hypothesis test for one team in every season.
+
+    :param task: A tuple containing the test numbers, the name of the team and the season years.
+    :return: A numpy array with the test, season and metric axes.
+    """
+    tests, team, seasons = task
+    values = np.zeros((len(tests), len(seasons), len(METRICS)))
+
+    for i, test in enumerate(tests):
+        for j, year in enumerate(seasons):
+            print(team + ' ' + str(year) + ' ' + str(test))
+            size, successes = lookup.test_counts(test, team, year)
+
+            # The successes of a team are divided by its wins (only looked up if the test had results).
+            if size != 0:
+                wins = size if team == 'all_teams' else lookup.num_of_wins(team, year)
+                values[i, j] = [size, successes, wins, float(successes) / wins if wins else 0]
+    return values
+
+
+def metadata_labels(tests, teams, seasons):
+    """
+    Returns the metadata saved with the cube: the labels of its axes, the stamps of its data files and a hash of the
+    code that computes it (this module and the tests it runs, see result_cache.code_hash).
+
+    :param tests: The numbers of the hypothesis tests.
+    :param teams: The names of the teams (all_teams can be included).
+    :param seasons: The season years.
+    :return: A dictionary that can be saved as JSON.
+    """
+    return {'test': list(tests), 'team': list(teams), 'season': list(seasons), 'sources': sources(teams),
+            'code': result_cache.code_hash(['hypothesis_cube'])}
+
+
+def sources(teams):
+    """
+    Returns the size and modification time of the files the results are computed from.
+
+    :param teams: The names of the teams (all_teams can be included).
+    :return: A list of [path, size, mtime] lists.
+    """
+    paths = sorted(set([team + '.csv' for team in teams] + ['all_teams.csv']))
+    return [[path, os.stat(path).st_size, os.stat(path).st_mtime_ns] if os.path.exists(path) else [path, None, None]
+            for path in paths]
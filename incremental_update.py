@@ -0,0 +1,298 @@
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import moneypuck_schema
+
+DATA_FILE = 'all_teams.csv'
+STATE_FILE = 'incremental_state.json'
+GAME_LOG_FILE = 'incremental_game_log.csv'
+RECORDS_FILE = 'incremental_records.csv'
+TOTALS_FILE = 'incremental_totals.csv'
+WINDOWS_FILE = 'incremental_windows.csv'
+
+# Number of previous games summed in each trailing window. Unlike the "Last5" features of feature_matrix, which end
+# with the game itself, the windows end with the game before (e.g., goalsForPrevious5).
+WINDOW_SIZE = 5
+
+# Columns needed to identify a game and apply the same filters as the other modules.
+KEY_COLUMNS = ['team', 'season', 'gameId', 'gameDate', 'situation', 'iceTime', 'playoffGame']
+
+# Variables whose season totals and trailing-window sums are maintained.
+VARIABLES = ['goalsFor', 'goalsAgainst', 'shotsOnGoalFor', 'shotsOnGoalAgainst', 'lowDangerShotsFor',
+             'lowDangerShotsAgainst', 'mediumDangerShotsFor', 'mediumDangerShotsAgainst', 'highDangerShotsFor',
+             'highDangerShotsAgainst', 'reboundsFor', 'reboundsAgainst', 'penaltiesFor', 'penaltiesAgainst',
+             'penalityMinutesFor', 'penalityMinutesAgainst', 'takeawaysFor', 'takeawaysAgainst']
+
+# Columns of the trailing-window sums. A change to them rebuilds every stored window.
+WINDOW_COLUMNS = [var + 'Previous' + str(WINDOW_SIZE) for var in VARIABLES]
+
+
+def main():
+    """
+    Runner method.
+    """
+    affected = update()
+    print('Updated ' + str(len(affected)) + ' team-season(s).')
+    for team, season in affected:
+        print(team + ' ' + str(season))
+
+
+def update(data_file=DATA_FILE, include_overtime=False):
+    """
+    Reads the rows appended to the MoneyPuck file since the last run and updates the stored records, season totals and
+    trailing-window sums for the team-seasons that received new games. If the file was replaced or truncated (or there
+    is no stored state), everything is rebuilt from scratch.
+
+    :param data_file: The path to the MoneyPuck CSV file that new games are appended to.
+    :param include_overtime: A boolean indicating whether games that went into overtime (but not shootout) should be
+    included in the stored records.
+    :return: A list of (team, season) tuples that were recomputed.
+    """
+    state = load_state()
+
+    # Start over if the file is not the one we were tracking, it no longer extends past the high-water mark, or the
+    # game log the appended rows are merged into is gone.
+    if state is None or state['data_file'] != data_file or state['include_overtime'] != include_overtime or \
+            os.path.getsize(data_file) < state['offset'] or read_header(data_file) != state['header'] or \
+            state.get('windows') != WINDOW_COLUMNS or not os.path.exists(GAME_LOG_FILE):
+        state = {'data_file': data_file, 'include_overtime': include_overtime, 'offset': 0,
+                 'header': read_header(data_file), 'rows': 0, 'windows': WINDOW_COLUMNS}
+        game_log = None
+    else:
+        game_log = moneypuck_schema.read_moneypuck(GAME_LOG_FILE)
+    rebuild = game_log is None
+
+    new_rows, offset = read_appended_rows(data_file, state['header'], state['offset'])
+    state['rows'] += new_rows.shape[0]
+    state['offset'] = offset
+
+    # Only the rows containing all data for each game are aggregated.
+    new_rows = new_rows[new_rows.situation == 'all']
+    if new_rows.shape[0] == 0 and not rebuild:
+        save_state(state)
+        return []
+
+    if game_log is None:
+        game_log = new_rows
+    else:
+        game_log = pd.concat([game_log, new_rows], ignore_index=True)
+
+    # A game that is re-appended replaces the earlier copy of that row.
+    game_log = game_log.drop_duplicates(subset=['team', 'gameId'], keep='last')
+    game_log = game_log.sort_values(['team', 'season', 'gameDate', 'gameId']).reset_index(drop=True)
+
+    affected = sorted(set(zip(new_rows.team, new_rows.season)))
+    affected_log = game_log[team_season_mask(game_log, 'team', 'season', affected)]
+
+    records = compute_records(affected_log, include_overtime)
+    totals = compute_totals(affected_log)
+    windows = compute_windows(affected_log)
+
+    # Replace the stored aggregates of the affected team-seasons and keep everything else as it was.
+    rebuild = rebuild or not os.path.exists(RECORDS_FILE)
+    write_store(RECORDS_FILE, replace_team_seasons(None if rebuild else read_store(RECORDS_FILE), records, affected))
+    write_store(TOTALS_FILE, replace_team_seasons(None if rebuild else read_store(TOTALS_FILE), totals, affected))
+    write_store(WINDOWS_FILE, replace_team_seasons(None if rebuild else read_store(WINDOWS_FILE), windows, affected))
+    write_store(GAME_LOG_FILE, game_log)
+    save_state(state)
+
+    return affected
+
+
+def read_header(data_file):
+    """
+    Returns the column names in the first line of the CSV file.
+
+    :param data_file: The path to the CSV file.
+    :return: A list of column names.
+    """
+    with open(data_file, 'r', encoding='utf-8') as f:
+        return f.readline().strip().split(',')
+
+
+def read_appended_rows(data_file, header, offset):
+    """
+    Reads the complete rows that were appended to the CSV file after the given byte offset. A partially written last
+    line is left for the next run.
+
+    :param data_file: The path to the CSV file.
+    :param header: A list of the column names of the file.
+    :param offset: The byte offset of the high-water mark (0 if the whole file should be read).
+    :return: A tuple containing a DataFrame of the new rows (only the columns that are tracked) and the new offset.
+    """
+    with open(data_file, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+
+    # Skip the header line when reading the file from the beginning.
+    start = data.find(b'\n') + 1 if offset == 0 else 0
+    end = data.rfind(b'\n') + 1
+    columns = KEY_COLUMNS + VARIABLES
+
+    if end <= start:
+        return pd.DataFrame(columns=columns), offset
+
+    df = moneypuck_schema.read_moneypuck(io.BytesIO(data[start:end]), columns, header=None, names=header)
+    return df[columns], offset + end
+
+
+def team_season_mask(df, team_col, season_col, team_seasons):
+    """
+    Returns a boolean mask of the rows in the DataFrame belonging to any of the given team-seasons.
+
+    :param df: The DataFrame to be filtered.
+    :param team_col: The name of the column containing the team.
+    :param season_col: The name of the column containing the season.
+    :param team_seasons: A list of (team, season) tuples.
+    :return: A numpy array of booleans.
+    """
+    return pd.MultiIndex.from_arrays([df[team_col], df[season_col]]).isin(team_seasons)
+
+
+def compute_records(game_log, include_overtime=False):
+    """
+    Computes the wins, losses and win percentage of each team-season in the game log in the same way as
+    produce_team_record.save_all_data.
+
+    :param game_log: A DataFrame of the 'all' situation rows.
+    :param include_overtime: A boolean indicating whether games that went into overtime (but not shootout) should be
+    included.
+    :return: A DataFrame with the same columns as team_records.csv.
+    """
+    if include_overtime:
+        df = game_log[np.logical_and(game_log.iceTime < 3900, game_log.playoffGame == 0)]
+    else:
+        df = game_log[np.logical_and(game_log.iceTime == 3600, game_log.playoffGame == 0)]
+
+    grouped = (df.goalsFor > df.goalsAgainst).groupby([df.team, df.season], observed=True)
+    records = pd.DataFrame({'Number of Wins': grouped.sum(), 'Total Games': grouped.size()})
+    records['Number of Losses'] = records['Total Games'] - records['Number of Wins']
+    records['Season Win Percentage'] = records['Number of Wins'] / records['Total Games']
+
+    records = records.rename_axis(['Team', 'Season']).reset_index()
+    return records[['Team', 'Season', 'Number of Wins', 'Number of Losses', 'Season Win Percentage']]
+
+
+def compute_totals(game_log):
+    """
+    Computes the regular season total of each tracked variable for each team-season in the game log in the same way as
+    analyze_hypothesis_variables.total_var.
+
+    :param game_log: A DataFrame of the 'all' situation rows.
+    :return: A DataFrame with a Team and Season column followed by one column per tracked variable.
+    """
+    df = game_log[game_log.playoffGame == 0]
+    totals = df[VARIABLES].astype('int64').groupby([df.team, df.season], observed=True).sum()
+    return totals.rename_axis(['Team', 'Season']).reset_index()
+
+
+def compute_windows(game_log):
+    """
+    Computes the sum of each tracked variable over the WINDOW_SIZE games preceding every game of each team-season in
+    the game log. Games without WINDOW_SIZE previous games in the season have empty windows.
+
+    :param game_log: A DataFrame of the 'all' situation rows sorted by team, season and date.
+    :return: A DataFrame with Team, Season, gameId and gameDate columns followed by one column per tracked variable.
+    """
+    keys = [game_log.team, game_log.season]
+
+    # Difference of prefix sums, shifted by one game so the current game is not part of its own window.
+    prefix = game_log[VARIABLES].astype('float64').groupby(keys, observed=True).cumsum()
+    before = prefix.groupby(keys, observed=True).shift(1)
+    start = prefix.groupby(keys, observed=True).shift(WINDOW_SIZE + 1).fillna(0)
+    windows = before - start
+    windows[game_log.groupby(keys, observed=True).cumcount().to_numpy() < WINDOW_SIZE] = np.nan
+
+    windows.columns = WINDOW_COLUMNS
+    windows.insert(0, 'gameDate', game_log.gameDate)
+    windows.insert(0, 'gameId', game_log.gameId)
+    windows.insert(0, 'Season', game_log.season)
+    windows.insert(0, 'Team', game_log.team)
+    return windows.reset_index(drop=True)
+
+
+def replace_team_seasons(stored, recomputed, team_seasons):
+    """
+    Replaces the rows of the given team-seasons in a stored table with freshly recomputed rows.
+
+    :param stored: The stored DataFrame (None if nothing has been stored yet).
+    :param recomputed: A DataFrame with the recomputed rows of the affected team-seasons.
+    :param team_seasons: A list of (team, season) tuples that were recomputed.
+    :return: The updated DataFrame.
+    """
+    if stored is None:
+        return recomputed.reset_index(drop=True)
+
+    kept = stored[~team_season_mask(stored, 'Team', 'Season', team_seasons)]
+    updated = pd.concat([kept, recomputed], ignore_index=True)
+    return updated.sort_values(['Team', 'Season']).reset_index(drop=True)
+
+
+def stored_total(team, year, variables):
+    """
+    Returns the stored regular season total for the specified variable(s) during the specified year for the specified
+    team (the incremental equivalent of analyze_hypothesis_variables.total_var).
+
+    :param team: A string of the three-letter team name.
+    :param year: An int of the season year.
+    :param variables: A list of strings with the variables being summed.
+    :return: The sum of the stored totals. -1 if invalid variable(s), team, or year.
+    """
+    totals = read_store(TOTALS_FILE)
+    row = totals[np.logical_and(totals.Team == team, totals.Season == year)]
+
+    if row.shape[0] == 0 or any(var not in VARIABLES for var in variables):
+        return -1
+    return row[variables].to_numpy().sum()
+
+
+def read_store(path):
+    """
+    Reads a stored table.
+
+    :param path: The path to the stored CSV file.
+    :return: A DataFrame with the stored rows.
+    """
+    return pd.read_csv(filepath_or_buffer=path, delimiter=',', header=0)
+
+
+def write_store(path, df):
+    """
+    Writes a stored table, replacing the previous version only once it has been completely written.
+
+    :param path: The path to the stored CSV file.
+    :param df: The DataFrame to be stored.
+    """
+    df.to_csv(path + '.tmp', encoding='utf-8', index=False)
+    os.replace(path + '.tmp', path)
+
+
+def load_state():
+    """
+    Loads the high-water mark of the last update.
+
+    :return: A dictionary with the stored state, or None if no update has run yet.
+    """
+    if not os.path.exists(STATE_FILE):
+        return None
+    with open(STATE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    """
+    Saves the high-water mark of this update. This is written last so an interrupted update is simply redone.
+
+    :param state: A dictionary with the state to be stored.
+    """
+    with open(STATE_FILE + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(STATE_FILE + '.tmp', STATE_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import sys
+
+import result_cache
+
+# Only the standard library and result_cache are imported at startup, so stored results are printed without loading
+# pandas. The analysis modules are imported inside the functions that compute a result that is not stored yet.
+
+FIRST_SEASON = 2008
+NUM_SEASON_YEARS = 10
+
+USAGE = '''Usage:
+  python lookup.py record TEAM [YEAR]    Wins, losses and win percentage of a team (every season or one season).
+  python lookup.py wins TEAM YEAR        Number of wins of a team in a season.
+  python lookup.py test TEST TEAM YEAR   n and p values of a hypothesis test (TEAM can be all_teams).'''
+
+
+def main(args=None):
+    """
+    Answers a query given on the command line from the stored results, computing and storing them if needed.
+
+    :param args: The command line arguments (default is sys.argv[1:]).
+    :return: The exit status (0 if the query was answered).
+    """
+    args = sys.argv[1:] if args is None else args
+
+    try:
+        if len(args) in [2, 3] and args[0] == 'record':
+            record = team_record(args[1])
+            years = range(FIRST_SEASON, FIRST_SEASON + NUM_SEASON_YEARS) if len(args) == 2 else [int(args[2])]
+            for year in years:
+                season = record[year - FIRST_SEASON] if 0 <= year - FIRST_SEASON < len(record) else []
+                if season:
+                    print(str(year) + ': ' + str(season[0]) + '-' + str(season[1]) + ' (' +
+                          str(round(season[2], 3)) + ')')
+                else:
+                    print(str(year) + ': no games')
+        elif len(args) == 3 and args[0] == 'wins':
+            print(num_of_wins(args[1], int(args[2])))
+        elif len(args) == 4 and args[0] == 'test':
+            i, team, year = int(args[1]), args[2], int(args[3])
+            size, successes = test_counts(i, team, year)
+            wins = size if team == 'all_teams' or size == 0 else num_of_wins(team, year)
+            print('Number of successes: ' + str(successes))
+            print('n value: ' + str(size))
+            print('p value (success ratio): ' + str(float(successes) / wins if size != 0 else 0))
+        else:
+            print(USAGE)
+            return 1
+    except (ValueError, KeyError, OSError) as e:
+        print('Error: ' + str(e))
+        return 1
+    return 0
+
+
+def team_record(team):
+    """
+    Returns the record of a team in every season (see produce_team_record.produce_team_record).
+
+    :param team: The three-letter name of the team.
+    :return: A list with a [wins, losses, win percentage] list for each season (empty if the team did not play).
+    """
+
+    def compute():
+        import produce_team_record
+        import single_var_hypothesis_tests
+        return produce_team_record.produce_team_record(team, chunksize=single_var_hypothesis_tests.CHUNK_SIZE)
+
+    return result_cache.cached('produce_team_record', {'team': team}, ['all_teams.csv'], compute,
+                               ['produce_team_record'])
+
+
+def num_of_wins(team, year):
+    """
+    Returns the number of wins of a team in a season (see produce_team_record.produce_num_of_wins).
+
+    :param team: The three-letter name of the team.
+    :param year: The season year.
+    :return: The number of wins for this team in this season.
+    """
+
+    def compute():
+        import produce_team_record
+        import single_var_hypothesis_tests
+        return produce_team_record.produce_num_of_wins(team, year, chunksize=single_var_hypothesis_tests.CHUNK_SIZE)
+
+    return result_cache.cached('produce_num_of_wins', {'team': team, 'season': year}, ['all_teams.csv'], compute,
+                               ['produce_team_record'])
+
+
+def test_counts(i, team, year):
+    """
+    Returns the counts of a hypothesis test for a team during a season (see save_hypothesis_tests.tests).
+
+    :param i: The number of the hypothesis test.
+    :param team: The name of the team (or all_teams).
+    :param year: The season year.
+    :return: A tuple containing the number of results and the number of successes.
+    """
+
+    def compute():
+        import save_hypothesis_tests
+        if i not in save_hypothesis_tests.tests:
+            raise ValueError('There is no hypothesis test ' + str(i))
+        results = save_hypothesis_tests.tests.get(i)(team + '.csv', year)
+        return results.size, int(results.sum())
+
+    return result_cache.cached('hypothesis test counts', {'test': i, 'team': team, 'season': year},
+                               [team + '.csv', 'all_teams.csv'], compute, ['save_hypothesis_tests'])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
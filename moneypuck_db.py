@@ -0,0 +1,149 @@
+import hashlib
+import os
+import sqlite3
+
+import pandas as pd
+
+import moneypuck_schema
+
+DB_FILE = 'moneypuck.sqlite'
+
+# Set to True to run extract_data, total_var and produce_num_of_wins as indexed queries instead of reading the CSV.
+USE_DATABASE = False
+
+# Composite indexes created on every loaded table. The first one serves the per-season queries on team files, the
+# second one the per-team queries on all_teams.csv.
+INDEXES = [['season', 'situation', 'team', 'playoffGame'], ['team', 'season', 'situation', 'playoffGame']]
+
+# Number of hexadecimal digits of the path hash in each table name.
+TABLE_HASH_LENGTH = 8
+
+# Comparison operators that can be used in query conditions.
+OPERATORS = ['=', '<', '<=', '>', '>=', '!=']
+
+# Open connection of this process (a forked process opens its own).
+connection = None
+connection_pid = None
+
+
+def main():
+    """
+    Loads all_teams.csv into the database.
+    """
+    load('all_teams.csv')
+
+
+def query(filepath, columns, conditions):
+    """
+    Returns the rows of a MoneyPuck CSV file that satisfy the conditions, using the indexed copy of the file in the
+    database. The file is (re)loaded first if it is not in the database yet or has changed since it was loaded.
+
+    :param filepath: The path to the MoneyPuck CSV file.
+    :param columns: The column names that should be included (returned in file order). Duplicates are ignored.
+    :param conditions: A list of (column, operator, value) tuples that every row must satisfy (e.g., ('season', '=',
+    2010)).
+    :return: A DataFrame with compact dtypes containing the matching rows in file order, indexed by their row number in
+    the file (as read_csv would).
+    """
+    db = open_database()
+    table = load(filepath)
+    table_columns = [row[1] for row in db.execute('PRAGMA table_info(' + quote(table) + ')')]
+
+    # Match read_csv, which raises a ValueError for columns that are not in the file and keeps the file's column order.
+    missing = [col for col in list(columns) + [c[0] for c in conditions] if col not in table_columns]
+    if missing:
+        raise ValueError('Columns not found in ' + filepath + ': ' + ', '.join(missing))
+    columns = [col for col in table_columns if col in columns]
+
+    where = []
+    params = []
+    for col, operator, value in conditions:
+        if operator not in OPERATORS:
+            raise ValueError('Unsupported operator: ' + operator)
+        where.append(quote(col) + ' ' + operator + ' ?')
+        params.append(value.item() if hasattr(value, 'item') else value)
+
+    sql = 'SELECT rowid - 1 AS "row", ' + ', '.join(quote(col) for col in columns) + ' FROM ' + quote(table)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY rowid'
+
+    df = pd.read_sql_query(sql, db, params=params, index_col='row')
+    df.index.name = None
+    return moneypuck_schema.compact(df)
+
+
+def load(filepath, chunksize=moneypuck_schema.CHUNK_SIZE):
+    """
+    Loads a MoneyPuck CSV file into its own table (in file order) and creates the composite indexes. Nothing is done if
+    the table is already up to date with the file.
+
+    :param filepath: The path to the MoneyPuck CSV file.
+    :param chunksize: The number of rows read and inserted at a time.
+    :return: The name of the table.
+    """
+    db = open_database()
+    table = table_name(filepath)
+    stat = os.stat(filepath)
+
+    row = db.execute('SELECT mtime_ns, size FROM sources WHERE name = ?', (table,)).fetchone()
+    if row is not None and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+        return table
+
+    with db:
+        db.execute('DROP TABLE IF EXISTS ' + quote(table))
+        for chunk in moneypuck_schema.read_moneypuck_chunks(filepath, chunksize=chunksize):
+            chunk.to_sql(table, db, if_exists='append', index=False)
+
+        for i, columns in enumerate(INDEXES):
+            db.execute('CREATE INDEX IF NOT EXISTS ' + quote(table + '_index_' + str(i)) + ' ON ' + quote(table) +
+                       ' (' + ', '.join(quote(col) for col in columns) + ')')
+
+        db.execute('INSERT OR REPLACE INTO sources (name, path, mtime_ns, size) VALUES (?, ?, ?, ?)',
+                   (table, os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size))
+    return table
+
+
+def table_name(filepath):
+    """
+    Returns the name of the table of a CSV file: the file's name followed by a hash of its absolute path, so that files
+    with the same name in different directories get their own tables (e.g., all_teams_3f2a9c1e).
+
+    :param filepath: The path to the MoneyPuck CSV file.
+    :return: The name of the table.
+    """
+    path = os.path.abspath(filepath)
+    digest = hashlib.sha256(path.encode('utf-8')).hexdigest()[:TABLE_HASH_LENGTH]
+    return os.path.splitext(os.path.basename(path))[0] + '_' + digest
+
+
+def quote(name):
+    """
+    Quotes a table or column name for use in SQL (team files such as L.A.csv contain dots).
+
+    :param name: The name to be quoted.
+    :return: The quoted name.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def open_database():
+    """
+    Opens the database (once per process).
+
+    :return: An sqlite3 connection.
+    """
+    global connection, connection_pid
+
+    if connection is None or connection_pid != os.getpid():
+        connection = sqlite3.connect(DB_FILE, timeout=60)
+        connection_pid = os.getpid()
+        connection.execute('PRAGMA journal_mode=WAL')
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS sources (name TEXT PRIMARY KEY, path TEXT, '
+                               'mtime_ns INTEGER, size INTEGER)')
+    return connection
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import pandas as pd
+import numpy as np
+
+DATA_FILE = 'all_teams.csv'
+
+# Repeated strings are stored once per category instead of once per row.
+CATEGORY_COLUMNS = ['team', 'name', 'playerTeam', 'opposingTeam', 'home_or_away', 'position', 'situation']
+
+# Identifiers and flags that fit in small integers.
+SMALL_INT_COLUMNS = {'season': 'int16', 'playoffGame': 'int8', 'gameDate': 'int32', 'gameId': 'int32'}
+
+# Per-game counts that come in "For" and "Against" pairs.
+COUNT_VARIABLES = ['goals', 'shotsOnGoal', 'missedShots', 'blockedShotAttempts', 'shotAttempts',
+                   'unblockedShotAttempts', 'rebounds', 'reboundGoals', 'lowDangerShots', 'mediumDangerShots',
+                   'highDangerShots', 'lowDangerGoals', 'mediumDangerGoals', 'highDangerGoals', 'penalties',
+                   'penalityMinutes', 'faceOffsWon', 'hits', 'takeaways', 'giveaways', 'dZoneGiveaways', 'freeze',
+                   'playStopped', 'playContinuedInZone', 'playContinuedOutsideZone', 'savedShotsOnGoal',
+                   'savedUnblockedShotAttempts']
+COUNT_COLUMNS = [var + side for var in COUNT_VARIABLES for side in ['For', 'Against']]
+
+FLOAT_COLUMNS = ['iceTime']
+
+# Number of rows read at a time in chunked streaming mode.
+CHUNK_SIZE = 100000
+
+
+def main():
+    """
+    Runner method.
+    """
+    memory_report(DATA_FILE)
+
+
+def read_dtypes():
+    """
+    Returns the dtypes that read_csv should parse the registered MoneyPuck columns with. Counts are parsed as float32
+    since MoneyPuck writes them with a decimal point and are only narrowed to int16 by compact.
+
+    :return: A dictionary mapping column names to dtypes.
+    """
+    dtypes = {col: 'category' for col in CATEGORY_COLUMNS}
+    dtypes.update({col: 'float32' for col in COUNT_COLUMNS + FLOAT_COLUMNS})
+    return dtypes
+
+
+def compact(df):
+    """
+    Narrows the registered columns of a MoneyPuck DataFrame to their compact dtypes. Count columns containing missing
+    values are left as float32. Unregistered float columns (expected goals, percentages, etc.) are stored as float32.
+
+    :param df: A DataFrame read from a MoneyPuck CSV file.
+    :return: The same DataFrame with compact dtypes.
+    """
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS and df[col].dtype != 'category':
+            df[col] = df[col].astype('category')
+        elif col in SMALL_INT_COLUMNS:
+            df[col] = df[col].astype(SMALL_INT_COLUMNS[col])
+        elif col in COUNT_COLUMNS and not df[col].isna().any():
+            df[col] = df[col].astype('int16')
+        elif df[col].dtype == np.float64:
+            df[col] = df[col].astype('float32')
+    return df
+
+
+def read_moneypuck(filepath, columns=None, **kwargs):
+    """
+    Reads a MoneyPuck CSV file (all_teams.csv or a single team file) with the registered compact dtypes. This is the
+    loader that every module should use instead of calling read_csv directly.
+
+    :param filepath: The path (or buffer) containing the hockey data.
+    :param columns: The column names that should be included (None for all columns). Duplicates are ignored.
+    :param kwargs: Additional keyword arguments passed to read_csv (e.g., header and names when reading a buffer).
+    :return: A DataFrame with compact dtypes.
+    """
+    options = {'delimiter': ',', 'header': 0}
+    options.update(kwargs)
+
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+
+    df = pd.read_csv(filepath_or_buffer=filepath, usecols=columns, dtype=read_dtypes(), **options)
+    return compact(df)
+
+
+def read_moneypuck_chunks(filepath, columns=None, chunksize=CHUNK_SIZE, **kwargs):
+    """
+    Reads a MoneyPuck CSV file in fixed-size chunks with the registered compact dtypes.
+
+    :param filepath: The path (or buffer) containing the hockey data.
+    :param columns: The column names that should be included (None for all columns). Duplicates are ignored.
+    :param chunksize: The number of rows in each chunk.
+    :param kwargs: Additional keyword arguments passed to read_csv.
+    :return: A generator of DataFrames with compact dtypes.
+    """
+    options = {'delimiter': ',', 'header': 0}
+    options.update(kwargs)
+
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+
+    with pd.read_csv(filepath_or_buffer=filepath, usecols=columns, dtype=read_dtypes(), chunksize=chunksize,
+                     **options) as reader:
+        for chunk in reader:
+            yield compact(chunk)
+
+
+def read_filtered(filepath, columns, row_filter, chunksize=None):
+    """
+    Reads the rows of a MoneyPuck CSV file that satisfy a filter. In chunked streaming mode only one chunk and the rows
+    kept so far are in memory at once, so the peak memory depends on the size of the selection rather than the file.
+
+    :param filepath: The path containing the hockey data.
+    :param columns: The column names that should be included (None for all columns).
+    :param row_filter: A function taking a DataFrame and returning a boolean mask of the rows to keep.
+    :param chunksize: The number of rows read at a time (None reads the whole file at once).
+    :return: A DataFrame with the matching rows, indexed by their row number in the file.
+    """
+    if chunksize is None:
+        df = read_moneypuck(filepath, columns)
+        return df[row_filter(df)]
+
+    parts = [chunk[row_filter(chunk)] for chunk in read_moneypuck_chunks(filepath, columns, chunksize)]
+    if not parts:
+        return read_moneypuck(filepath, columns, nrows=0)
+
+    # Each chunk has its own categories, so the combined columns are made categorical again.
+    return compact(pd.concat(parts))
+
+
+def aggregate_chunks(filepath, columns, aggregate, chunksize=CHUNK_SIZE):
+    """
+    Streams a MoneyPuck CSV file in chunks and combines the partial sums computed on each chunk per (team, season). The
+    running total only has one row per team-season, so the peak memory is bounded no matter how large the file is.
+
+    :param filepath: The path containing the hockey data.
+    :param columns: The column names needed by the aggregate function.
+    :param aggregate: A function taking a chunk and returning a DataFrame of partial sums indexed by (team, season).
+    :param chunksize: The number of rows read at a time.
+    :return: A DataFrame of the combined sums indexed by (team, season) (empty if the file has no rows).
+    """
+    totals = None
+    for chunk in read_moneypuck_chunks(filepath, columns, chunksize):
+        partial = aggregate(chunk)
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    # A file without rows has no chunks, so its empty frame is aggregated to get the index and columns of the sums.
+    if totals is None:
+        totals = aggregate(read_moneypuck(filepath, columns, nrows=0))
+    return totals
+
+
+def memory_report(filepath):
+    """
+    Prints the memory used by the whole MoneyPuck file when it is read with the default dtypes and with the compact
+    schema.
+
+    :param filepath: The path to the MoneyPuck CSV file.
+    :return: A tuple containing the default and compact sizes in bytes.
+    """
+    default_size = pd.read_csv(filepath_or_buffer=filepath, delimiter=',', header=0).memory_usage(deep=True).sum()
+    compact_size = read_moneypuck(filepath).memory_usage(deep=True).sum()
+
+    print('Default dtypes: ' + str(round(default_size / 2 ** 20, 1)) + ' MB')
+    print('Compact schema: ' + str(round(compact_size / 2 ** 20, 1)) + ' MB')
+    print('Reduction: ' + str(round(100 * (1 - compact_size / default_size), 1)) + '%')
+    return default_size, compact_size
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+import penalty_timelines
+
+# Penalty files written by NHL_data_web_scraper.
+PENALTY_FILES = 'penalties_*.csv'
+
+# Team abbreviations used by hockey-reference.com that differ from MoneyPuck's.
+TEAM_ABBREVIATIONS = {'LAK': 'L.A', 'NJD': 'N.J', 'SJS': 'S.J', 'TBL': 'T.B', 'VEG': 'VGK', 'PHX': 'ARI'}
+
+# Periods are numbered as in NHL_data_web_scraper (the first overtime period is the 4th period).
+OVERTIME_PERIOD = 4
+
+# Penalties in the last five minutes of the third period count as late-game penalties.
+LATE_GAME_SECONDS = 15 * 60
+
+# Features computed for each team in each game.
+FEATURES = ['penaltiesPeriod1', 'penaltiesPeriod2', 'penaltiesPeriod3', 'penaltiesOvertime',
+            'penaltyMinutesPeriod1', 'penaltyMinutesPeriod2', 'penaltyMinutesPeriod3', 'penaltyMinutesOvertime',
+            'latePenalties', 'latePenaltyMinutes'] + penalty_timelines.FEATURES
+
+# Columns that can be requested from the extract_data functions (the team's features and its opponent's). The
+# opponent's strength features are the team's shorthanded time (e.g., twoManAdvantageSecondsAgainst is its 3-on-5 time).
+PENALTY_COLUMNS = [feature + side for feature in FEATURES + penalty_timelines.STRENGTH_FEATURES
+                   for side in ['For', 'Against']]
+
+# Columns of the game rows needed to join the features.
+JOIN_COLUMNS = ['gameDate', 'team', 'opposingTeam']
+
+# Features and timelines of the penalty files loaded by this process, and the (path, size, mtime) of the files they
+# came from.
+loaded_features = None
+loaded_timelines = None
+loaded_sources = None
+
+
+def main():
+    """
+    Aggregates every penalty file in the current directory and prints the number of team-games.
+    """
+    features = load_features()
+    print('Penalty features for ' + str(features.shape[0]) + ' team-games')
+
+
+def split_columns(columns):
+    """
+    Separates the penalty feature columns from the columns that are read from a MoneyPuck file. If penalty features
+    are requested, the columns needed to join them are read as well.
+
+    :param columns: The column names requested from an extract_data function.
+    :return: A tuple containing the list of columns to read and the list of penalty feature columns.
+    """
+    penalty_columns = [col for col in columns if col in PENALTY_COLUMNS]
+    if not penalty_columns:
+        return columns, []
+    return [col for col in columns if col not in PENALTY_COLUMNS] + JOIN_COLUMNS, penalty_columns
+
+
+def join_penalties(df, penalty_columns):
+    """
+    Adds penalty feature columns to MoneyPuck game rows. "For" features belong to the row's team and "Against" features
+    to its opponent. The strength features are computed from the timelines of both teams of the row's game (see
+    penalty_timelines.strength). Games on dates without any scraped penalties are missing (NaN), while teams without
+    penalties in a scraped game get zeros.
+
+    :param df: A DataFrame of game rows with gameDate, team and opposingTeam columns.
+    :param penalty_columns: The penalty feature columns to add (from PENALTY_COLUMNS).
+    :return: The DataFrame with the feature columns added.
+    """
+    df = df.copy()
+    features = load_features()
+    dates = df.gameDate.to_numpy().astype('int64')
+    scraped = np.isin(dates, features.index.get_level_values('gameDate'))
+
+    for side, team_column in [('For', 'team'), ('Against', 'opposingTeam')]:
+        requested = [col[:-len(side)] for col in penalty_columns if col.endswith(side)]
+        if not requested:
+            continue
+
+        team = df[team_column].astype(str).to_numpy()
+        opponent = df['opposingTeam' if team_column == 'team' else 'team'].astype(str).to_numpy()
+        counted = [feature for feature in requested if feature in FEATURES]
+        keys = pd.MultiIndex.from_arrays([dates, team])
+
+        values = pd.concat([features[counted].reindex(keys).fillna(0).reset_index(drop=True),
+                            penalty_timelines.strength(load_timelines(), dates, team, opponent)], axis=1)
+        values = values[requested].to_numpy(dtype='float64', copy=True)
+        values[~scraped] = np.nan
+
+        for i, feature in enumerate(requested):
+            df[feature + side] = values[:, i].astype('int16') if scraped.all() else values[:, i].astype('float32')
+
+    return df
+
+
+def load_features(pattern=PENALTY_FILES):
+    """
+    Returns the features of every penalty file, aggregating the files again only if one of them has changed.
+
+    :param pattern: A glob pattern matching the penalty files.
+    :return: A DataFrame of FEATURES indexed by (gameDate, team).
+    """
+    global loaded_features, loaded_timelines, loaded_sources
+
+    sources = [(path, os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in sorted(glob.glob(pattern))]
+    if loaded_features is None or sources != loaded_sources:
+        penalties = [read_penalties(source[0]) for source in sources]
+        if penalties:
+            penalties = pd.concat(penalties, ignore_index=True)
+        else:
+            penalties = parse_penalties(pd.DataFrame(
+                columns=['Date', 'Period', 'Time', 'Team', 'Player', 'Summary', 'Duration']))
+        loaded_features = aggregate_penalties(penalties)
+        loaded_timelines = penalty_timelines.build_timelines(penalties)
+        loaded_sources = sources
+    return loaded_features
+
+
+def load_timelines(pattern=PENALTY_FILES):
+    """
+    Returns the penalty timelines of every penalty file (see penalty_timelines.build_timelines), loaded along with the
+    features.
+
+    :param pattern: A glob pattern matching the penalty files.
+    :return: A DataFrame of penalty intervals indexed by (gameDate, team).
+    """
+    load_features(pattern)
+    return loaded_timelines
+
+
+def read_penalties(filepath):
+    """
+    Reads a penalty file written by NHL_data_web_scraper and parses it.
+
+    :param filepath: The path to a penalties_YYYY.csv file.
+    :return: A DataFrame of parsed penalties (see parse_penalties).
+    """
+    raw = pd.read_csv(filepath, index_col=0, dtype={'Date': str, 'Time': str, 'Team': str, 'Duration': str})
+    return parse_penalties(raw)
+
+
+def parse_penalties(raw):
+    """
+    Converts scraped penalties into numbers with vectorized string operations: the date becomes a MoneyPuck gameDate
+    (YYYYMMDD), the time (MM:SS into the period) and the duration ("2 min") become seconds and minutes.
+
+    :param raw: A DataFrame with the Date, Period, Time, Team and Duration columns of a penalty file.
+    :return: A DataFrame with gameDate, team, period, seconds, minutes and late columns.
+    """
+    time = raw['Time'].astype(str).str.extract(r'(\d+):(\d+)').astype('float64')
+    period = pd.to_numeric(raw['Period'], errors='coerce').fillna(0).astype('int64').to_numpy()
+    seconds = (time[0] * 60 + time[1]).fillna(0).astype('int64').to_numpy()
+
+    return pd.DataFrame({
+        'gameDate': pd.to_numeric(raw['Date'].astype(str).str.replace('-', '', regex=False),
+                                  errors='coerce').fillna(0).astype('int64'),
+        'team': raw['Team'].astype(str).str.strip().replace(TEAM_ABBREVIATIONS),
+        'period': period,
+        'seconds': seconds,
+        'minutes': pd.to_numeric(raw['Duration'].astype(str).str.extract(r'(\d+)')[0],
+                                 errors='coerce').fillna(0).astype('int64'),
+        'late': np.logical_and(period == 3, seconds >= LATE_GAME_SECONDS)
+    })
+
+
+def aggregate_penalties(penalties):
+    """
+    Aggregates parsed penalties by team, game and period: the number of penalties and penalty minutes in each period
+    (all overtime periods together) and in the last minutes of the third period, along with the number of overlapping
+    penalties of each team-game from its penalty timeline (see penalty_timelines.overlap_counts).
+
+    :param penalties: A DataFrame of parsed penalties.
+    :return: A DataFrame of FEATURES indexed by (gameDate, team).
+    """
+    period_name = np.where(penalties.period >= OVERTIME_PERIOD, 'Overtime',
+                           'Period' + penalties.period.astype(str))
+
+    grouped = penalties.groupby([penalties.gameDate, penalties.team, period_name])
+    per_period = pd.DataFrame({'penalties': grouped.size(), 'penaltyMinutes': grouped.minutes.sum()})
+    per_period = per_period.unstack(fill_value=0)
+    per_period.columns = [stat + period for stat, period in per_period.columns]
+
+    late = penalties[penalties.late].groupby(['gameDate', 'team'])
+    late = pd.DataFrame({'latePenalties': late.size(), 'latePenaltyMinutes': late.minutes.sum()})
+
+    timelines = penalty_timelines.overlap_counts(penalty_timelines.build_timelines(penalties))
+
+    features = per_period.join(late, how='outer').join(timelines, how='outer')
+    features = features.reindex(columns=FEATURES).fillna(0).astype('int16')
+    features.index.names = ['gameDate', 'team']
+    return features
+
+
+if __name__ == "__main__":
+    main()
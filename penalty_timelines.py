@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+# Length of a period in seconds. Overtime periods start where a 20-minute period would, so the 4th period starts at
+# 60:00 of the game.
+PERIOD_SECONDS = 20 * 60
+
+# Durations (in minutes) of the penalties that leave a team shorthanded: minors, double minors and majors. Misconducts
+# (10 minutes) are served without the team playing a man down.
+POWER_PLAY_MINUTES = [2, 4, 5]
+
+# Features computed from the timeline of each team in each game.
+FEATURES = ['overlappingPenalties']
+
+# Features computed from the timelines of both teams of a game: the seconds a team played with one or more skaters
+# than its opponent (powerPlaySeconds) and with two more (twoManAdvantageSeconds). Their "Against" columns are the
+# team's shorthanded time.
+STRENGTH_FEATURES = ['powerPlaySeconds', 'twoManAdvantageSeconds']
+
+# Most skaters a team can be down at once: further penalties start when one of the first two ends.
+MAX_SKATERS_DOWN = 2
+
+
+def build_timelines(penalties):
+    """
+    Converts parsed penalties into intervals of absolute game time in seconds, [start, end), sorted by game, team and
+    start. Penalties are assumed to be served in full: the scraped data does not say when a power-play goal ended a
+    minor penalty early, or when the game ended.
+
+    :param penalties: A DataFrame of parsed penalties (see penalty_features.parse_penalties).
+    :return: A DataFrame with gameDate, team, start and end columns, indexed by (gameDate, team).
+    """
+    penalties = penalties[np.logical_and(penalties.period >= 1, penalties.minutes.isin(POWER_PLAY_MINUTES))]
+    start = (penalties.period.to_numpy() - 1) * PERIOD_SECONDS + penalties.seconds.to_numpy()
+
+    timelines = pd.DataFrame({'gameDate': penalties.gameDate.to_numpy(), 'team': penalties.team.to_numpy(),
+                              'start': start, 'end': start + penalties.minutes.to_numpy() * 60})
+    timelines = timelines.sort_values(['gameDate', 'team', 'start'], kind='mergesort', ignore_index=True)
+    return timelines.set_index(['gameDate', 'team'], drop=False)
+
+
+def overlap_counts(timelines):
+    """
+    Counts the penalties of each team-game that overlap another penalty of the same team.
+
+    :param timelines: A DataFrame returned by build_timelines.
+    :return: A DataFrame of FEATURES indexed by (gameDate, team).
+    """
+    keys = pd.MultiIndex.from_arrays([timelines.gameDate.to_numpy(), timelines.team.to_numpy()])
+    groups, unique_keys = pd.factorize(keys)
+    start = timelines.start.to_numpy()
+    end = timelines.end.to_numpy()
+
+    # The intervals are sorted by start, so an interval overlaps a later one if and only if it overlaps the next one,
+    # and an earlier one if and only if it starts before the latest end so far.
+    previous_end = pd.Series(end).groupby(groups).cummax().groupby(groups).shift().to_numpy()
+    next_start = pd.Series(start).groupby(groups).shift(-1).to_numpy()
+    overlaps = np.logical_or(start < previous_end, next_start < end)
+
+    counts = np.bincount(groups, weights=overlaps, minlength=len(unique_keys)).astype('int64')
+    return pd.DataFrame({'overlappingPenalties': counts}, index=unique_keys.set_names(['gameDate', 'team']))
+
+
+def strength(timelines, game_dates, teams, opponents):
+    """
+    Sweeps the timelines of both teams of every game at once: the start and end of each interval become events on the
+    team's or the opponent's count of penalties being served, and the events are sorted by game and time, so cumulative
+    sums give both counts between consecutive events. The team's advantage is the difference of the counts, each capped
+    at MAX_SKATERS_DOWN, so coincidental penalties (4-on-4) are even strength and 4-on-3 is a one-man advantage. This
+    takes O(n log n) for a whole season instead of comparing each pair of penalties in a game.
+
+    :param timelines: A DataFrame returned by build_timelines.
+    :param game_dates: An array of MoneyPuck gameDates (YYYYMMDD), one per game row.
+    :param teams: An array of the MoneyPuck names of the teams of the rows.
+    :param opponents: An array of the MoneyPuck names of their opponents.
+    :return: A DataFrame of STRENGTH_FEATURES with one row per game row (zeros for games without penalties).
+    """
+    keys = pd.MultiIndex.from_arrays([timelines.gameDate.to_numpy(), timelines.team.to_numpy()])
+    groups, unique_keys = pd.factorize(keys)
+    first = np.searchsorted(groups, np.arange(len(unique_keys)))
+    counts = np.bincount(groups, minlength=len(unique_keys))
+
+    # Each distinct game row is swept once, with the intervals of its team and of its opponent.
+    rows = pd.MultiIndex.from_arrays([np.asarray(game_dates, dtype='int64'), np.asarray(teams).astype(str),
+                                      np.asarray(opponents).astype(str)])
+    row_games, games = pd.factorize(rows)
+    own = unique_keys.get_indexer(pd.MultiIndex.from_arrays([games.get_level_values(0), games.get_level_values(1)]))
+    other = unique_keys.get_indexer(pd.MultiIndex.from_arrays([games.get_level_values(0), games.get_level_values(2)]))
+
+    own_game, own_rows = expand(own, first, counts)
+    other_game, other_rows = expand(other, first, counts)
+    start = timelines.start.to_numpy()
+    end = timelines.end.to_numpy()
+
+    # Sort the events by game and time (ends before starts at the same time, since intervals are half-open).
+    game = np.concatenate([own_game, own_game, other_game, other_game])
+    time = np.concatenate([start[own_rows], end[own_rows], start[other_rows], end[other_rows]])
+    is_start = np.concatenate([np.ones(len(own_rows), dtype='int64'), np.zeros(len(own_rows), dtype='int64'),
+                               np.ones(len(other_rows), dtype='int64'), np.zeros(len(other_rows), dtype='int64')])
+    is_own = np.concatenate([np.ones(2 * len(own_rows), dtype=bool), np.zeros(2 * len(other_rows), dtype=bool)])
+    order = np.lexsort((is_start, time, game))
+    game, time, is_start, is_own = game[order], time[order], is_start[order], is_own[order]
+
+    # Each event's counts last until the next event of the same game (every game's counts return to zero).
+    delta = 2 * is_start - 1
+    own_count = np.minimum(np.cumsum(np.where(is_own, delta, 0)), MAX_SKATERS_DOWN)
+    other_count = np.minimum(np.cumsum(np.where(is_own, 0, delta)), MAX_SKATERS_DOWN)
+    advantage = other_count - own_count
+
+    duration = np.zeros(len(time), dtype='int64')
+    duration[:-1] = np.where(game[1:] == game[:-1], time[1:] - time[:-1], 0)
+
+    power_play = np.bincount(game, weights=duration * (advantage >= 1), minlength=len(games))
+    two_man = np.bincount(game, weights=duration * (advantage >= 2), minlength=len(games))
+    return pd.DataFrame({'powerPlaySeconds': power_play[row_games].astype('int64'),
+                         'twoManAdvantageSeconds': two_man[row_games].astype('int64')})
+
+
+def expand(key_groups, first, counts):
+    """
+    Lists the timeline rows of a team-game for each of several games.
+
+    :param key_groups: For each game, the position of the team-game in the timelines' unique keys (-1 if the team had
+    no penalties).
+    :param first: The first timeline row of each team-game.
+    :param counts: The number of timeline rows of each team-game.
+    :return: A tuple containing the game of each listed row and the position of the row in the timelines.
+    """
+    found = np.flatnonzero(key_groups >= 0)
+    sizes = counts[key_groups[found]]
+    game = np.repeat(found, sizes)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return game, np.repeat(first[key_groups[found]], sizes) + offsets
+
+
+def overlapping(timelines, game_date, team, start, end):
+    """
+    Returns the penalties of a team-game being served during part of a time window, using an interval index over
+    that team-game's timeline (the timelines are sorted by team-game, so it is found by binary search).
+
+    :param timelines: A DataFrame returned by build_timelines.
+    :param game_date: The MoneyPuck gameDate (YYYYMMDD) of the game.
+    :param team: The MoneyPuck name of the team.
+    :param start: The start of the window in seconds of game time.
+    :param end: The end of the window in seconds of game time (exclusive).
+    :return: A DataFrame with the rows of the overlapping penalties.
+    """
+    if (game_date, team) not in timelines.index:
+        return timelines.iloc[:0]
+
+    rows = timelines.loc[[(game_date, team)]]
+    intervals = pd.IntervalIndex.from_arrays(rows.start, rows.end, closed='left')
+    return rows[intervals.overlaps(pd.Interval(start, end, closed='left'))]
+
+
+def active(timelines, game_date, team, second):
+    """
+    Returns the number of penalties a team was serving at a moment of a game.
+
+    :param timelines: A DataFrame returned by build_timelines.
+    :param game_date: The MoneyPuck gameDate (YYYYMMDD) of the game.
+    :param team: The MoneyPuck name of the team.
+    :param second: The moment in seconds of game time.
+    :return: The number of penalties being served.
+    """
+    return overlapping(timelines, game_date, team, second, second + 1).shape[0]
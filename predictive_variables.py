@@ -1,8 +1,11 @@
-import pandas as pd
 import numpy as np
 import os
 from colorama import Fore, Style
 
+import feature_matrix
+import season_calendar
+import window_kernels
+
 # Does not include "exit".
 TOTAL_OPTIONS = 8
 
@@ -87,38 +90,25 @@ def last_five_med_high_low_danger_buckets(filepath, season_year):
     """
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'mediumDangerShotsAgainst', 'highDangerShotsFor', 'highDangerShotsAgainst',
-                                 'lowDangerShotsFor', 'lowDangerShotsAgainst'],
-                      season_year)
-
-    # Calculate prefix sums for medium/high danger shots (for and against) and low danger shots (for and against).
-    mh_for = df['mediumDangerShotsFor'] + df['highDangerShotsFor']
-    mh_against = df['mediumDangerShotsAgainst'] + df['highDangerShotsAgainst']
-
-    med_high_for = np.cumsum(mh_for)
-    low_for = np.cumsum(df['lowDangerShotsFor'])
-
-    med_high_against = np.cumsum(mh_against)
-    low_against = np.cumsum(df['lowDangerShotsAgainst'])
-
-    n = med_high_for.size - 5
-    p = 0
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst', 'mediumHighDangerShotsForLast5',
+                                                    'mediumHighDangerShotsAgainstLast5', 'lowDangerShotsForLast5',
+                                                    'lowDangerShotsAgainstLast5'],
+                                         season_year)
 
-    for i in range(6, n):
+    # Medium/high danger shots (for and against) and low danger shots (for and against) in each window.
+    i = window_kernels.predicted_games(df.shape[0])
 
-        mf = med_high_for[i] - med_high_for[i - 5]
-        ma = med_high_against[i] - med_high_against[i - 5]
+    mf = df['mediumHighDangerShotsForLast5'].to_numpy()[i]
+    ma = df['mediumHighDangerShotsAgainstLast5'].to_numpy()[i]
 
-        lf = low_for[i] - low_for[i - 5]
-        la = low_against[i] - low_against[i - 5]
+    lf = df['lowDangerShotsForLast5'].to_numpy()[i]
+    la = df['lowDangerShotsAgainstLast5'].to_numpy()[i]
 
-        if df['goalsFor'][i] > df['goalsAgainst'][i] and mf > ma and lf < la:
-            p += 1
-        elif df['goalsFor'][i] < df['goalsAgainst'][i] and mf < ma and lf > la:
-            p += 1
+    n = df.shape[0] - 5
+    correct = window_kernels.correct_predictions(df['goalsFor'].to_numpy(), df['goalsAgainst'].to_numpy(),
+                                                 np.logical_and(mf > ma, lf < la), np.logical_and(mf < ma, lf > la))
 
-    print(p / n)
+    print(int(correct.sum()) / n)
 
 
 def last_five_med_high_low_danger_formula(filepath, season_year):
@@ -131,32 +121,22 @@ def last_five_med_high_low_danger_formula(filepath, season_year):
     """
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'mediumDangerShotsAgainst', 'highDangerShotsFor', 'highDangerShotsAgainst',
-                                 'lowDangerShotsFor', 'lowDangerShotsAgainst'],
-                      season_year)
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst', 'mediumHighDangerShotsForLast5',
+                                                    'mediumHighDangerShotsAgainstLast5', 'lowDangerShotsForLast5',
+                                                    'lowDangerShotsAgainstLast5'],
+                                         season_year)
 
-    # Calculate prefix sums for medium/high danger shots (for and against) and low danger shots (for and against).
-    for_team = df['mediumDangerShotsFor'] + df['highDangerShotsFor'] - df['lowDangerShotsFor']
-    against_team = df['mediumDangerShotsAgainst'] + df['highDangerShotsAgainst'] - df['lowDangerShotsAgainst']
+    # The formula is linear, so its total over each window comes from the window totals of each variable.
+    for_team = df['mediumHighDangerShotsForLast5'] - df['lowDangerShotsForLast5']
+    against_team = df['mediumHighDangerShotsAgainstLast5'] - df['lowDangerShotsAgainstLast5']
 
-    fteam = np.cumsum(for_team)
-    ateam = np.cumsum(against_team)
+    f = for_team.to_numpy()[window_kernels.predicted_games(df.shape[0])]
+    a = against_team.to_numpy()[window_kernels.predicted_games(df.shape[0])]
 
-    n = fteam.size - 5
-    p = 0
+    n = for_team.size - 5
+    correct = window_kernels.correct_predictions(df['goalsFor'].to_numpy(), df['goalsAgainst'].to_numpy(), f > a, f < a)
 
-    for i in range(6, n):
-
-        f = fteam[i] - fteam[i - 5]
-        a = ateam[i] - ateam[i - 5]
-
-        if df['goalsFor'][i] > df['goalsAgainst'][i] and f > a:
-            p += 1
-        elif df['goalsFor'][i] < df['goalsAgainst'][i] and f < a:
-            p += 1
-
-    print(p / n)
+    print(int(correct.sum()) / n)
 
 
 def last_five_med_high_low_danger(filepath, season_year):
@@ -170,38 +150,27 @@ def last_five_med_high_low_danger(filepath, season_year):
     """
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'mediumDangerShotsAgainst', 'highDangerShotsFor', 'highDangerShotsAgainst',
-                                 'lowDangerShotsFor', 'lowDangerShotsAgainst'],
-                      season_year)
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst', 'mediumHighDangerShotsFor',
+                                                    'mediumHighDangerShotsAgainst',
+                                                    'lowDangerShotsFor', 'lowDangerShotsAgainst'],
+                                         season_year)
 
-    # Calculate prefix sums for medium/high danger shots (for and against) and low danger shots (for and against).
-    mh_for = df['mediumDangerShotsFor'] + df['highDangerShotsFor']
-    mh_against = df['mediumDangerShotsAgainst'] + df['highDangerShotsAgainst']
+    # Medium/high danger shots (for and against) in each game.
+    mh_for = df['mediumHighDangerShotsFor']
+    mh_against = df['mediumHighDangerShotsAgainst']
 
     low_for = df['lowDangerShotsFor']
     low_against = df['lowDangerShotsAgainst']
 
-    n = mh_for.size - 5
-    p = 0
-
-    for i in range(6, n):
+    # Count the games in each window that favoured each side.
+    game_for = np.logical_and(mh_for > mh_against, low_for < low_against).to_numpy()
+    game_against = np.logical_and(mh_for < mh_against, low_for > low_against).to_numpy()
 
-        success_for = 0
-        success_against = 0
-
-        for j in range(1, 6):
-            if mh_for[i - j] > mh_against[i - j] and low_for[i - j] < low_against[i - j]:
-                success_for += 1
-            elif mh_for[i - j] < mh_against[i - j] and low_for[i - j] > low_against[i - j]:
-                success_against += 1
-
-        if df['goalsFor'][i] > df['goalsAgainst'][i] and success_for > success_against:
-            p += 1
-        elif df['goalsFor'][i] < df['goalsAgainst'][i] and success_for < success_against:
-            p += 1
+    n = mh_for.size - 5
+    correct = window_kernels.window_majority(df['goalsFor'].to_numpy(), df['goalsAgainst'].to_numpy(), game_for,
+                                             game_against)
 
-    print(p / n)
+    print(int(correct.sum()) / n)
 
 
 def last_five_med_high_danger_penalty_minutes(filepath, season_year):
@@ -215,38 +184,27 @@ def last_five_med_high_danger_penalty_minutes(filepath, season_year):
     """
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'mediumDangerShotsAgainst', 'highDangerShotsFor', 'highDangerShotsAgainst',
-                                 'penaltyMinutesFor', 'penaltyMinutesAgainst'],
-                      season_year)
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst', 'mediumHighDangerShotsFor',
+                                                    'mediumHighDangerShotsAgainst',
+                                                    'penalityMinutesFor', 'penalityMinutesAgainst'],
+                                         season_year)
 
-    # Calculate prefix sums for medium/high danger shots (for and against) and low danger shots (for and against).
-    mh_for = df['mediumDangerShotsFor'] + df['highDangerShotsFor']
-    mh_against = df['mediumDangerShotsAgainst'] + df['highDangerShotsAgainst']
+    # Medium/high danger shots (for and against) in each game.
+    mh_for = df['mediumHighDangerShotsFor']
+    mh_against = df['mediumHighDangerShotsAgainst']
 
     p_for = df['penalityMinutesFor']
     p_against = df['penalityMinutesAgainst']
 
-    n = mh_for.size - 5
-    p = 0
-
-    for i in range(6, n):
+    # Count the games in each window that favoured each side.
+    game_for = np.logical_and(mh_for > mh_against, p_for < p_against).to_numpy()
+    game_against = np.logical_and(mh_for < mh_against, p_for > p_against).to_numpy()
 
-        success_for = 0
-        success_against = 0
-
-        for j in range(1, 6):
-            if mh_for[i - j] > mh_against[i - j] and p_for[i - j] < p_against[i - j]:
-                success_for += 1
-            elif mh_for[i - j] < mh_against[i - j] and p_for[i - j] > p_against[i - j]:
-                success_against += 1
-
-        if df['goalsFor'][i] > df['goalsAgainst'][i] and success_for > success_against:
-            p += 1
-        elif df['goalsFor'][i] < df['goalsAgainst'][i] and success_for < success_against:
-            p += 1
+    n = mh_for.size - 5
+    correct = window_kernels.window_majority(df['goalsFor'].to_numpy(), df['goalsAgainst'].to_numpy(), game_for,
+                                             game_against)
 
-    print(p / n)
+    print(int(correct.sum()) / n)
 
 
 def last_five_med_high_danger_rebounds(filepath, season_year):
@@ -259,38 +217,26 @@ def last_five_med_high_danger_rebounds(filepath, season_year):
     """
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'mediumDangerShotsAgainst', 'highDangerShotsFor', 'highDangerShotsAgainst',
-                                 'reboundsFor', 'reboundsAgainst'],
-                      season_year)
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst', 'mediumHighDangerShotsFor',
+                                                    'mediumHighDangerShotsAgainst', 'reboundsFor', 'reboundsAgainst'],
+                                         season_year)
 
-    # Calculate prefix sums for medium/high danger shots (for and against) and low danger shots (for and against).
-    mh_for = df['mediumDangerShotsFor'] + df['highDangerShotsFor']
-    mh_against = df['mediumDangerShotsAgainst'] + df['highDangerShotsAgainst']
+    # Medium/high danger shots (for and against) in each game.
+    mh_for = df['mediumHighDangerShotsFor']
+    mh_against = df['mediumHighDangerShotsAgainst']
 
     r_for = df['reboundsFor']
     r_against = df['reboundsAgainst']
 
-    n = mh_for.size - 5
-    p = 0
-
-    for i in range(6, n):
+    # Count the games in each window that favoured each side.
+    game_for = np.logical_and(mh_for > mh_against, r_for < r_against).to_numpy()
+    game_against = np.logical_and(mh_for < mh_against, r_for > r_against).to_numpy()
 
-        success_for = 0
-        success_against = 0
-
-        for j in range(1, 6):
-            if mh_for[i - j] > mh_against[i - j] and r_for[i - j] < r_against[i - j]:
-                success_for += 1
-            elif mh_for[i - j] < mh_against[i - j] and r_for[i - j] > r_against[i - j]:
-                success_against += 1
-
-        if df['goalsFor'][i] > df['goalsAgainst'][i] and success_for > success_against:
-            p += 1
-        elif df['goalsFor'][i] < df['goalsAgainst'][i] and success_for < success_against:
-            p += 1
+    n = mh_for.size - 5
+    correct = window_kernels.window_majority(df['goalsFor'].to_numpy(), df['goalsAgainst'].to_numpy(), game_for,
+                                             game_against)
 
-    print(p / n)
+    print(int(correct.sum()) / n)
 
 
 def last_five_wins(filepath, season_year):
@@ -303,111 +249,50 @@ def last_five_wins(filepath, season_year):
     """
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst'], season_year)
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst'], season_year)
 
-    g_for = df['goalsFor']
-    g_against = df['goalsAgainst']
+    g_for = df['goalsFor'].to_numpy()
+    g_against = df['goalsAgainst'].to_numpy()
 
     n = g_for.size - 5
-    p = 0
-
-    for i in range(6, n):
-
-        success_for = 0
-        success_against = 0
+    correct = window_kernels.window_majority(g_for, g_against, g_for > g_against, g_for < g_against)
 
-        for j in range(1, 6):
-            if g_for[i - j] > g_against[i - j]:
-                success_for += 1
-            elif g_for[i - j] < g_against[i - j]:
-                success_against += 1
-
-        if df['goalsFor'][i] > df['goalsAgainst'][i] and success_for > success_against:
-            p += 1
-        elif df['goalsFor'][i] < df['goalsAgainst'][i] and success_for < success_against:
-            p += 1
-
-    print(p / n)
+    print(int(correct.sum()) / n)
 
 
 def last_five_wins_split_season(filepath, season_year):
     """
     Calculate the percentage of winning games in the given season (except the first five games) where the winning team
     in this games had more wins in the previous five games. Prints this result split by half of the season (the first
-    half occurs before the all star game, and the second half occurs after).
+    half occurs before the all star game, and the second half occurs after). Games on dates outside the season's
+    calendar are left out of both halves.
 
     :param filepath: The filepath to the team that is being analyzed.
-    :param season_year: The season to be analyzed.
+    :param season_year: The season to be analyzed (it must be in season_calendar.CALENDAR).
     """
+    if season_year not in season_calendar.CALENDAR:
+        raise ValueError('No calendar data for the ' + str(season_year) + ' season')
 
     # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'goalsFor', 'goalsAgainst', 'gameDate'], season_year)
-
-    g_for = df['goalsFor']
-    g_against = df['goalsAgainst']
-
-    g_for_before = df.loc[df.gameDate < 20190126]
-    g_for_before = g_for_before['goalsFor']
+    df = feature_matrix.extract_features(filepath, ['goalsFor', 'goalsAgainst'], season_year)
 
-    g_for_after = df.loc[df.gameDate > 20190126]
-    g_for_after = g_for_after['goalsFor']
+    g_for = df['goalsFor'].to_numpy()
+    g_against = df['goalsAgainst'].to_numpy()
 
-    n = g_for.size - 5
-
-    n_before = 0
-    n_after = 0
-    p_before = 0
-    p_after = 0
-
-    for i in range(6, n):
-
-        success_for = 0
-        success_against = 0
-
-        if df['gameDate'][i] < 20190126:
-            n_before += 1
-        else:
-            n_after += 1
-
-        for j in range(1, 6):
-            if g_for[i - j] > g_against[i - j]:
-                success_for += 1
-            elif g_for[i - j] < g_against[i - j]:
-                success_against += 1
-
-        if df['goalsFor'][i] > df['goalsAgainst'][i] and success_for > success_against:
-            if df['gameDate'][i] < 20190126:
-                p_before += 1
-            else:
-                p_after += 1
-        elif df['goalsFor'][i] < df['goalsAgainst'][i] and success_for < success_against:
-            if df['gameDate'][i] < 20190126:
-                p_before += 1
-            else:
-                p_after += 1
-
-    print('Before all-star game: ' + str(p_before / n_before))
-    print('After all-star game: ' + str(p_after / n_after))
-
-
-def extract_data(filepath, columns, season_year):
-    """
-    Extract the relevant data from the CSV file. Games are indexed by their ID automatically (do not pass in as column).
-
-    :param filepath: The path that contains the hockey data.
-    :param columns: The column names that should be included.
-    :param season_year: The season to be included.
-    :return: A DataFrame containing only the relevant rows and columns.
-    """
+    correct = window_kernels.window_majority(g_for, g_against, g_for > g_against, g_for < g_against)
 
-    # Extract relevant columns.
-    df = pd.read_csv(filepath_or_buffer=filepath, delimiter=',', header=0, usecols=columns.append('gameId'))
+    # Split the predicted games by whether they were played before the all star break of their season.
+    segments = season_calendar.segments(df['gameDate'].to_numpy()[window_kernels.predicted_games(g_for.size)])
+    before = segments == season_calendar.SEGMENTS.index('beforeAllStarBreak')
+    after = segments > season_calendar.SEGMENTS.index('beforeAllStarBreak')
 
-    # Only extract the rows containing all data for each game.
-    df = df[np.logical_and(df.situation == 'all', df.season == season_year)]
+    n_before = int(before.sum())
+    n_after = int(after.sum())
+    p_before = int(correct[before].sum())
+    p_after = int(correct[after].sum())
 
-    df = df.reset_index()
-    return df
+    print('Before all-star game: ' + (str(p_before / n_before) if n_before else 'no games'))
+    print('After all-star game: ' + (str(p_after / n_after) if n_after else 'no games'))
 
 
 def get_file():
@@ -1,32 +1,32 @@
 import pandas as pd
 import numpy as np
 
+import game_query
+import moneypuck_db
+import moneypuck_schema
+import sorted_layout
+
 NUM_TEAMS = 31
 NUM_SEASON_YEARS = 10
 
+# Columns of all_teams.csv needed to produce a record.
+RECORD_COLUMNS = ['team', 'season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'playoffGame']
+
 teams = ['ANA', 'ARI', 'BOS', 'BUF', 'CAR', 'CBJ', 'CGY', 'CHI', 'COL', 'DAL', 'DET', 'EDM', 'FLA', 'L.A', 'MIN', 'MTL',
          'N.J', 'NSH', 'NYI', 'NYR', 'OTT', 'PHI', 'PIT', 'S.J', 'STL', 'T.B', 'TOR', 'VAN', 'VGK', 'WPG', 'WSH']
 
 
-def save_all_data(include_overtime=False):
+def save_all_data(include_overtime=False, chunksize=None):
     """
     Extracts information about the wins and losses of each NHL team season-by-season.
 
     :param include_overtime A boolean indicating whether games that went into overtime (but not shootout) should be
     included.
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file at once).
     """
 
-    # Extract relevant columns from the all_teams.csv file (which must be in the same folder as this script).
-    df = pd.read_csv(filepath_or_buffer='all_teams.csv', delimiter=',', header=0,
-                     usecols=['team', 'season', 'situation',
-                              'iceTime', 'goalsFor',
-                              'goalsAgainst', 'playoffGame'])
-
-    # Extract rows of games if the situation is 'all'.
-    if include_overtime:
-        df = df[np.logical_and(np.logical_and(df.situation == 'all', df.iceTime < 3900), df.playoffGame == 0)]
-    else:
-        df = df[np.logical_and(np.logical_and(df.situation == 'all', df.iceTime == 3600), df.playoffGame == 0)]
+    # Count the games and wins of every team-season in a single pass over all_teams.csv.
+    counts = record_counts(include_overtime, chunksize)
 
     # Create a list of lists with the collected data that we will write to an Excel spreadsheet at the end.
     collected_data = []
@@ -34,9 +34,10 @@ def save_all_data(include_overtime=False):
     # Generate the record for each team for the number of seasons specified since 2017.
     for team in teams:
         for year in range(2008, 2008 + NUM_SEASON_YEARS):
-            total_games = df.loc[np.logical_and(df.team == team, df.season == year)].shape[0]
-            wins = df.loc[np.logical_and(np.logical_and(df.team == team, df.season == year),
-                                         df.goalsFor > df.goalsAgainst)].shape[0]
+            if (team, year) in counts.index:
+                total_games, wins = counts.loc[(team, year), ['games', 'wins']]
+            else:
+                total_games, wins = 0, 0
             losses = total_games - wins
 
             # Some teams did not play in all seasons.
@@ -50,28 +51,19 @@ def save_all_data(include_overtime=False):
     df.to_csv('team_records.csv', encoding='utf-8')
 
 
-def produce_team_record(team, include_overtime=False):
+def produce_team_record(team, include_overtime=False, chunksize=None):
     """
     Extracts information about the wins and losses of the specified team season-by-season.
 
     :param team: The team of interest.
     :param include_overtime A boolean indicating whether games that went into overtime (but not shootout) should be
     included.
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file at once).
     :return: A list of lists containing wins, losses, and win percentage for the specified team.
     """
 
-    # Extract relevant columns from the all_teams.csv file (which must be in the same folder as this script).
-    df = pd.read_csv(filepath_or_buffer='all_teams.csv', delimiter=',', header=0,
-                     usecols=['team', 'season', 'situation',
-                              'iceTime', 'goalsFor',
-                              'goalsAgainst', 'playoffGame'])
-
-    # Extract rows of games that didn't go into overtime if the situation is 'all'.
-    if include_overtime:
-        df = df[np.logical_and(np.logical_and(df.situation == 'all', df.iceTime < 3900), df.playoffGame == 0)]
-    else:
-        df = df[np.logical_and(np.logical_and(df.situation == 'all', df.iceTime == 3600), df.playoffGame == 0)]
-    df = df[df.team == team]
+    # Extract the rows of this team's games that didn't go into overtime (situation 'all') from all_teams.csv.
+    df = regular_season_rows(include_overtime, team=team, chunksize=chunksize)
 
     # Create a list of lists with the collected data that we will return.
     collected_data = []
@@ -91,28 +83,19 @@ def produce_team_record(team, include_overtime=False):
     return collected_data
 
 
-def produce_all_team_records_by_year(year, include_overtime=False):
+def produce_all_team_records_by_year(year, include_overtime=False, chunksize=None):
     """
     Extracts information about the wins and losses of each individual team (in alphabetical order) season-by-season.
 
     :param year: The year of interest.
     :param include_overtime A boolean indicating whether games that went into overtime (but not shootout) should be
     included.
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file at once).
     :return: A list of lists containing wins, losses, and win percentage for each team during the specified year.
     """
 
-    # Extract relevant columns from the all_teams.csv file (which must be in the same folder as this script).
-    df = pd.read_csv(filepath_or_buffer='all_teams.csv', delimiter=',', header=0,
-                     usecols=['team', 'season', 'situation',
-                              'iceTime', 'goalsFor',
-                              'goalsAgainst', 'playoffGame'])
-
-    # Extract rows of games if the situation is 'all'.
-    if include_overtime:
-        df = df[np.logical_and(np.logical_and(df.situation == 'all', df.iceTime < 3900), df.playoffGame == 0)]
-    else:
-        df = df[np.logical_and(np.logical_and(df.situation == 'all', df.iceTime == 3600), df.playoffGame == 0)]
-    df = df[df.season == year]
+    # Extract the rows of games in this season if the situation is 'all' from all_teams.csv.
+    df = regular_season_rows(include_overtime, year=year, chunksize=chunksize)
 
     # Create a list of lists with the collected data that we will return.
     collected_data = []
@@ -132,7 +115,7 @@ def produce_all_team_records_by_year(year, include_overtime=False):
     return collected_data
 
 
-def produce_num_of_wins(team, year, include_overtime=False):
+def produce_num_of_wins(team, year, include_overtime=False, chunksize=None):
     """
     Return the number of wins for the specified team in the specified season.
 
@@ -140,21 +123,72 @@ def produce_num_of_wins(team, year, include_overtime=False):
     :param year: The season year to be analyzed for this team.
     :param include_overtime A boolean indicating whether games that went into overtime (but not shootout) should be
     included.
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file at once).
     :return: The number of wins for this team in this season.
     """
 
-    # Extract relevant columns from the all_teams.csv file (which must be in the same folder as this script).
-    df = pd.read_csv(filepath_or_buffer='all_teams.csv', delimiter=',', header=0,
-                     usecols=['team', 'season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'playoffGame'])
-
-    # Extract rows of games if the situation is 'all'.
-    if include_overtime:
-        df = df[np.logical_and(np.logical_and(df.situation == 'all', df.iceTime < 3900), df.playoffGame == 0)]
-    else:
-        df = df[np.logical_and(np.logical_and(df.situation == 'all', df.iceTime == 3600), df.playoffGame == 0)]
-    df = df[df.team == team]
+    # Extract the rows of this team's games in this season if the situation is 'all' from all_teams.csv.
+    df = regular_season_rows(include_overtime, team=team, year=year, chunksize=chunksize)
     return df.loc[np.logical_and(df.season == year, df.goalsFor > df.goalsAgainst)].shape[0]
 
 
+def regular_season_rows(include_overtime=False, team=None, year=None, chunksize=None):
+    """
+    Returns the 'all' situation rows of regular season games in all_teams.csv, optionally restricted to one team and/or
+    one season. The rows come from the indexed database or the sorted layout if one of them is enabled.
+
+    :param include_overtime A boolean indicating whether games that went into overtime (but not shootout) should be
+    included.
+    :param team: The three-letter name of the team (None for all teams).
+    :param year: The season year (None for all seasons).
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file at once).
+    :return: A DataFrame containing the RECORD_COLUMNS of the matching rows.
+    """
+    return regular_season_query(include_overtime, team=team, year=year).rows(chunksize)
+
+
+def regular_season_query(include_overtime=False, team=None, year=None):
+    """
+    Returns a query selecting the 'all' situation rows of regular season games, optionally restricted to one team
+    and/or one season. Restricting the query keeps the rows held in memory small when streaming in chunks.
+
+    :param include_overtime A boolean indicating whether games that went into overtime (but not shootout) should be
+    included.
+    :param team: The three-letter name of the team (None for all teams).
+    :param year: The season year (None for all seasons).
+    :return: A GameQuery of the RECORD_COLUMNS of the matching rows.
+    """
+    query = game_query.GameQuery('all_teams.csv').select(*RECORD_COLUMNS).situation('all').regular_season()
+    query = query.no_shootouts() if include_overtime else query.regulation_only()
+    if team is not None:
+        query = query.team(team)
+    if year is not None:
+        query = query.season(year)
+    return query
+
+
+def record_counts(include_overtime=False, chunksize=None):
+    """
+    Counts the games and wins of every team-season in all_teams.csv. In chunked streaming mode the counts of each chunk
+    are combined per (team, season), so only one chunk of the file is in memory at once.
+
+    :param include_overtime A boolean indicating whether games that went into overtime (but not shootout) should be
+    included.
+    :param chunksize: The number of rows of all_teams.csv read at a time (None reads the whole file at once).
+    :return: A DataFrame indexed by (team, season) with 'games' and 'wins' columns.
+    """
+    query = regular_season_query(include_overtime)
+
+    def aggregate(df):
+        df = df[query.mask(df)]
+        counts = pd.DataFrame({'games': 1, 'wins': (df.goalsFor > df.goalsAgainst).astype('int64')}, index=df.index)
+        return counts.groupby([df.team.astype(str), df.season.astype('int64')]).sum()
+
+    if chunksize is None or moneypuck_db.USE_DATABASE or sorted_layout.USE_LAYOUT:
+        return aggregate(query.rows())
+
+    return moneypuck_schema.aggregate_chunks('all_teams.csv', RECORD_COLUMNS, aggregate, chunksize).astype('int64')
+
+
 if __name__ == "__main__":
     save_all_data(True)
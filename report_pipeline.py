@@ -0,0 +1,163 @@
+import multiprocessing
+import queue
+import threading
+import traceback
+
+import pandas as pd
+
+# Number of finished sheets that can wait for the writer. Workers block once the queue is full, so finished sheets
+# never pile up in memory faster than they are written.
+QUEUE_SIZE = 4
+
+# Seconds the writer waits for a finished sheet before checking that the workers are still running.
+POLL_SECONDS = 1
+
+
+def run(workbooks, processes=None, queue_size=QUEUE_SIZE):
+    """
+    Produces several Excel workbooks at once. The sheets of every workbook are computed in worker processes while a
+    writer thread writes the finished sheets, so computing and writing overlap. Each workbook gets its sheets in the
+    order they are listed and is closed as soon as its last sheet is written.
+
+    :param workbooks: A list of (filename, sheets) tuples, where sheets is a list of (sheet name, function, arguments)
+    tuples. Each function must be defined at the top level of a module and return a DataFrame.
+    :param processes: The number of worker processes (None uses one per CPU).
+    :param queue_size: The number of finished sheets that can wait for the writer.
+    """
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue(queue_size)
+
+    count = 0
+    for w, (_, sheets) in enumerate(workbooks):
+        for s, (_, function, args) in enumerate(sheets):
+            tasks.put((w, s, function, args))
+            count += 1
+
+    processes = min(processes or multiprocessing.cpu_count(), max(count, 1))
+    for _ in range(processes):
+        tasks.put(None)
+
+    workers = [multiprocessing.Process(target=work, args=(tasks, results), daemon=True) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+
+    failures = []
+    writer = threading.Thread(target=write, args=(workbooks, results, count, failures, workers))
+    writer.start()
+
+    # The writer consumes every result (even after a failed write) or stops once the workers have exited, so no worker
+    # stays blocked on a full queue. Workers still running after the writer stopped are stopped too.
+    writer.join()
+    for worker in workers:
+        stopped = worker.is_alive()
+        if stopped:
+            worker.terminate()
+        worker.join()
+        if not stopped and worker.exitcode != 0:
+            failures.append('A worker exited with code ' + str(worker.exitcode))
+
+    if failures:
+        raise RuntimeError('Sheets failed:\n' + '\n'.join(failures))
+
+
+def work(tasks, results):
+    """
+    Worker loop: computes sheets until it receives None.
+
+    :param tasks: The queue of (workbook index, sheet index, function, arguments) tuples.
+    :param results: The bounded queue the finished sheets are put on, as (workbook index, sheet index, DataFrame or
+    error message) tuples.
+    """
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        w, s, function, args = task
+        try:
+            results.put((w, s, function(*args)))
+        except Exception:
+            results.put((w, s, traceback.format_exc()))
+
+
+def write(workbooks, results, count, failures, workers):
+    """
+    Writer loop: writes sheets as they arrive. Sheets that arrive before an earlier sheet of the same workbook wait
+    until it is written. A workbook that cannot be written (e.g., the file is open elsewhere or the disk is full) is
+    given up, but the loop keeps receiving the other sheets so the workers are never left blocked.
+
+    :param workbooks: The workbooks passed to run.
+    :param results: The queue of finished sheets.
+    :param count: The number of sheets to receive.
+    :param failures: A list the error messages of failed sheets are appended to.
+    :param workers: The worker processes (the loop stops if one of them crashes, or all of them exit, before every
+    sheet is received).
+    """
+    writers = {}
+    failed = set()
+    pending = {w: {} for w in range(len(workbooks))}
+    written = {w: 0 for w in range(len(workbooks))}
+
+    received = 0
+    while received < count:
+        try:
+            w, s, sheet = results.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+
+            # A worker that crashed may have left the queues locked, so the others cannot be relied on either.
+            if any(worker.exitcode not in [None, 0] for worker in workers) or \
+                    not any(worker.is_alive() for worker in workers):
+                failures.append('The workers exited before ' + str(count - received) + ' sheets were finished')
+                break
+            continue
+        received += 1
+
+        filename, sheets = workbooks[w]
+        if isinstance(sheet, str):
+            failures.append(filename + ' - ' + sheets[s][0] + ':\n' + sheet)
+            sheet = None
+        pending[w][s] = sheet
+
+        # Write the sheets of this workbook that are next in order.
+        while written[w] in pending[w]:
+            sheet = pending[w].pop(written[w])
+            name = sheets[written[w]][0]
+            written[w] += 1
+            if sheet is None or w in failed:
+                continue
+            try:
+                if w not in writers:
+                    writers[w] = pd.ExcelWriter(filename)
+                sheet.to_excel(writers[w], sheet_name=name)
+            except Exception:
+                failures.append(filename + ' - ' + name + ' (writing):\n' + traceback.format_exc())
+                failed.add(w)
+
+        if written[w] == len(sheets) and w in writers:
+            close(workbooks, writers, w, failed, failures)
+
+    # Workbooks still open are missing sheets whose workers exited.
+    for w in list(writers):
+        failed.add(w)
+        close(workbooks, writers, w, failed, failures)
+
+
+def close(workbooks, writers, w, failed, failures):
+    """
+    Closes the file of a workbook, recording an error if it cannot be saved.
+
+    :param workbooks: The workbooks passed to run.
+    :param writers: The open ExcelWriter of each workbook.
+    :param w: The index of the workbook.
+    :param failed: The set of indices of the workbooks that could not be written.
+    :param failures: A list the error messages are appended to.
+    """
+    filename = workbooks[w][0]
+    try:
+        writers.pop(w).close()
+    except Exception:
+        if w not in failed:
+            failures.append(filename + ' (saving):\n' + traceback.format_exc())
+        return
+    if w not in failed:
+        print('Saved ' + filename)
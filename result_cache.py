@@ -0,0 +1,187 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import time
+
+CACHE_FILE = 'results_cache.sqlite'
+
+# The least recently used results are evicted once the stored results take up more than this many bytes.
+MAX_BYTES = 256 * 2 ** 20
+
+# Seconds a process waits for another process holding the database lock.
+LOCK_TIMEOUT = 60
+
+# Directory of the analysis modules, and the import statements (at any indentation) whose local modules are part of
+# the code a result depends on.
+CODE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+IMPORT_PATTERN = re.compile(r'^[ \t]*(?:from|import)[ \t]+(\w+)', re.MULTILINE)
+
+# Code hashes computed by this process (the code a process runs does not change while it runs).
+code_hashes = {}
+
+# Open connection of this process (a forked process opens its own).
+connection = None
+connection_pid = None
+
+
+def cached(name, params, files, compute, modules=()):
+    """
+    Returns the stored result of a computation, computing and storing it if it has not been stored yet. Results are
+    keyed by the name of the computation, its parameters, the contents of its input files and the source code of its
+    modules, so editing or replacing a data file or the code automatically invalidates every result computed from it.
+
+    :param name: The name of the computation (e.g., the name of the function being cached).
+    :param params: A dictionary of the parameters of the computation (test id, team, season, weights, window, etc.).
+    :param files: A list of paths to the input files the computation reads.
+    :param compute: A function with no arguments that computes the result if it is not stored.
+    :param modules: The names of the modules that compute the result (the local modules they import are included).
+    :return: The (possibly stored) result.
+    """
+    key = result_key(name, dict(params, code=code_hash(modules)) if modules else params, files)
+    db = open_cache()
+
+    row = db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+    if row is not None:
+        with db:
+            db.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        return pickle.loads(row[0])
+
+    result = compute()
+    value = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+
+    with db:
+        db.execute('INSERT OR REPLACE INTO results (key, name, value, size, last_used) VALUES (?, ?, ?, ?, ?)',
+                   (key, name, value, len(value), time.time()))
+    evict(db)
+    return result
+
+
+def result_key(name, params, files):
+    """
+    Returns the key identifying a computation.
+
+    :param name: The name of the computation.
+    :param params: A dictionary of the parameters of the computation.
+    :param files: A list of paths to the input files the computation reads.
+    :return: A hexadecimal string.
+    """
+    parts = [name] + [str(k) + '=' + repr(params[k]) for k in sorted(params)] + [file_hash(f) for f in files]
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def code_hash(modules):
+    """
+    Returns a hash of the source code of modules and of every local module they import, directly or not.
+
+    :param modules: A list of module names.
+    :return: A hexadecimal string.
+    """
+    key = tuple(sorted(modules))
+    if key not in code_hashes:
+        parts = [name + '=' + file_hash(path) for name, path in local_modules(modules)]
+        code_hashes[key] = hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+    return code_hashes[key]
+
+
+def local_modules(modules):
+    """
+    Finds the source files of modules and of every local module they import, directly or not (including imports inside
+    functions). Modules that are not in CODE_DIRECTORY, such as pandas, are left out.
+
+    :param modules: A list of module names.
+    :return: A sorted list of (module name, path) tuples.
+    """
+    found = {}
+    todo = list(modules)
+    while todo:
+        name = todo.pop()
+        path = os.path.join(CODE_DIRECTORY, name + '.py')
+        if name in found or not os.path.exists(path):
+            continue
+        found[name] = path
+        with open(path, encoding='utf-8') as f:
+            todo.extend(IMPORT_PATTERN.findall(f.read()))
+    return sorted(found.items())
+
+
+def file_hash(path):
+    """
+    Returns a hash of the contents of a file. The hash is stored with the file's size and modification time, so a file
+    is only read again once it has changed.
+
+    :param path: The path to the file.
+    :return: A hexadecimal string.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    db = open_cache()
+
+    row = db.execute('SELECT hash FROM files WHERE path = ? AND mtime_ns = ? AND size = ?',
+                     (path, stat.st_mtime_ns, stat.st_size)).fetchone()
+    if row is not None:
+        return row[0]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2 ** 20), b''):
+            digest.update(block)
+
+    with db:
+        db.execute('INSERT OR REPLACE INTO files (path, mtime_ns, size, hash) VALUES (?, ?, ?, ?)',
+                   (path, stat.st_mtime_ns, stat.st_size, digest.hexdigest()))
+    return digest.hexdigest()
+
+
+def evict(db):
+    """
+    Deletes the least recently used results until the stored results fit in MAX_BYTES.
+
+    :param db: The open cache database.
+    """
+    with db:
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= MAX_BYTES:
+            return
+
+        expired = []
+        for key, size in db.execute('SELECT key, size FROM results ORDER BY last_used'):
+            if total <= MAX_BYTES:
+                break
+            expired.append((key,))
+            total -= size
+        db.executemany('DELETE FROM results WHERE key = ?', expired)
+
+
+def clear():
+    """
+    Deletes every stored result.
+    """
+    db = open_cache()
+    with db:
+        db.execute('DELETE FROM results')
+        db.execute('DELETE FROM files')
+
+
+def open_cache():
+    """
+    Opens the cache database (once per process). The database uses write-ahead logging so that several processes can
+    read and write results at the same time.
+
+    :return: An sqlite3 connection.
+    """
+    global connection, connection_pid
+
+    if connection is None or connection_pid != os.getpid():
+        connection = sqlite3.connect(CACHE_FILE, timeout=LOCK_TIMEOUT)
+        connection_pid = os.getpid()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, name TEXT, value BLOB, '
+                               'size INTEGER, last_used REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+            connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, '
+                               'size INTEGER, hash TEXT)')
+    return connection
@@ -1,6 +1,13 @@
+import multiprocessing
+
 import pandas as pd
 
+import hypothesis_cube
+import lookup
 import produce_team_record
+import report_pipeline
+import result_cache
+import significance_tests
 import single_var_hypothesis_tests as hyp_tests
 
 NUM_TEAMS = 31
@@ -30,143 +37,254 @@ tests = {
     16: lambda filepath, season: hyp_tests.single_col_for_and_against(filepath, season, 'rebounds')
 }
 
+# Define a dictionary containing the comparison behind each of the hypothesis tests (same keys as tests).
+comparisons = {
+    1: lambda filepath, season: hyp_tests.single_col_comparison(filepath, season, 'shotsOnGoal'),
+    2: lambda filepath, season: hyp_tests.single_col_comparison(filepath, season, 'highDangerShots'),
+    3: lambda filepath, season: hyp_tests.single_col_comparison(filepath, season, 'mediumDangerShots'),
+    4: lambda filepath, season: hyp_tests.single_col_comparison(filepath, season, 'lowDangerShots'),
+    5: lambda filepath, season: hyp_tests.high_and_med_danger_comparison(filepath, season),
+    6: lambda filepath, season: hyp_tests.high_and_low_danger_comparison(filepath, season),
+    7: lambda filepath, season: hyp_tests.low_danger_and_rebounds_sum_comparison(filepath, season),
+    8: lambda filepath, season: hyp_tests.rebounds_and_low_danger_shots_ratio_comparison(filepath, season),
+    9: lambda filepath, season: hyp_tests.time_on_power_play_comparison(filepath, season),
+    10: lambda filepath, season: hyp_tests.medium_and_high_danger_and_rebounds_sum_comparison(filepath, season),
+    11: lambda filepath, season: hyp_tests.rebounds_and_medium_and_high_danger_shots_ratio_comparison(filepath, season),
+    12: lambda filepath, season: hyp_tests.single_col_comparison(filepath, season, 'takeaways'),
+    13: lambda filepath, season: hyp_tests.single_col_comparison(filepath, season, 'penalityMinutes'),
+    14: lambda filepath, season: hyp_tests.single_col_comparison(filepath, season, 'penalties'),
+    15: lambda filepath, season: hyp_tests.playoff_shots_on_goal_comparison(filepath, season),
+    16: lambda filepath, season: hyp_tests.single_col_comparison(filepath, season, 'rebounds')
+}
+
+
+def save_reports(processes=None):
+    """
+    Produces the workbooks of team_by_team and year_by_year in one run. The results of the hypothesis tests are
+    computed (or loaded) first, and the sheets of both workbooks are rendered from them in worker processes while the
+    finished ones are written.
+
+    :param processes: The number of worker processes (None uses one per CPU).
+    """
+    results_cube(processes)
+    report_pipeline.run([team_workbook(), year_workbook()], processes)
+
+
+def results_cube(processes=None):
+    """
+    Returns the results of every hypothesis test for each team during each season (see hypothesis_cube), running the
+    tests that have not been run on the same data yet. The Excel workbooks are views of these results.
+
+    :param processes: The number of worker processes used if the results are computed (None uses one per CPU).
+    :return: A HypothesisCube.
+    """
+    return hypothesis_cube.load(range(1, hyp_tests.TOTAL_OPTIONS), teams, range(2008, 2008 + NUM_SEASON_YEARS),
+                                processes)
+
 
-def team_by_team():
+def team_by_team(processes=None):
     """
     Performs hypothesis tests in single_var_hypothesis_tests.py for each team during each season. The Excel file
     contains sheets with each of the team names and has the following columns within each sheet: Year, Wins, Losses,
     Win Percentage, n-value, p-value.
+
+    :param processes: The number of worker processes (None uses one per CPU).
     """
+    results_cube(processes)
+    report_pipeline.run([team_workbook()], processes)
+
 
-    # Open up the Excel file and create a writer for the new data we are producing.
-    xls = pd.ExcelFile('Hypothesis Tests.xlsx')
-    writer = pd.ExcelWriter('Produced Hypothesis Tests.xlsx')
+def team_workbook():
+    """
+    Returns the workbook produced by team_by_team for report_pipeline.
 
-    # Produce the data for each sheet.
-    for team in teams:
-        sheet = pd.read_excel(xls, team, header=2)
+    :return: A tuple containing the filename and a list of (sheet name, function, arguments) tuples.
+    """
+    return 'Produced Hypothesis Tests.xlsx', [(team, team_sheet, (team,)) for team in teams]
 
-        # List of lists that we will place into the sheet.
-        n_values = []
-        p_values = []
 
-        # Run each hypothesis test for every season year.
-        for i in range(1, hyp_tests.TOTAL_OPTIONS):
-            f = tests.get(i)
+def team_sheet(team):
+    """
+    Produces the sheet of a team in the workbook of team_by_team.
 
-            for year in range(2008, 2008 + NUM_SEASON_YEARS):
-                print(team + ' ' + str(year) + ' ' + str(i))
-                results = f(team + '.csv', year)
+    :param team: The name of the team (or all_teams).
+    :return: The sheet as a DataFrame.
+    """
+    sheet = pd.read_excel('Hypothesis Tests.xlsx', team, header=2)
+    cube = results_cube().sel(team=team)
+
+    # List of lists that we will place into the sheet: the results of every season for each hypothesis test, with an
+    # empty row between each hypothesis test.
+    n_values = []
+    p_values = []
+    for n, p in zip(cube.metric('n')[:, 0, :], cube.metric('p')[:, 0, :]):
+        n_values.extend([int(value) for value in n] + [[]])
+        p_values.extend([float(value) for value in p] + [[]])
+
+    # Produce the team record and add it to the sheet.
+    if team != 'all_teams':
+        team_record = lookup.team_record(team)
+        team_record.append([])
+        team_record = team_record * hyp_tests.TOTAL_OPTIONS
+        tr = pd.DataFrame(team_record, columns=['Wins', 'Losses', 'Win Percentage'])
+
+        sheet['Wins'] = tr['Wins']
+        sheet['Losses'] = tr['Losses']
+        sheet['Win Percentage'] = tr['Win Percentage']
+
+    # Add the produced n and p values to the sheet.
+    sheet['n-value'] = pd.Series(n_values)
+    sheet['p-value'] = pd.Series(p_values)
+    return sheet
+
+
+def year_by_year(processes=None):
+    """
+    Performs hypothesis tests in single_var_hypothesis_tests.py for each team during each season. The Excel file
+    contains sheets with each of the years and has the following columns within each sheet: Wins, Losses,
+    Win Percentage, n-value, p-value.
 
-                # Get the n and p values to put into the spreadsheet.
-                if results.shape[0] != 0:
+    :param processes: The number of worker processes (None uses one per CPU).
+    """
+    results_cube(processes)
+    report_pipeline.run([year_workbook()], processes)
 
-                    if team == 'all_teams':
-                        n = results.size / 2
-                        p = float(results.sum()) / n
-                    else:
-                        n = results.size
-                        p = float(results.sum()) / produce_team_record.produce_num_of_wins(team, year)
-                else:
-                    n = 0
-                    p = 0
 
-                n_values.append(n)
-                p_values.append(p)
+def year_workbook():
+    """
+    Returns the workbook produced by year_by_year for report_pipeline.
 
-            # Account for an empty row between each hypothesis test.
-            n_values.append([])
-            p_values.append([])
+    :return: A tuple containing the filename and a list of (sheet name, function, arguments) tuples.
+    """
+    return 'Produced Hypothesis Tests By Year.xlsx', [(str(year), year_sheet, (year,))
+                                                      for year in range(2008, 2008 + NUM_SEASON_YEARS)]
 
-        # Produce the team record and add it to the sheet.
-        if team != 'all_teams':
-            team_record = produce_team_record.produce_team_record(team)
-            team_record.append([])
-            team_record = team_record * hyp_tests.TOTAL_OPTIONS
-            tr = pd.DataFrame(team_record, columns=['Wins', 'Losses', 'Win Percentage'])
 
-            sheet['Wins'] = tr['Wins']
-            sheet['Losses'] = tr['Losses']
-            sheet['Win Percentage'] = tr['Win Percentage']
+def year_sheet(year):
+    """
+    Produces the sheet of a season in the workbook of year_by_year.
 
-        # Add the produced n and p values to the sheet.
-        sheet['n-value'] = pd.Series(n_values)
-        sheet['p-value'] = pd.Series(p_values)
-        sheet.to_excel(writer, sheet_name=team)
+    :param year: The season year.
+    :return: The sheet as a DataFrame.
+    """
+    sheet = pd.read_excel('Hypothesis Tests.xlsx', str(year), header=0)
+
+    # List of lists that we will place into the sheet.
+    n_values = []
+    p_values = []
+
+    # Produce the team record and add it to the sheet...skip all_teams.
+    for team in teams[1:]:
+        team_record = result_cache.cached('produce_all_team_records_by_year', {'year': year}, ['all_teams.csv'],
+                                          lambda: produce_team_record.produce_all_team_records_by_year(
+                                              year, chunksize=hyp_tests.CHUNK_SIZE), ['produce_team_record'])
+        team_record.append([])
+        team_record.append([])
+        team_record = team_record * hyp_tests.TOTAL_OPTIONS
+        tr = pd.DataFrame(team_record, columns=['Wins', 'Losses', 'Win Percentage'])
+
+        sheet['Wins'] = tr['Wins']
+        sheet['Losses'] = tr['Losses']
+        sheet['Win Percentage'] = tr['Win Percentage']
+
+    # Add the results of each team (excluding all_teams) for every hypothesis test, with two empty rows between each
+    # hypothesis test.
+    cube = results_cube().sel(team=teams[1:], season=year)
+    for n, p in zip(cube.metric('n')[:, :, 0], cube.metric('p')[:, :, 0]):
+        n_values.extend([int(value) for value in n] + [[], []])
+        p_values.extend([float(value) for value in p] + [[], []])
+
+    # Add the produced n and p values to the sheet.
+    sheet['n-value'] = pd.Series(n_values)
+    sheet['p-value'] = pd.Series(p_values)
+    return sheet
+
+
+def test_counts(i, team, year):
+    """
+    Runs a hypothesis test for a team during a season, or returns its stored counts if the test was already run on the
+    same data.
 
-    writer.save()
+    :param i: The number of the hypothesis test (a key of tests).
+    :param team: The name of the team (or all_teams).
+    :param year: The season year.
+    :return: A tuple containing the number of results and the number of successes.
+    """
+    return lookup.test_counts(i, team, year)
 
 
-def year_by_year():
+def num_of_wins(team, year):
     """
-    Performs hypothesis tests in single_var_hypothesis_tests.py for each team during each season. The Excel file
-    contains sheets with each of the years and has the following columns within each sheet: Wins, Losses,
-    Win Percentage, n-value, p-value.
+    Returns the number of wins for a team during a season, or its stored value if it was already computed on the same
+    data.
+
+    :param team: The three-letter name of the team.
+    :param year: The season year.
+    :return: The number of wins for this team in this season.
     """
+    return lookup.num_of_wins(team, year)
 
-    # Open up the Excel file and create a writer for the new data we are producing.
-    xls = pd.ExcelFile('Hypothesis Tests.xlsx')
-    writer = pd.ExcelWriter('Produced Hypothesis Tests By Year.xlsx')
 
-    # Produce the data for each sheet.
-    for year in range(2008, 2008 + NUM_SEASON_YEARS):
-        sheet = pd.read_excel(xls, str(year), header=0)
+def save_significance(resamples=significance_tests.RESAMPLES, seed=0, processes=None):
+    """
+    Tests the significance of every hypothesis test for each team during each season and saves the results in a CSV
+    file with the following columns: Test, Team, Year, n-value, Successes, p-value, Expected p-value, Permutation
+    p-value, CI Low, CI High.
 
-        # List of lists that we will place into the sheet.
-        n_values = []
-        p_values = []
+    :param resamples: The number of permutation and bootstrap resamples for each result.
+    :param seed: An int seed that makes the resamples reproducible.
+    :param processes: The number of worker processes (None uses one per CPU).
+    """
+    significance_matrix(resamples, seed, processes).to_csv('Hypothesis Significance.csv', encoding='utf-8')
 
-        # Produce the team record and add it to the sheet...skip all_teams.
-        for team in teams[1:]:
-            team_record = produce_team_record.produce_all_team_records_by_year(year)
-            team_record.append([])
-            team_record.append([])
-            team_record = team_record * hyp_tests.TOTAL_OPTIONS
-            tr = pd.DataFrame(team_record, columns=['Wins', 'Losses', 'Win Percentage'])
 
-            sheet['Wins'] = tr['Wins']
-            sheet['Losses'] = tr['Losses']
-            sheet['Win Percentage'] = tr['Win Percentage']
+def significance_matrix(resamples=significance_tests.RESAMPLES, seed=0, processes=None):
+    """
+    Runs the permutation test and bootstrap for every hypothesis test, team and season. The team-seasons are spread
+    over a pool of worker processes, and each one draws its resamples from its own seeded stream.
 
-        # Run each hypothesis test for each team in this year.
-        for i in range(1, hyp_tests.TOTAL_OPTIONS):
-            f = tests.get(i)
+    :param resamples: The number of permutation and bootstrap resamples for each result.
+    :param seed: An int seed that makes the resamples reproducible.
+    :param processes: The number of worker processes (None uses one per CPU).
+    :return: A DataFrame with one row per hypothesis test, team and season.
+    """
+    tasks = [(i, team_index, year, resamples, seed) for i in comparisons for team_index in range(len(teams))
+             for year in range(2008, 2008 + NUM_SEASON_YEARS)]
 
-            # We want to exclude all_teams from this analysis.
-            for team in teams[1:]:
+    with multiprocessing.Pool(processes) as pool:
+        rows = pool.map(significance_task, tasks, chunksize=NUM_SEASON_YEARS)
 
-                print(str(year) + ' ' + team + ' ' + str(i))
-                results = f(team + '.csv', year)
+    return pd.DataFrame(rows, columns=['Test', 'Team', 'Year', 'n-value', 'Successes', 'p-value', 'Expected p-value',
+                                       'Permutation p-value', 'CI Low', 'CI High'])
 
-                # Get the n and p values to put into the spreadsheet.
-                if results.shape[0] != 0:
 
-                    if team == 'all_teams':
-                        n = results.size / 2
-                        p = float(results.sum()) / n
-                    else:
-                        n = results.size
-                        p = float(results.sum()) / produce_team_record.produce_num_of_wins(team, year)
-                else:
-                    n = 0
-                    p = 0
+def significance_task(task):
+    """
+    Tests the significance of one hypothesis test for one team during one season.
 
-                n_values.append(n)
-                p_values.append(p)
+    :param task: A tuple containing the test number, the index of the team, the season, the number of resamples and
+    the seed.
+    :return: A list with the test, team, year, n-value, number of successes, p-value, expected p-value, permutation
+    p-value and bootstrap confidence interval (None for everything after the year if the team has no wins).
+    """
+    i, team_index, year, resamples, seed = task
+    filepath = teams[team_index] + '.csv'
 
-            # Account for an empty row between each hypothesis test.
-            n_values.append([])
-            n_values.append([])
-            p_values.append([])
-            p_values.append([])
+    def run_test():
+        outcomes, league_wide = significance_tests.game_outcomes(filepath, *comparisons.get(i)(filepath, year))
+        return significance_tests.test_significance(outcomes, league_wide,
+                                                    significance_tests.task_rng(seed, i, team_index, year), resamples)
 
-        # Add the produced n and p values to the sheet.
-        sheet['n-value'] = pd.Series(n_values)
-        sheet['p-value'] = pd.Series(p_values)
-        sheet.to_excel(writer, sheet_name=str(year))
+    result = result_cache.cached('significance', {'test': i, 'team': teams[team_index], 'season': year,
+                                                  'resamples': resamples, 'seed': seed},
+                                 [filepath, 'all_teams.csv'], run_test, ['save_hypothesis_tests'])
 
-    writer.save()
+    row = [i, teams[team_index], year]
+    if not result:
+        return row + [None] * 7
+    return row + [result['n'], result['successes'], result['p'], result['expected p'], result['p-value'],
+                  result['ci low'], result['ci high']]
 
 
 if __name__ == "__main__":
-    year_by_year()
+    save_reports()
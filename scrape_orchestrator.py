@@ -0,0 +1,282 @@
+import queue
+import threading
+import time
+
+import NHL_data_web_scraper as scraper
+
+# Number of pages downloaded at the same time.
+WORKERS = 4
+
+# Requests per minute allowed across all workers (hockey-reference.com asks for at most 20).
+REQUESTS_PER_MINUTE = 20
+
+# Seconds between progress reports (the final report is always printed).
+PROGRESS_INTERVAL = 10
+
+# Work is done in this order: season pages first (they create the rest of the work), then the box scores of the
+# earliest requested season, so that seasons are finished and saved one after another.
+SEASON_PRIORITY = 0
+GAME_PRIORITY = 1
+
+
+def main():
+    """
+    Scrapes the penalties of a range of seasons entered by the user and saves each season as penalties_YYYY.csv.
+    """
+    first_year = read_year('Please enter the first year to scrape: ')
+    last_year = read_year('Please enter the last year to scrape: ')
+    try:
+        scrape_seasons(range(first_year, last_year + 1))
+    except RuntimeError as e:
+        print(e)
+
+
+def read_year(prompt):
+    """
+    Asks the user for a season year until a valid one is entered.
+
+    :param prompt: The prompt shown to the user.
+    :return: The year the season ends in (YYYY).
+    """
+    while True:
+        try:
+            year = int(input(prompt))
+            if year < scraper.FIRST_YEAR or year > scraper.LAST_YEAR:
+                raise ValueError
+            return year
+        except ValueError:
+            print('Please enter a number between ' + str(scraper.FIRST_YEAR) + ' and ' + str(scraper.LAST_YEAR) + '.')
+
+
+def scrape_seasons(years, base_url=scraper.BASE_URL, workers=WORKERS, requests_per_minute=REQUESTS_PER_MINUTE,
+                   save=True, progress_interval=PROGRESS_INTERVAL):
+    """
+    Scrapes the penalties of several seasons concurrently. All workers share one request budget (retries included), so
+    the site sees the same request rate no matter how many seasons or workers there are. Each season is saved as soon
+    as all of its games are done, and progress and throughput are printed every PROGRESS_INTERVAL seconds. Games that
+    still fail after their retries are saved to the season's dead-letter list instead of holding the season back, but a
+    season whose page of games cannot be downloaded fails: the other seasons are still finished and saved, and then an
+    error is raised.
+
+    :param years: The years the seasons end in (YYYY), in the order they should be finished.
+    :param base_url: The address of hockey-reference (or of a local server replaying its pages).
+    :param workers: The number of pages downloaded at the same time.
+    :param requests_per_minute: The number of requests per minute allowed across all workers.
+    :param save: Whether each season should be saved as penalties_YYYY.csv.
+    :param progress_interval: The seconds between progress reports.
+    :return: A dictionary mapping each year to the DataFrame of its penalties.
+    """
+    years = list(years)
+    state = {
+        'base_url': base_url,
+        'budget': new_budget(requests_per_minute),
+        'tasks': queue.PriorityQueue(),
+        'lock': threading.Lock(),
+        'order': 0,
+        'start': time.monotonic(),
+        'progress interval': progress_interval,
+        'last report': time.monotonic(),
+        'requests': 0,
+        'failures': [],
+        'save': save,
+        'seasons': {year: {'games': None, 'penalties': {}, 'dead letter': {}, 'frame': None,
+                           'error': None} for year in years}
+    }
+
+    for rank, year in enumerate(years):
+        add_task(state, (SEASON_PRIORITY, rank), ('season', year, rank))
+
+    threads = [threading.Thread(target=work, args=(state,), daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    # Wait for every task (including the games found on the season pages), then stop the workers.
+    state['tasks'].join()
+    for _ in threads:
+        add_task(state, (GAME_PRIORITY + 1,), None)
+    for thread in threads:
+        thread.join()
+
+    report_progress(state, force=True)
+
+    failed = [year for year in years if state['seasons'][year]['frame'] is None]
+    if failed:
+        raise RuntimeError('Failed seasons: ' + ', '.join(str(year) + ' (' + str(state['seasons'][year]['error']) + ')'
+                                                          for year in failed))
+    return {year: state['seasons'][year]['frame'] for year in years}
+
+
+def add_task(state, priority, task):
+    """
+    Adds a task to the shared priority queue. Tasks with the same priority are done in the order they were added.
+
+    :param state: The state of the scrape.
+    :param priority: A tuple that sorts before the priority of tasks that should be done later.
+    :param task: A ('season', year, rank) or ('game', year, rank, index, path, date) tuple (None stops a worker).
+    """
+    with state['lock']:
+        state['order'] += 1
+        order = state['order']
+    state['tasks'].put((priority, order, task))
+
+
+def work(state):
+    """
+    Worker loop: takes the most urgent task, downloads its page under the shared budget and processes it.
+
+    :param state: The state of the scrape.
+    """
+    while True:
+        task = state['tasks'].get()[2]
+        if task is None:
+            state['tasks'].task_done()
+            return
+
+        try:
+            if task[0] == 'season':
+                scrape_season_page(state, *task[1:])
+            else:
+                scrape_game_page(state, *task[1:])
+        except Exception as e:
+            with state['lock']:
+                state['failures'].append((task, repr(e)))
+                if task[0] == 'season':
+                    state['seasons'][task[1]]['error'] = repr(e)
+            print('Failed: ' + str(task[1:]) + ' (' + repr(e) + ')')
+        finally:
+            state['tasks'].task_done()
+
+
+def scrape_season_page(state, year, rank):
+    """
+    Downloads the page listing the games of a season and queues a task for each game.
+
+    :param state: The state of the scrape.
+    :param year: The year the season ends in.
+    :param rank: The position of the season in the requested order.
+    """
+    html = fetch(state, scraper.season_url(year, state['base_url']))
+    games = scraper.parse_season_games(html)
+
+    with state['lock']:
+        state['seasons'][year]['games'] = len(games)
+
+    for index, (path, date) in enumerate(games):
+        add_task(state, (GAME_PRIORITY, rank, index), ('game', year, rank, index, path, date))
+    finish_season(state, year)
+
+
+def scrape_game_page(state, year, rank, index, path, date):
+    """
+    Downloads the box score of a game and stores its penalties.
+
+    :param state: The state of the scrape.
+    :param year: The year the season ends in.
+    :param rank: The position of the season in the requested order.
+    :param index: The position of the game on the season page.
+    :param path: The path of the box score page.
+    :param date: The date of the game (YYYY-MM-DD).
+    """
+    url = state['base_url'] + path
+    try:
+        penalties = scraper.parse_game_penalties(fetch(state, url), date)
+    except Exception as e:
+        with state['lock']:
+            state['seasons'][year]['dead letter'][index] = (url, date, repr(e))
+        print('Skipping ' + url + ' (' + repr(e) + ')')
+    else:
+        with state['lock']:
+            state['seasons'][year]['penalties'][index] = penalties
+    finish_season(state, year)
+
+
+def finish_season(state, year):
+    """
+    Saves a season once all of its games have been scraped or have failed (in the order of the season page, as the
+    serial scraper does), along with its dead-letter list.
+
+    :param state: The state of the scrape.
+    :param year: The year the season ends in.
+    """
+    with state['lock']:
+        season = state['seasons'][year]
+        done = len(season['penalties']) + len(season['dead letter'])
+        if season['games'] is None or done < season['games'] or season['frame'] is not None:
+            return
+        all_penalties = [row for index in sorted(season['penalties']) for row in season['penalties'][index]]
+        season['frame'] = scraper.penalties_data_frame(all_penalties)
+        dead_letter = [season['dead letter'][index] for index in sorted(season['dead letter'])]
+
+    if state['save']:
+        season['frame'].to_csv('penalties_' + str(year) + '.csv', encoding='utf-8')
+        scraper.save_dead_letter(year, dead_letter)
+    print('Finished ' + str(year) + ': ' + str(season['games']) + ' games, ' + str(season['frame'].shape[0]) +
+          ' penalties, ' + str(len(dead_letter)) + ' failed games')
+
+
+def fetch(state, url):
+    """
+    Downloads a page, waiting for the shared budget before every attempt, and reports progress.
+
+    :param state: The state of the scrape.
+    :param url: The URL of the page.
+    :return: The HTML of the page as a string.
+    """
+    html = scraper.fetch(url, wait=lambda: wait_for_budget(state['budget']))
+
+    with state['lock']:
+        state['requests'] += 1
+    report_progress(state)
+    return html
+
+
+def new_budget(requests_per_minute):
+    """
+    Creates a request budget shared by all workers.
+
+    :param requests_per_minute: The number of requests per minute allowed.
+    :return: A dictionary holding the budget's interval, next free slot and lock.
+    """
+    return {'interval': 60.0 / requests_per_minute, 'next': time.monotonic(), 'lock': threading.Lock()}
+
+
+def wait_for_budget(budget):
+    """
+    Reserves the next free request slot of the budget and sleeps until it comes. Slots are spaced evenly, so requests
+    from all workers together never exceed the allowed rate.
+
+    :param budget: A budget created by new_budget.
+    """
+    with budget['lock']:
+        now = time.monotonic()
+        slot = max(now, budget['next'])
+        budget['next'] = slot + budget['interval']
+    time.sleep(max(slot - now, 0))
+
+
+def report_progress(state, force=False):
+    """
+    Prints the number of games scraped in each unfinished season and the overall throughput, at most once every
+    progress interval.
+
+    :param state: The state of the scrape.
+    :param force: Whether to print even if the last report was less than the interval ago.
+    """
+    with state['lock']:
+        now = time.monotonic()
+        if not force and now - state['last report'] < state['progress interval']:
+            return
+        state['last report'] = now
+
+        elapsed = max(now - state['start'], 1e-9)
+        seasons = [str(year) + ': ' + str(len(season['penalties']) + len(season['dead letter'])) + '/' +
+                   str(season['games'])
+                   for year, season in state['seasons'].items()
+                   if season['frame'] is None and season['games'] is not None]
+        print(str(state['requests']) + ' requests in ' + str(round(elapsed, 1)) + ' s (' +
+              str(round(state['requests'] / elapsed, 2)) + ' requests/s, ' + str(len(state['failures'])) +
+              ' failures)' + (' | ' + ', '.join(seasons) if seasons else ''))
+
+
+if __name__ == "__main__":
+    main()
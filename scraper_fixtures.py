@@ -0,0 +1,225 @@
+from bs4 import BeautifulSoup
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import random
+import sys
+import threading
+import time
+import zipfile
+
+import NHL_data_web_scraper as scraper
+import scrape_orchestrator
+
+# Archive the recorded pages are stored in, one entry per page path (e.g., leagues/NHL_2019_games.html).
+FIXTURE_ARCHIVE = 'scraper_fixtures.zip'
+
+# Status codes of the injected errors (both are retried by the scraper).
+ERROR_STATUS_CODES = [500, 503]
+
+USAGE = '''Usage:
+  python scraper_fixtures.py record YEAR [GAMES]                Records a season page and its box scores.
+  python scraper_fixtures.py serve PORT [LATENCY] [ERROR_RATE]   Replays the recorded pages on localhost.'''
+
+
+def main(args=None):
+    """
+    Records pages from hockey-reference.com, or replays them on a local server until interrupted.
+
+    :param args: The command line arguments (default is sys.argv[1:]).
+    :return: The exit status (0 if the command succeeded).
+    """
+    args = sys.argv[1:] if args is None else args
+
+    try:
+        if len(args) in [2, 3] and args[0] == 'record':
+            record([int(args[1])], games=int(args[2]) if len(args) == 3 else None)
+        elif 2 <= len(args) <= 4 and args[0] == 'serve':
+            server, base_url = serve(port=int(args[1]), latency=float(args[2]) if len(args) > 2 else 0.0,
+                                     error_rate=float(args[3]) if len(args) > 3 else 0.0)
+            print('Replaying ' + str(len(server.pages)) + ' pages at ' + base_url)
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                server.shutdown()
+        else:
+            print(USAGE)
+            return 1
+    except (ValueError, OSError) as e:
+        print('Error: ' + str(e))
+        return 1
+    return 0
+
+
+def record(years, archive=FIXTURE_ARCHIVE, base_url=scraper.BASE_URL, games=None,
+           requests_per_minute=scrape_orchestrator.REQUESTS_PER_MINUTE):
+    """
+    Downloads the season pages of several seasons and the box scores of their games into the fixture archive. Pages
+    already in the archive are not downloaded again, and requests are spaced to respect the site's rate limit.
+
+    :param years: The years the seasons end in (YYYY).
+    :param archive: The path to the fixture archive (created if it does not exist).
+    :param base_url: The address of hockey-reference.
+    :param games: The number of box scores recorded per season (None records all of them). The season page is stored
+    with only the recorded games, so replaying it scrapes exactly those games.
+    :param requests_per_minute: The number of requests per minute allowed.
+    :return: The number of pages downloaded.
+    """
+    budget = scrape_orchestrator.new_budget(requests_per_minute)
+    downloaded = 0
+
+    with zipfile.ZipFile(archive, 'a', compression=zipfile.ZIP_DEFLATED) as z:
+        recorded = set(z.namelist())
+
+        for year in years:
+            url = scraper.season_url(year, base_url)
+            if page_path(url) in recorded:
+                print('Already recorded ' + str(year))
+                continue
+
+            html = download(url, budget)
+            season_games = scraper.parse_season_games(html)[:games]
+            for path, _ in season_games:
+                if page_path(base_url + path) not in recorded:
+                    z.writestr(page_path(base_url + path), download(base_url + path, budget).encode('utf-8'))
+                    recorded.add(page_path(base_url + path))
+                    downloaded += 1
+
+            # The season page is stored last, so a season is only replayed once all of its games are recorded.
+            z.writestr(page_path(url), trim_season_page(html, [path for path, _ in season_games]).encode('utf-8'))
+            recorded.add(page_path(url))
+            downloaded += 1
+            print('Recorded ' + str(year) + ': ' + str(len(season_games)) + ' games')
+    return downloaded
+
+
+def download(url, budget):
+    """
+    Downloads a page from hockey-reference under the request budget.
+
+    :param url: The URL of the page.
+    :param budget: The request budget (see scrape_orchestrator.new_budget).
+    :return: The HTML of the page as a string.
+    """
+    return scraper.fetch(url, wait=lambda: scrape_orchestrator.wait_for_budget(budget))
+
+
+def trim_season_page(html, paths):
+    """
+    Removes the games that are not recorded from a season page.
+
+    :param html: The HTML of the page listing all the games of the season.
+    :param paths: The box score paths of the recorded games.
+    :return: The HTML of the page without the rows of the other games.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    paths = set(paths)
+
+    for table_id in ['games', 'games_playoffs']:
+        table = scraper.find_table(soup, table_id, required=False)
+        if table is None:
+            continue
+        for link in table.select('a[href*=boxscores]'):
+            if link.get('href') not in paths and link.find_parent('tr') is not None:
+                link.find_parent('tr').decompose()
+    return str(soup)
+
+
+def page_path(url):
+    """
+    Returns the entry of a page in the fixture archive.
+
+    :param url: The URL of the page.
+    :return: The path of the URL without its leading slash.
+    """
+    return urlparse(url).path.lstrip('/')
+
+
+def load_pages(archive=FIXTURE_ARCHIVE):
+    """
+    Reads every page of the fixture archive into memory.
+
+    :param archive: The path to the fixture archive.
+    :return: A dictionary mapping each page path to its HTML as bytes.
+    """
+    with zipfile.ZipFile(archive) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """
+    Answers requests with the recorded pages of the server, after its latency, and with an injected server error for
+    a fraction of the requests.
+    """
+
+    def do_GET(self):
+        """
+        Answers a GET request.
+        """
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            delay = server.latency * server.random.uniform(0.5, 1.5)
+            error = server.random.random() < server.error_rate
+            status = server.random.choice(ERROR_STATUS_CODES) if error else None
+        time.sleep(delay)
+
+        body = server.pages.get(page_path(self.path))
+        if status is None and body is None:
+            status = 404
+
+        if status is not None:
+            with server.lock:
+                server.errors += 1
+            self.send_error(status)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """
+        Keeps the server quiet (the scraper reports its own progress).
+        """
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """
+    A threaded HTTP server with a listen queue long enough for many concurrent scraper workers (the default of 5 makes
+    extra connections wait for a retransmission).
+    """
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def serve(archive=FIXTURE_ARCHIVE, port=0, latency=0.0, error_rate=0.0, seed=0):
+    """
+    Starts a local server replaying the pages of the fixture archive in a background thread. Each request is handled
+    by its own thread, so concurrent scrapers are not serialized by the server.
+
+    :param archive: The path to the fixture archive.
+    :param port: The port of the server (0 picks a free port).
+    :param latency: The average seconds each response is delayed (each delay is drawn between half and one and a half
+    times this).
+    :param error_rate: The fraction of requests answered with a server error instead of the page.
+    :param seed: An int seed that makes the delays and errors reproducible.
+    :return: A tuple containing the server (stop it with shutdown()) and the base URL to scrape.
+    """
+    server = ReplayServer(('127.0.0.1', port), ReplayHandler)
+    server.pages = load_pages(archive)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.random = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.errors = 0
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:' + str(server.server_address[1])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
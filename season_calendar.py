@@ -0,0 +1,83 @@
+import numpy as np
+
+# Events that split a season into segments, in the order they happen. Each date is the first day of the segment that
+# follows the event (games on the day of the trade deadline are played after it).
+EVENTS = ['allStarBreak', 'tradeDeadline', 'playoffStart']
+
+# Segments of a season: the games before each event, and the playoffs.
+SEGMENTS = ['beforeAllStarBreak', 'beforeTradeDeadline', 'beforePlayoffs', 'playoffs']
+
+# Dates (YYYYMMDD) of the events of each season. In Olympic seasons the all-star break is the Olympic break, and the
+# 2012-13 lockout season had no break (None), so all of its games before the deadline are in the second segment.
+CALENDAR = {
+    2008: [20090125, 20090304, 20090415],
+    2009: [20100215, 20100303, 20100414],
+    2010: [20110130, 20110228, 20110413],
+    2011: [20120129, 20120227, 20120411],
+    2012: [None, 20130403, 20130430],
+    2013: [20140209, 20140305, 20140416],
+    2014: [20150125, 20150302, 20150415],
+    2015: [20160131, 20160229, 20160413],
+    2016: [20170129, 20170301, 20170412],
+    2017: [20180128, 20180226, 20180411],
+    2018: [20190126, 20190225, 20190410],
+    2019: [20200125, 20200224, 20200801]
+}
+
+# Seasons start on October 1st of the season year, after the last playoff game of the previous season (the 2020
+# playoffs ended in late September) and before the first game.
+SEASON_START = 1001
+
+# Boundaries of every segment of every season, built from CALENDAR the first time they are needed.
+loaded_boundaries = None
+
+
+def boundaries():
+    """
+    Returns the first day of every segment of every season in CALENDAR as one sorted array: the start of the season
+    followed by its events for each season, and the start of the season after the last one.
+
+    :return: A numpy array of dates (YYYYMMDD).
+    """
+    global loaded_boundaries
+
+    if loaded_boundaries is None:
+        dates = []
+        for season in sorted(CALENDAR):
+            start = season * 10000 + SEASON_START
+            dates.append(start)
+
+            # A missing event starts its segment at the previous boundary, which leaves the segment before it empty.
+            for date in CALENDAR[season]:
+                dates.append(date if date is not None else dates[-1])
+        dates.append((max(CALENDAR) + 1) * 10000 + SEASON_START)
+        loaded_boundaries = np.array(dates, dtype='int64')
+    return loaded_boundaries
+
+
+def locate(game_dates):
+    """
+    Finds the season and segment of each game with one binary search over the boundaries of every season.
+
+    :param game_dates: An array of MoneyPuck gameDates (YYYYMMDD).
+    :return: A tuple containing an array of season years and an array of indices into SEGMENTS (both -1 for dates
+    outside CALENDAR).
+    """
+    dates = boundaries()
+    position = np.searchsorted(dates, np.asarray(game_dates, dtype='int64'), side='right') - 1
+
+    inside = np.logical_and(position >= 0, position < dates.size - 1)
+    per_season = len(EVENTS) + 1
+    seasons = np.where(inside, min(CALENDAR) + position // per_season, -1)
+    segments = np.where(inside, position % per_season, -1)
+    return seasons, segments
+
+
+def segments(game_dates):
+    """
+    Returns the segment of the season each game was played in.
+
+    :param game_dates: An array of MoneyPuck gameDates (YYYYMMDD).
+    :return: An array of indices into SEGMENTS (-1 for dates outside CALENDAR).
+    """
+    return locate(game_dates)[1]
@@ -0,0 +1,105 @@
+import numpy as np
+
+# Number of resamples drawn for each permutation test and bootstrap confidence interval.
+RESAMPLES = 10000
+
+# Confidence level of the bootstrap confidence intervals.
+CONFIDENCE = 0.95
+
+
+def game_outcomes(filepath, df, more_for, more_against):
+    """
+    Converts the output of a single_var_hypothesis_tests comparison function into numpy arrays with one entry per game.
+    Games from all_teams.csv come from the game-pair table, with one row per game seen from the winner's side.
+
+    :param filepath: The path that contains the hockey data.
+    :param df: The DataFrame of games returned by the comparison function.
+    :param more_for: A boolean pandas Series indicating whether the team had more of the variable.
+    :param more_against: A boolean pandas Series indicating whether the other team had more of the variable.
+    :return: A tuple of boolean arrays (won, more_for, more_against) and a boolean that is True for all_teams.csv.
+    """
+    won = (df.goalsFor > df.goalsAgainst).to_numpy()
+    more_for = align(more_for, df)
+    more_against = align(more_against, df)
+
+    return (won, more_for, more_against), 'all_teams.csv' in filepath
+
+
+def align(mask, df):
+    """
+    Returns a boolean mask as a numpy array in the row order of the DataFrame (comparisons built from other
+    situations, such as time in power play, may only cover some of the games).
+
+    :param mask: A boolean pandas Series indexed by gameId.
+    :param df: The DataFrame of games.
+    :return: A numpy array of booleans with one entry per row of the DataFrame.
+    """
+    if mask.index.equals(df.index):
+        return mask.to_numpy(dtype=bool)
+    return mask.reindex(df.index, fill_value=False).to_numpy(dtype=bool)
+
+
+def test_significance(outcomes, league_wide, rng, resamples=RESAMPLES, confidence=CONFIDENCE):
+    """
+    Tests whether winning teams have more of the variable than would be expected by chance. The statistic is the
+    fraction of wins in which the team had more of the variable. Resamples are drawn in one batched numpy call from the
+    distribution of the number of successes, which depends only on a few counts of games:
+
+    - Permutation test: the win/loss labels are shuffled across a team's games (a hypergeometric draw). For
+      all_teams.csv the winner of each game is chosen between its two teams instead (a binomial draw).
+    - Bootstrap: games are resampled with replacement (a multinomial draw over the game categories).
+
+    :param outcomes: A tuple of boolean arrays (won, more_for, more_against) returned by game_outcomes.
+    :param league_wide: True if the outcomes come from all_teams.csv.
+    :param rng: A numpy Generator used to draw the resamples.
+    :param resamples: The number of resamples to draw.
+    :param confidence: The confidence level of the bootstrap confidence interval.
+    :return: A dictionary with n, successes, p, the expected p under the null hypothesis, the two-sided permutation
+    p-value and the bootstrap confidence interval of p. Empty if there were no wins.
+    """
+    won, more_for, more_against = outcomes
+    n = won.size
+    wins = int(won.sum())
+    successes = int(np.logical_and(won, more_for).sum())
+
+    if wins == 0:
+        return {}
+
+    if league_wide:
+
+        # Either team could have won a game, so a game where one of the teams had more is a success half the time (the
+        # teams cannot both have more, and a game where neither did is never a success).
+        contested = int(np.logical_xor(more_for, more_against).sum())
+        null_successes = rng.binomial(contested, 0.5, size=resamples)
+        expected = contested / 2
+        bootstrap = rng.binomial(wins, successes / wins, size=resamples) / wins
+    else:
+        with_more = int(more_for.sum())
+        null_successes = rng.hypergeometric(with_more, n - with_more, wins, size=resamples)
+        expected = wins * with_more / n
+
+        # Resample games by category: wins with more, wins without more and losses.
+        counts = rng.multinomial(n, [successes / n, (wins - successes) / n, (n - wins) / n], size=resamples)
+        with np.errstate(invalid='ignore'):
+            bootstrap = counts[:, 0] / (counts[:, 0] + counts[:, 1])
+
+    # Count resamples at least as far from the expected number of successes as the observed one (with a small
+    # tolerance so that ties are counted).
+    extreme = np.abs(null_successes - expected) >= abs(successes - expected) - 1e-9
+    alpha = (1 - confidence) / 2
+
+    return {'n': n, 'successes': successes, 'p': successes / wins, 'expected p': expected / wins,
+            'p-value': (extreme.sum() + 1) / (resamples + 1),
+            'ci low': np.nanquantile(bootstrap, alpha), 'ci high': np.nanquantile(bootstrap, 1 - alpha)}
+
+
+def task_rng(seed, *keys):
+    """
+    Returns a random number generator for one task. The stream only depends on the seed and the keys identifying the
+    task (e.g., test, team and season), so results are reproducible no matter how tasks are split between processes.
+
+    :param seed: An int seed for the whole run.
+    :param keys: Ints identifying the task.
+    :return: A numpy Generator.
+    """
+    return np.random.default_rng(np.random.SeedSequence([seed] + list(keys)))
@@ -1,13 +1,19 @@
-import pandas as pd
 import numpy as np
 import os
 from colorama import Fore, Style
 
 # Does not include "exit".
-import produce_team_record
+import game_pairs
+import game_query
+import lookup
+import penalty_features
+import significance_tests
 
 TOTAL_OPTIONS = 17
 
+# Number of rows read at a time when streaming the data file in chunks (None reads the whole file at once).
+CHUNK_SIZE = None
+
 
 def main():
     """
@@ -41,23 +47,24 @@ def main():
                 print(Style.RESET_ALL)
 
         # Use a dictionary definition as a mock switch statement to choose the appropriate function.
+        # Each entry produces the comparison behind the hypothesis test so its significance can also be tested.
         switch = {
-            1: lambda: single_col_for_and_against(filepath, season, 'shotsOnGoal'),
-            2: lambda: single_col_for_and_against(filepath, season, 'highDangerShots'),
-            3: lambda: single_col_for_and_against(filepath, season, 'mediumDangerShots'),
-            4: lambda: single_col_for_and_against(filepath, season, 'lowDangerShots'),
-            5: lambda: single_col_for_and_against(filepath, season, 'rebounds'),
-            6: lambda: single_col_for_and_against(filepath, season, 'takeaways'),
-            7: lambda: single_col_for_and_against(filepath, season, 'penalties'),
-            8: lambda: single_col_for_and_against(filepath, season, 'penalityMinutes'),
-            9: lambda: high_and_med_danger(filepath, season),
-            10: lambda: high_and_low_danger(filepath, season),
-            11: lambda: low_danger_and_rebounds_sum(filepath, season),
-            12: lambda: rebounds_and_low_danger_shots_ratio(filepath, season),
-            13: lambda: medium_and_high_danger_and_rebounds_sum(filepath, season),
-            14: lambda: rebounds_and_medium_and_high_danger_shots_ratio(filepath, season),
-            15: lambda: time_on_power_play(filepath, season),
-            16: lambda: playoff_shots_on_goal(filepath, season)
+            1: lambda: single_col_comparison(filepath, season, 'shotsOnGoal'),
+            2: lambda: single_col_comparison(filepath, season, 'highDangerShots'),
+            3: lambda: single_col_comparison(filepath, season, 'mediumDangerShots'),
+            4: lambda: single_col_comparison(filepath, season, 'lowDangerShots'),
+            5: lambda: single_col_comparison(filepath, season, 'rebounds'),
+            6: lambda: single_col_comparison(filepath, season, 'takeaways'),
+            7: lambda: single_col_comparison(filepath, season, 'penalties'),
+            8: lambda: single_col_comparison(filepath, season, 'penalityMinutes'),
+            9: lambda: high_and_med_danger_comparison(filepath, season),
+            10: lambda: high_and_low_danger_comparison(filepath, season),
+            11: lambda: low_danger_and_rebounds_sum_comparison(filepath, season),
+            12: lambda: rebounds_and_low_danger_shots_ratio_comparison(filepath, season),
+            13: lambda: medium_and_high_danger_and_rebounds_sum_comparison(filepath, season),
+            14: lambda: rebounds_and_medium_and_high_danger_shots_ratio_comparison(filepath, season),
+            15: lambda: time_on_power_play_comparison(filepath, season),
+            16: lambda: playoff_shots_on_goal_comparison(filepath, season)
         }
 
         if choice < TOTAL_OPTIONS:
@@ -81,11 +88,12 @@ def main():
                     print(Style.RESET_ALL)
 
             f = switch.get(choice)
-            result = f()
+            comparison = f()
+            result = mark_results(*comparison)
 
             # Check to make sure we are not running our hypothesis tests on data that doesn't exist.
             if result.shape[0] != 0:
-                calculate_and_display_results(filepath, result, season)
+                calculate_and_display_results(filepath, result, season, comparison)
             else:
                 print('Error. This team may not have played in the NHL during this season.')
 
@@ -104,28 +112,29 @@ def single_col_for_and_against(filepath, season_year, col_name):
     :param col_name: The name of the column to be analyzed
     :return A pandas Series containing the successes (as ones) and the losses (as zeros).
     """
+    return mark_results(*single_col_comparison(filepath, season_year, col_name))
+
+
+def single_col_comparison(filepath, season_year, col_name):
+    """
+    Compares a single variable with "for" and "against" columns between the two teams of every game.
+
+    :param filepath: The path that contains the hockey data.
+    :param season_year: The season to be analyzed.
+    :param col_name: The name of the column to be analyzed
+    :return A tuple containing the DataFrame of games and two boolean pandas Series indicating whether the team ("for")
+    or the other team ("against") had a higher value in the column.
+    """
 
     for_col = col_name + 'For'
     against_col = col_name + 'Against'
 
     # Extract the relevant data.
-    df = extract_data(filepath,
-                      ['season', 'situation', 'iceTime', 'shotsOnGoalFor', for_col, against_col, 'goalsAgainst'],
-                      season_year)
-
-    # Check if team with more goals has more of the column value.
-    df['Result'] = 0
-
-    if 'all_teams.csv' in filepath:
-        df.loc[np.logical_or(
-            np.logical_and(df.goalsFor > df.goalsAgainst, getattr(df, for_col) > getattr(df, against_col)),
-            np.logical_and(df.goalsAgainst > df.goalsFor,
-                           getattr(df, against_col) > getattr(df, for_col))), 'Result'] = 1
-    else:
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst,
-                              getattr(df, for_col) > getattr(df, against_col)), 'Result'] = 1
+    df = extract_games(filepath,
+                       ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', for_col, against_col],
+                       season_year)
 
-    return df['Result']
+    return df, getattr(df, for_col) > getattr(df, against_col), getattr(df, against_col) > getattr(df, for_col)
 
 
 def high_and_med_danger(filepath, season_year):
@@ -136,41 +145,34 @@ def high_and_med_danger(filepath, season_year):
     :param season_year: The season to be analyzed.
     :return A pandas Series containing the successes (as ones) and the losses (as zeros).
     """
+    return mark_results(*high_and_med_danger_comparison(filepath, season_year))
 
-    # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'highDangerShotsFor', 'mediumDangerShotsAgainst', 'highDangerShotsAgainst'],
-                      season_year)
 
-    # Check if team with more combined medium and high danger shots had more wins.
-    df['Result'] = 0
+def high_and_med_danger_comparison(filepath, season_year):
+    """
+    Compares medium and high danger shots combined between the two teams of every game. If they are equal, the team
+    with more high danger shots is considered to have more.
 
-    if 'all_teams.csv' in filepath:
-        df.loc[np.logical_or(np.logical_and(df.goalsFor > df.goalsAgainst,
-                                            df.highDangerShotsFor + df.mediumDangerShotsFor > df.highDangerShotsAgainst + df.mediumDangerShotsAgainst),
-                             np.logical_and(df.goalsAgainst > df.goalsFor,
-                                            df.highDangerShotsAgainst + df.mediumDangerShotsAgainst > df.highDangerShotsFor + df.mediumDangerShotsFor)), 'Result'] = 1
-
-        # If high and medium danger shots are equal, check if one team has more high danger shots.
-        df.loc[np.logical_or(np.logical_and(df.goalsFor > df.goalsAgainst,
-                                            np.logical_and(
-                                                df.highDangerShotsFor + df.mediumDangerShotsFor == df.highDangerShotsAgainst + df.mediumDangerShotsAgainst,
-                                                df.highDangerShotsFor > df.highDangerShotsAgainst)),
-                             np.logical_and(df.goalsAgainst > df.goalsFor,
-                                            np.logical_and(
-                                                df.highDangerShotsAgainst + df.mediumDangerShotsAgainst == df.highDangerShotsFor + df.mediumDangerShotsFor,
-                                                df.highDangerShotsAgainst > df.highDangerShotsFor))), 'Result'] = 1
-    else:
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst,
-                              df.highDangerShotsFor + df.mediumDangerShotsFor > df.highDangerShotsAgainst + df.mediumDangerShotsAgainst), 'Result'] = 1
+    :param filepath: The path that contains the hockey data.
+    :param season_year: The season to be analyzed.
+    :return A tuple containing the DataFrame of games and two boolean pandas Series indicating whether the team ("for")
+    or the other team ("against") had more combined medium and high danger shots.
+    """
+
+    # Extract the relevant data.
+    df = extract_games(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
+                                  'highDangerShotsFor', 'mediumDangerShotsAgainst', 'highDangerShotsAgainst'],
+                       season_year)
 
-        # If high and medium danger shots are equal, check if one team has more high danger shots.
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst,
-                              np.logical_and(
-                                  df.highDangerShotsFor + df.mediumDangerShotsFor == df.highDangerShotsAgainst + df.mediumDangerShotsAgainst,
-                                  df.highDangerShotsFor > df.highDangerShotsAgainst)), 'Result'] = 1
+    mh_for = df.highDangerShotsFor + df.mediumDangerShotsFor
+    mh_against = df.highDangerShotsAgainst + df.mediumDangerShotsAgainst
 
-    return df['Result']
+    # If high and medium danger shots are equal, check if one team has more high danger shots.
+    more_for = np.logical_or(mh_for > mh_against,
+                             np.logical_and(mh_for == mh_against, df.highDangerShotsFor > df.highDangerShotsAgainst))
+    more_against = np.logical_or(mh_against > mh_for,
+                                 np.logical_and(mh_against == mh_for, df.highDangerShotsAgainst > df.highDangerShotsFor))
+    return df, more_for, more_against
 
 
 def high_and_low_danger(filepath, season_year):
@@ -181,41 +183,34 @@ def high_and_low_danger(filepath, season_year):
     :param season_year: The season to be analyzed.
     :return A pandas Series containing the successes (as ones) and the losses (as zeros).
     """
+    return mark_results(*high_and_low_danger_comparison(filepath, season_year))
 
-    # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'lowDangerShotsFor',
-                                 'highDangerShotsFor', 'lowDangerShotsAgainst', 'highDangerShotsAgainst'],
-                      season_year)
 
-    # Check if team with more combined low and high danger shots had more wins.
-    df['Result'] = 0
+def high_and_low_danger_comparison(filepath, season_year):
+    """
+    Compares low and high danger shots combined between the two teams of every game. If they are equal, the team with
+    more high danger shots is considered to have more.
 
-    if 'all_teams.csv' in filepath:
-        df.loc[np.logical_or(np.logical_and(df.goalsFor > df.goalsAgainst,
-                                            df.highDangerShotsFor + df.lowDangerShotsFor > df.highDangerShotsAgainst + df.lowDangerShotsAgainst),
-                             np.logical_and(df.goalsAgainst > df.goalsFor,
-                                            df.highDangerShotsAgainst + df.lowDangerShotsAgainst > df.highDangerShotsFor + df.lowDangerShotsFor)), 'Result'] = 1
-
-        # If high and medium danger shots are equal, check if one team has more high danger shots.
-        df.loc[np.logical_or(np.logical_and(df.goalsFor > df.goalsAgainst,
-                                            np.logical_and(
-                                                df.highDangerShotsFor + df.lowDangerShotsFor == df.highDangerShotsAgainst + df.lowDangerShotsAgainst,
-                                                df.highDangerShotsFor > df.highDangerShotsAgainst)),
-                             np.logical_and(df.goalsAgainst > df.goalsFor,
-                                            np.logical_and(
-                                                df.highDangerShotsAgainst + df.lowDangerShotsAgainst == df.highDangerShotsFor + df.lowDangerShotsFor,
-                                                df.highDangerShotsAgainst > df.highDangerShotsFor))), 'Result'] = 1
-    else:
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst,
-                              df.highDangerShotsFor + df.lowDangerShotsFor > df.highDangerShotsAgainst + df.lowDangerShotsAgainst), 'Result'] = 1
+    :param filepath: The path that contains the hockey data.
+    :param season_year: The season to be analyzed.
+    :return A tuple containing the DataFrame of games and two boolean pandas Series indicating whether the team ("for")
+    or the other team ("against") had more combined low and high danger shots.
+    """
 
-        # If high and medium danger shots are equal, check if one team has more high danger shots.
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst,
-                              np.logical_and(
-                                  df.highDangerShotsFor + df.lowDangerShotsFor == df.highDangerShotsAgainst + df.lowDangerShotsAgainst,
-                                  df.highDangerShotsFor > df.highDangerShotsAgainst)), 'Result'] = 1
+    # Extract the relevant data.
+    df = extract_games(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'lowDangerShotsFor',
+                                  'highDangerShotsFor', 'lowDangerShotsAgainst', 'highDangerShotsAgainst'],
+                       season_year)
 
-    return df['Result']
+    hl_for = df.highDangerShotsFor + df.lowDangerShotsFor
+    hl_against = df.highDangerShotsAgainst + df.lowDangerShotsAgainst
+
+    # If high and low danger shots are equal, check if one team has more high danger shots.
+    more_for = np.logical_or(hl_for > hl_against,
+                             np.logical_and(hl_for == hl_against, df.highDangerShotsFor > df.highDangerShotsAgainst))
+    more_against = np.logical_or(hl_against > hl_for,
+                                 np.logical_and(hl_against == hl_for, df.highDangerShotsAgainst > df.highDangerShotsFor))
+    return df, more_for, more_against
 
 
 def low_danger_and_rebounds_sum(filepath, season_year):
@@ -227,25 +222,28 @@ def low_danger_and_rebounds_sum(filepath, season_year):
     :param season_year: The season to be analyzed.
     :return A pandas Series containing the successes (as ones) and the losses (as zeros).
     """
+    return mark_results(*low_danger_and_rebounds_sum_comparison(filepath, season_year))
 
-    # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'lowDangerShotsFor',
-                                 'reboundsFor', 'lowDangerShotsAgainst', 'reboundsAgainst'],
-                      season_year)
 
-    # Check if team with more combined low danger shots and rebounds had more wins. Equal sums counts as a failure.
-    df['Result'] = 0
+def low_danger_and_rebounds_sum_comparison(filepath, season_year):
+    """
+    Compares the sum of low danger shots and rebounds between the two teams of every game. Equal sums count as neither
+    team having more.
 
-    if 'all_teams.csv' in filepath:
-        df.loc[np.logical_or(np.logical_and(df.goalsFor > df.goalsAgainst,
-                                            df.reboundsFor + df.lowDangerShotsFor > df.reboundsAgainst + df.lowDangerShotsAgainst),
-                             np.logical_and(df.goalsAgainst > df.goalsFor,
-                                            df.reboundsAgainst + df.lowDangerShotsAgainst > df.reboundsFor + df.lowDangerShotsFor)), 'Result'] = 1
-    else:
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst,
-                              df.reboundsFor + df.lowDangerShotsFor > df.reboundsAgainst + df.lowDangerShotsAgainst), 'Result'] = 1
+    :param filepath: The path that contains the hockey data.
+    :param season_year: The season to be analyzed.
+    :return A tuple containing the DataFrame of games and two boolean pandas Series indicating whether the team ("for")
+    or the other team ("against") had the higher sum.
+    """
 
-    return df['Result']
+    # Extract the relevant data.
+    df = extract_games(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'lowDangerShotsFor',
+                                  'reboundsFor', 'lowDangerShotsAgainst', 'reboundsAgainst'],
+                       season_year)
+
+    sum_for = df.reboundsFor + df.lowDangerShotsFor
+    sum_against = df.reboundsAgainst + df.lowDangerShotsAgainst
+    return df, sum_for > sum_against, sum_against > sum_for
 
 
 def rebounds_and_low_danger_shots_ratio(filepath, season_year):
@@ -257,25 +255,28 @@ def rebounds_and_low_danger_shots_ratio(filepath, season_year):
     :param season_year: The season to be analyzed.
     :return A pandas Series containing the successes (as ones) and the losses (as zeros).
     """
+    return mark_results(*rebounds_and_low_danger_shots_ratio_comparison(filepath, season_year))
 
-    # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'lowDangerShotsFor',
-                                 'reboundsFor', 'lowDangerShotsAgainst', 'reboundsAgainst'],
-                      season_year)
 
-    # Check if team with a higher ratio of rebounds to low danger shots had more wins. Equal ratios count as a failure.
-    df['Result'] = 0
+def rebounds_and_low_danger_shots_ratio_comparison(filepath, season_year):
+    """
+    Compares the ratio of rebounds to low danger shots between the two teams of every game. Equal ratios count as
+    neither team having more.
 
-    if 'all_teams.csv' in filepath:
-        df.loc[np.logical_or(np.logical_and(df.goalsFor > df.goalsAgainst,
-                                            df.reboundsFor / df.lowDangerShotsFor > df.reboundsAgainst / df.lowDangerShotsAgainst),
-                             np.logical_and(df.goalsAgainst > df.goalsFor,
-                                            df.reboundsAgainst / df.lowDangerShotsAgainst > df.reboundsFor / df.lowDangerShotsFor)), 'Result'] = 1
-    else:
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst,
-                              df.reboundsFor / df.lowDangerShotsFor > df.reboundsAgainst / df.lowDangerShotsAgainst), 'Result'] = 1
+    :param filepath: The path that contains the hockey data.
+    :param season_year: The season to be analyzed.
+    :return A tuple containing the DataFrame of games and two boolean pandas Series indicating whether the team ("for")
+    or the other team ("against") had the higher ratio.
+    """
 
-    return df['Result']
+    # Extract the relevant data.
+    df = extract_games(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'lowDangerShotsFor',
+                                  'reboundsFor', 'lowDangerShotsAgainst', 'reboundsAgainst'],
+                       season_year)
+
+    ratio_for = df.reboundsFor / df.lowDangerShotsFor
+    ratio_against = df.reboundsAgainst / df.lowDangerShotsAgainst
+    return df, ratio_for > ratio_against, ratio_against > ratio_for
 
 
 def medium_and_high_danger_and_rebounds_sum(filepath, season_year):
@@ -287,25 +288,28 @@ def medium_and_high_danger_and_rebounds_sum(filepath, season_year):
     :param season_year: The season to be analyzed.
     :return A pandas Series containing the successes (as ones) and the losses (as zeros).
     """
+    return mark_results(*medium_and_high_danger_and_rebounds_sum_comparison(filepath, season_year))
 
-    # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'highDangerShotsFor', 'reboundsFor', 'mediumDangerShotsAgainst',
-                                 'highDangerShotsAgainst', 'reboundsAgainst'], season_year)
 
-    # Check if team with more combined med/high danger shots and rebounds had more wins. Equal sums counts as a failure.
-    df['Result'] = 0
+def medium_and_high_danger_and_rebounds_sum_comparison(filepath, season_year):
+    """
+    Compares the sum of medium/high danger shots and rebounds between the two teams of every game. Equal sums count as
+    neither team having more.
 
-    if 'all_teams.csv' in filepath:
-        df.loc[np.logical_or(np.logical_and(df.goalsFor > df.goalsAgainst,
-                                            df.reboundsFor + df.mediumDangerShotsFor + df.highDangerShotsFor > df.reboundsAgainst + df.mediumDangerShotsAgainst + df.highDangerShotsAgainst),
-                             np.logical_and(df.goalsAgainst > df.goalsFor,
-                                            df.reboundsAgainst + df.mediumDangerShotsAgainst + df.highDangerShotsAgainst > df.reboundsFor + df.mediumDangerShotsFor + df.highDangerShotsFor)), 'Result'] = 1
-    else:
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst,
-                              df.reboundsFor + df.mediumDangerShotsFor + df.highDangerShotsFor > df.reboundsAgainst + df.mediumDangerShotsAgainst + df.highDangerShotsAgainst), 'Result'] = 1
+    :param filepath: The path that contains the hockey data.
+    :param season_year: The season to be analyzed.
+    :return A tuple containing the DataFrame of games and two boolean pandas Series indicating whether the team ("for")
+    or the other team ("against") had the higher sum.
+    """
 
-    return df['Result']
+    # Extract the relevant data.
+    df = extract_games(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
+                                  'highDangerShotsFor', 'reboundsFor', 'mediumDangerShotsAgainst',
+                                  'highDangerShotsAgainst', 'reboundsAgainst'], season_year)
+
+    sum_for = df.reboundsFor + df.mediumDangerShotsFor + df.highDangerShotsFor
+    sum_against = df.reboundsAgainst + df.mediumDangerShotsAgainst + df.highDangerShotsAgainst
+    return df, sum_for > sum_against, sum_against > sum_for
 
 
 def rebounds_and_medium_and_high_danger_shots_ratio(filepath, season_year):
@@ -317,30 +321,28 @@ def rebounds_and_medium_and_high_danger_shots_ratio(filepath, season_year):
     :param season_year: The season to be analyzed.
     :return A pandas Series containing the successes (as ones) and the losses (as zeros).
     """
+    return mark_results(*rebounds_and_medium_and_high_danger_shots_ratio_comparison(filepath, season_year))
 
-    # Extract the relevant data.
-    df = extract_data(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
-                                 'highDangerShotsFor', 'reboundsFor', 'mediumDangerShotsAgainst',
-                                 'highDangerShotsAgainst', 'reboundsAgainst'], season_year)
 
-    # Check if team with a higher ratio of rebounds to low danger shots had more wins. Equal ratios count as a failure.
-    df['Result'] = 0
+def rebounds_and_medium_and_high_danger_shots_ratio_comparison(filepath, season_year):
+    """
+    Compares the ratio of rebounds to medium and high danger shots between the two teams of every game. Equal ratios
+    count as neither team having more.
 
-    if 'all_teams.csv' in filepath:
-        df.loc[np.logical_or(np.logical_and(df.goalsFor > df.goalsAgainst,
-                                            df.reboundsFor / (
-                                                    df.mediumDangerShotsFor + df.highDangerShotsFor) > df.reboundsAgainst / (
-                                                    df.mediumDangerShotsAgainst + df.highDangerShotsAgainst)),
-                             np.logical_and(df.goalsAgainst > df.goalsFor,
-                                            df.reboundsAgainst / (
-                                                    df.mediumDangerShotsAgainst + df.highDangerShotsAgainst) > df.reboundsFor / (
-                                                    df.mediumDangerShotsFor + df.highDangerShotsFor))), 'Result'] = 1
-    else:
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst, df.reboundsFor / (
-                df.mediumDangerShotsFor + df.highDangerShotsFor) > df.reboundsAgainst / (
-                                      df.mediumDangerShotsAgainst + df.highDangerShotsAgainst)), 'Result'] = 1
+    :param filepath: The path that contains the hockey data.
+    :param season_year: The season to be analyzed.
+    :return A tuple containing the DataFrame of games and two boolean pandas Series indicating whether the team ("for")
+    or the other team ("against") had the higher ratio.
+    """
 
-    return df['Result']
+    # Extract the relevant data.
+    df = extract_games(filepath, ['season', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor',
+                                  'highDangerShotsFor', 'reboundsFor', 'mediumDangerShotsAgainst',
+                                  'highDangerShotsAgainst', 'reboundsAgainst'], season_year)
+
+    ratio_for = df.reboundsFor / (df.mediumDangerShotsFor + df.highDangerShotsFor)
+    ratio_against = df.reboundsAgainst / (df.mediumDangerShotsAgainst + df.highDangerShotsAgainst)
+    return df, ratio_for > ratio_against, ratio_against > ratio_for
 
 
 def time_on_power_play(filepath, season_year):
@@ -352,30 +354,31 @@ def time_on_power_play(filepath, season_year):
     :param season_year: The season to be analyzed.
     :return A pandas Series containing the successes (as ones) and the losses (as zeros).
     """
+    return mark_results(*time_on_power_play_comparison(filepath, season_year))
+
+
+def time_on_power_play_comparison(filepath, season_year):
+    """
+    Compares the time in power play (5 on 4) between the two teams of every game.
+
+    :param filepath: The path that contains the hockey data.
+    :param season_year: The season to be analyzed.
+    :return A tuple containing the DataFrame of games ("all" rows) and two boolean pandas Series indicating whether the
+    team ("for") or the other team ("against") had more time in power play.
+    """
 
     # Extract the data from the "all" row to check for the winner of the game.
-    all_data_df = extract_data(filepath, ['season', 'gameId', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst'],
-                               season_year)
-    power_play_for = extract_data(filepath, ['season', 'gameId', 'situation', 'iceTime'], season_year, '5on4')
-    power_play_against = extract_data(filepath, ['season', 'gameId', 'situation', 'iceTime'], season_year, '4on5')
+    all_data_df = extract_games(filepath, ['season', 'gameId', 'situation', 'iceTime', 'goalsFor', 'goalsAgainst'],
+                                season_year)
+    power_play_for = extract_games(filepath, ['season', 'gameId', 'situation', 'iceTime'], season_year, '5on4')
+    power_play_against = extract_games(filepath, ['season', 'gameId', 'situation', 'iceTime'], season_year, '4on5')
 
     # Only find games that did not go into overtime.
     power_play_for = power_play_for[power_play_for.gameId.isin(all_data_df.gameId)]
     power_play_against = power_play_against[power_play_against.gameId.isin(all_data_df.gameId)]
 
-    # Check if team with more goals had more time in power play (more time in 5 on 4 than the other team).
-    all_data_df['Result'] = 0
-
-    if 'all_teams.csv' in filepath:
-        all_data_df.loc[np.logical_or(np.logical_and(all_data_df.goalsFor > all_data_df.goalsAgainst,
-                                                     power_play_for.iceTime > power_play_against.iceTime),
-                                      np.logical_and(all_data_df.goalsAgainst > all_data_df.goalsFor,
-                                                     power_play_against.iceTime > power_play_for.iceTime)), 'Result'] = 1
-    else:
-        all_data_df.loc[np.logical_and(all_data_df.goalsFor > all_data_df.goalsAgainst,
-                                       power_play_for.iceTime > power_play_against.iceTime), 'Result'] = 1
-
-    return all_data_df['Result']
+    return (all_data_df, power_play_for.iceTime > power_play_against.iceTime,
+            power_play_against.iceTime > power_play_for.iceTime)
 
 
 def playoff_shots_on_goal(filepath, season_year):
@@ -387,52 +390,96 @@ def playoff_shots_on_goal(filepath, season_year):
     :param season_year: The season to be analyzed.
     :return A pandas Series containing the successes (as ones) and the losses (as zeros).
     """
+    return mark_results(*playoff_shots_on_goal_comparison(filepath, season_year))
 
-    index = filepath.find('.csv')
-    team = filepath[index - 3:index]
 
-    # Extract the relevant data.
-    df = extract_data('all_teams.csv',
-                      ['team', 'season', 'situation', 'iceTime', 'shotsOnGoalFor', 'goalsFor', 'shotsOnGoalAgainst',
-                       'goalsAgainst', 'playoffGame'], season_year)
+def playoff_shots_on_goal_comparison(filepath, season_year):
+    """
+    Compares shots on goal between the two teams of every playoff game.
 
-    # Only consider playoff games.
-    df = df[df.playoffGame == 1]
-    df['Result'] = 0
+    :param filepath: The path that contains the hockey data.
+    :param season_year: The season to be analyzed.
+    :return A tuple containing the DataFrame of playoff games and two boolean pandas Series indicating whether the team
+    ("for") or the other team ("against") had more shots on goal.
+    """
 
+    columns = ['team', 'season', 'situation', 'iceTime', 'shotsOnGoalFor', 'goalsFor', 'shotsOnGoalAgainst',
+               'goalsAgainst', 'playoffGame', 'gameId']
+
+    # Extract the relevant data (the games of the team we are interested in come from all_teams.csv as well).
     if 'all_teams.csv' in filepath:
-        df.loc[np.logical_or(np.logical_and(df.goalsFor > df.goalsAgainst, df.shotsOnGoalFor > df.shotsOnGoalAgainst),
-                         np.logical_and(df.goalsAgainst > df.goalsFor,
-                                        df.shotsOnGoalAgainst > df.shotsOnGoalFor)), 'Result'] = 1
+        df = game_pairs.winner_games(filepath, columns, season_year)
     else:
+        index = filepath.find('.csv')
+        team = filepath[index - 3:index]
+        df = game_pairs.team_games('all_teams.csv', team, columns, season_year)
+        df = df[df.iceTime == 3600]
+
+    # Only consider playoff games.
+    df = df[df.playoffGame == 1]
+
+    return df, df.shotsOnGoalFor > df.shotsOnGoalAgainst, df.shotsOnGoalAgainst > df.shotsOnGoalFor
+
 
-        # Only look at the teams we are interested in.
-        df = df[df.team == team]
-        df.loc[np.logical_and(df.goalsFor > df.goalsAgainst, df.shotsOnGoalFor > df.shotsOnGoalAgainst), 'Result'] = 1
+def mark_results(df, more_for, more_against):
+    """
+    Marks the games in which the winning team had more of the variable being tested as successes. League-wide games
+    are seen from the winner's side (see extract_games), so the same rule applies to them and to team files.
 
+    :param df: The DataFrame of games returned by one of the comparison functions.
+    :param more_for: A boolean pandas Series indicating whether the team had more of the variable.
+    :param more_against: A boolean pandas Series indicating whether the other team had more of the variable.
+    :return A pandas Series containing the successes (as ones) and the losses (as zeros).
+    """
+    df['Result'] = 0
+    df.loc[np.logical_and(df.goalsFor > df.goalsAgainst, more_for), 'Result'] = 1
     return df['Result']
 
 
+def extract_games(filepath, columns, season_year, situation='all'):
+    """
+    Extract the games compared by the hypothesis tests. all_teams.csv has one row per team per game, so league-wide
+    games come from the game-pair table instead, with one row per game seen from the winner's side. Team files are read
+    with extract_data.
+
+    :param filepath: The path that contains the hockey data.
+    :param columns: The column names that should be included (penalty_features.PENALTY_COLUMNS can be included too).
+    :param season_year: The season to be included.
+    :param situation: The situation to be analyzed (default is 'all').
+    :return: A DataFrame containing only the relevant rows and columns, indexed by gameId.
+    """
+    if 'all_teams.csv' not in filepath:
+        return extract_data(filepath, columns, season_year, situation)
+
+    columns, penalty_columns = penalty_features.split_columns(columns)
+    df = game_pairs.winner_games(filepath, columns + ['gameId'], season_year, situation)
+    if penalty_columns:
+        df = penalty_features.join_penalties(df, penalty_columns)
+    return df
+
+
 def extract_data(filepath, columns, season_year, situation='all'):
     """
     Extract the relevant data from the CSV file. Games are indexed by their ID automatically (do not pass in as column).
     If 'all' situation specified, only games that did not go into overtime are returned.
 
     :param filepath: The path that contains the hockey data.
-    :param columns: The column names that should be included.
+    :param columns: The column names that should be included (penalty_features.PENALTY_COLUMNS can be included too).
     :param season_year: The season to be included.
     :param situation: The situation to be analyzed (default is 'all').
     :return: A DataFrame containing only the relevant rows and columns.
     """
+    columns, penalty_columns = penalty_features.split_columns(columns)
 
-    # Extract relevant columns.
-    df = pd.read_csv(filepath_or_buffer=filepath, delimiter=',', header=0, usecols=columns.append('gameId'))
-
-    # Extract rows of games that didn't go into overtime if the situation is 'all'
+    # Extract relevant columns and rows of games that didn't go into overtime if the situation is 'all'.
+    query = game_query.GameQuery(filepath).select(*columns, 'gameId').situation(situation).season(season_year)
     if situation == 'all':
-        df = df[np.logical_and(np.logical_and(df.situation == situation, df.season == season_year), df.iceTime == 3600)]
-    else:
-        df = df[np.logical_and(df.situation == situation, df.season == season_year)]
+        query = query.regulation_only()
+    df = query.rows(CHUNK_SIZE)
+
+    # Add the penalty features scraped from hockey-reference.com.
+    if penalty_columns:
+        df = penalty_features.join_penalties(df, penalty_columns)
 
     df.index = df.gameId
     return df
@@ -482,37 +529,47 @@ def print_menu():
     print()
 
 
-def calculate_and_display_results(filepath, results, season):
+def calculate_and_display_results(filepath, results, season, comparison=None):
     """
-    Calculates the n and p values of the hypothesis test.
+    Calculates the n and p values of the hypothesis test. If the comparison behind the test is passed in, the
+    significance of the result (permutation test and bootstrap confidence interval) is displayed as well.
 
     :param filepath: The filepath that these results came from.
     :param results: A pandas Series containing the results of the hypothesis tests.
     :param season: The season being analyzed.
+    :param comparison: The tuple returned by the comparison function of the hypothesis test (optional).
     """
 
-    # Calculate the number of successes as well as n and p. The all_teams file double counts each team so we must also
-    # divide it by 2.
+    # Calculate the number of successes as well as n and p. League-wide results have one row per game and every game
+    # has a winner.
+    s = results.sum()
+    n = results.size
     if 'all_teams.csv' in filepath:
-        s = results.sum() / 2
-        n = results.size / 2
-        p = float(results.sum()) / (n * 2)
+        p = float(s) / n
     else:
-        s = results.sum()
-        n = results.size
 
         # Get the number of wins for this team.
         index = filepath.find('.csv')
         team = filepath[index - 3:index]
 
-        p = float(results.sum()) / produce_team_record.produce_num_of_wins(team, season)
+        p = float(results.sum()) / lookup.num_of_wins(team, season)
 
     # Print results.
     print(Fore.BLUE + '\nResultant n and p values: ')
     print(Style.RESET_ALL)
     print('Number of successes: ' + str(s))
     print('n value: ' + str(n))
-    print('p value: ' + str(p))
+    print('p value (success ratio): ' + str(p))
+
+    if comparison is not None:
+        outcomes, league_wide = significance_tests.game_outcomes(filepath, *comparison)
+        significance = significance_tests.test_significance(outcomes, league_wide, np.random.default_rng())
+
+        if significance:
+            print('Expected success ratio by chance: ' + str(significance['expected p']))
+            print('Permutation test p-value: ' + str(significance['p-value']))
+            print(str(int(significance_tests.CONFIDENCE * 100)) + '% bootstrap confidence interval: [' +
+                  str(significance['ci low']) + ', ' + str(significance['ci high']) + ']')
 
 
 if __name__ == "__main__":
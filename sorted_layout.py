@@ -0,0 +1,170 @@
+import bisect
+import json
+import os
+
+import pandas as pd
+
+import moneypuck_schema
+
+# Set to True to slice extract_data, total_var and the team records out of the sorted layout instead of reading the CSV.
+USE_LAYOUT = False
+
+# Columns the rows are sorted by. Every combination of them is one contiguous block of rows in the sorted layout.
+SORT_COLUMNS = ['team', 'season', 'situation', 'playoffGame']
+
+# Layouts loaded by this process, keyed by the absolute path of the CSV file.
+layouts = {}
+
+
+def main():
+    """
+    Builds the sorted layout of all_teams.csv.
+    """
+    build('all_teams.csv')
+
+
+def select(filepath, columns, keys, row_filter=None):
+    """
+    Returns the rows of a MoneyPuck CSV file matching the given values of the sort columns. The matching blocks are
+    looked up in the offset index and sliced out of the sorted layout, so no column of the file is scanned.
+
+    :param filepath: The path to the MoneyPuck CSV file.
+    :param columns: The column names that should be included (returned in file order).
+    :param keys: A dictionary mapping some of the SORT_COLUMNS to the value they must have (e.g., {'season': 2010,
+    'situation': 'all'}).
+    :param row_filter: An optional function taking a DataFrame and returning a boolean mask of the rows to keep (e.g.,
+    for conditions on iceTime), applied to the selected blocks only.
+    :return: A DataFrame with compact dtypes containing the matching rows in file order, indexed by their row number in
+    the file (as read_csv would).
+    """
+    df, offsets, sorted_keys = load(filepath)
+
+    # Match read_csv, which raises a ValueError for columns that are not in the file.
+    missing = [col for col in list(columns) + list(keys) if col not in df.columns]
+    if missing:
+        raise ValueError('Columns not found in ' + filepath + ': ' + ', '.join(missing))
+
+    blocks = [df.iloc[start:stop] for start, stop in find_blocks(offsets, sorted_keys, keys)]
+
+    if not blocks:
+        selection = df.iloc[0:0]
+    elif len(blocks) == 1:
+        selection = blocks[0]
+    else:
+        # Blocks of different keys are interleaved in the file, so the original row order is restored.
+        selection = pd.concat(blocks).sort_index()
+
+    if row_filter is not None:
+        selection = selection[row_filter(selection)]
+    return selection[[col for col in df.columns if col in columns]]
+
+
+def find_blocks(offsets, sorted_keys, keys):
+    """
+    Finds the row ranges of the blocks whose key matches every given value. A full key is looked up directly, and
+    values of the leading sort columns are found by binary search in the sorted keys, so only the blocks sharing that
+    prefix are compared with the other values.
+
+    :param offsets: A dictionary mapping (team, season, situation, playoffGame) to (start, stop) row positions.
+    :param sorted_keys: The keys of offsets in sorted order.
+    :param keys: A dictionary mapping some of the SORT_COLUMNS to the value they must have.
+    :return: A list of (start, stop) row positions, in key order.
+    """
+    if len(keys) == len(SORT_COLUMNS):
+        key = tuple(keys[col] for col in SORT_COLUMNS)
+        return [offsets[key]] if key in offsets else []
+
+    # The given values of the leading sort columns form a prefix of the matching keys.
+    prefix = []
+    for col in SORT_COLUMNS:
+        if col not in keys:
+            break
+        prefix.append(keys[col])
+    prefix = tuple(prefix)
+
+    start = bisect.bisect_left(sorted_keys, prefix)
+    stop = start
+    while stop < len(sorted_keys) and sorted_keys[stop][:len(prefix)] == prefix:
+        stop += 1
+
+    positions = [SORT_COLUMNS.index(col) for col in keys if SORT_COLUMNS.index(col) >= len(prefix)]
+    return [offsets[key] for key in sorted_keys[start:stop] if all(key[i] == keys[SORT_COLUMNS[i]] for i in positions)]
+
+
+def load(filepath):
+    """
+    Returns the sorted layout and offset index of a MoneyPuck CSV file, loading them from the files next to it. They are
+    (re)built if they do not exist yet or the CSV file has changed since they were built.
+
+    :param filepath: The path to the MoneyPuck CSV file.
+    :return: A tuple containing the sorted DataFrame, a dictionary mapping (team, season, situation, playoffGame) to
+    (start, stop) row positions and the list of its keys in sorted order.
+    """
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    source = [stat.st_size, stat.st_mtime_ns]
+
+    if path in layouts and layouts[path][0] == source:
+        return layouts[path][1:]
+
+    data_file, index_file = layout_files(path)
+    offsets = None
+    if os.path.exists(data_file) and os.path.exists(index_file):
+        with open(index_file) as f:
+            index = json.load(f)
+        if index['source'] == source:
+            df = pd.read_pickle(data_file)
+            offsets = {tuple(entry[:4]): (entry[4], entry[5]) for entry in index['offsets']}
+
+    if offsets is None:
+        df, offsets = build(path)
+
+    layouts[path] = (source, df, offsets, sorted(offsets))
+    return layouts[path][1:]
+
+
+def build(filepath):
+    """
+    Sorts a MoneyPuck CSV file by SORT_COLUMNS and saves the sorted rows and their offset index next to the file. The
+    sort is stable, so the games inside each block stay in file order.
+
+    :param filepath: The path to the MoneyPuck CSV file.
+    :return: A tuple containing the sorted DataFrame and a dictionary mapping (team, season, situation, playoffGame) to
+    (start, stop) row positions.
+    """
+    stat = os.stat(filepath)
+    df = moneypuck_schema.read_moneypuck(filepath)
+    df = df.sort_values(SORT_COLUMNS, kind='mergesort')
+
+    # Each group is contiguous after sorting, so its first and last positions give its row range.
+    offsets = {}
+    for key, rows in df.groupby(SORT_COLUMNS, observed=True, sort=False).indices.items():
+        team, season, situation, playoff_game = key
+        offsets[(str(team), int(season), str(situation), int(playoff_game))] = (int(rows[0]), int(rows[-1]) + 1)
+
+    # Write to temporary files first so that an interrupted build never leaves a partial layout.
+    data_file, index_file = layout_files(filepath)
+    df.to_pickle(data_file + '.tmp')
+    with open(index_file + '.tmp', 'w') as f:
+        json.dump({'source': [stat.st_size, stat.st_mtime_ns],
+                   'offsets': [list(key) + list(rows) for key, rows in offsets.items()]}, f)
+    os.replace(data_file + '.tmp', data_file)
+    os.replace(index_file + '.tmp', index_file)
+
+    return df, offsets
+
+
+def layout_files(filepath):
+    """
+    Returns the paths of the sorted layout and offset index of a CSV file (e.g., all_teams.sorted.pkl and
+    all_teams.offsets.json next to all_teams.csv).
+
+    :param filepath: The path to the MoneyPuck CSV file.
+    :return: A tuple containing the two paths.
+    """
+    base = os.path.splitext(filepath)[0]
+    return base + '.sorted.pkl', base + '.offsets.json'
+
+
+if __name__ == "__main__":
+    main()
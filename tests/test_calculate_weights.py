@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+# The modules live at the top of the repository.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calculate_weights
+import feature_matrix
+import penalty_features
+
+# Number of games of the synthetic season.
+GAMES = 16
+
+
+def write_season(directory):
+    """
+    Writes a season of BOS games against TOR in MoneyPuck's format, and the penalties of those games in the format of
+    NHL_data_web_scraper. In game k, TOR takes k % 3 minor penalties (k % 3 two-minute power plays for BOS) and BOS
+    takes one minor penalty in every fourth game. Every game also has a misconduct, which is served without a power
+    play, so that no game looks unscraped.
+
+    :param directory: The directory the files are written to.
+    :return: A tuple containing the power play seconds of BOS and of TOR in each game.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2015-10-10', periods=GAMES, freq='3D')
+
+    games = pd.DataFrame({'team': 'BOS', 'opposingTeam': 'TOR', 'season': 2015, 'situation': 'all',
+                          'gameId': np.arange(2015020001, 2015020001 + GAMES),
+                          'gameDate': dates.strftime('%Y%m%d').astype(int)})
+    for col in feature_matrix.SOURCE_COLUMNS:
+        games[col] = rng.integers(0, 6, GAMES)
+    games.to_csv(os.path.join(directory, 'BOS.csv'), index=False)
+
+    rows = []
+    for k, date in enumerate(dates.strftime('%Y-%m-%d')):
+        rows.append([date, 3, '19:00', 'TOR', 'Player', 'Misconduct', '10 min'])
+        for j in range(k % 3):
+            rows.append([date, 1, str(5 * j + 1) + ':00', 'TOR', 'Player', 'Hooking', '2 min'])
+        if k % 4 == 0:
+            rows.append([date, 2, '10:00', 'BOS', 'Player', 'Tripping', '2 min'])
+    pd.DataFrame(rows, columns=['Date', 'Period', 'Time', 'Team', 'Player', 'Summary', 'Duration']).to_csv(
+        os.path.join(directory, 'penalties_2016.csv'), encoding='utf-8')
+
+    k = np.arange(GAMES)
+    return 120 * (k % 3), np.where(k % 4 == 0, 120, 0)
+
+
+class PowerPlayFormulaTest(unittest.TestCase):
+    """
+    Evaluates the power play weight formula, which reads penalty features through feature_matrix.extract_features.
+    """
+
+    def setUp(self):
+        """
+        Writes the synthetic season in a temporary directory and makes it the current directory (the penalty files are
+        found there).
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        self.power_play_for, self.power_play_against = write_season(self.directory.name)
+        self.use_matrix = feature_matrix.USE_FEATURE_MATRIX
+
+    def tearDown(self):
+        """
+        Restores the current directory and the read path, and removes the temporary directory.
+        """
+        feature_matrix.USE_FEATURE_MATRIX = self.use_matrix
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def expected_accuracy(self, mh_weight, pp_weight):
+        """
+        Computes the accuracy of the formula directly from the synthetic data.
+
+        :param mh_weight: The weight on the medium/high danger shots.
+        :param pp_weight: The weight on the power play minutes.
+        :return: The percentage of wins/losses predicted correctly.
+        """
+        games = pd.read_csv('BOS.csv')
+        shots_for = games.mediumDangerShotsFor + games.highDangerShotsFor
+        shots_against = games.mediumDangerShotsAgainst + games.highDangerShotsAgainst
+        fteam = np.cumsum(mh_weight * shots_for + pp_weight * self.power_play_for / 60)
+        ateam = np.cumsum(mh_weight * shots_against + pp_weight * self.power_play_against / 60)
+
+        p = 0
+        for i in range(6, GAMES - 5):
+            f = fteam[i] - fteam[i - 5]
+            a = ateam[i] - ateam[i - 5]
+            won = games.goalsFor[i] > games.goalsAgainst[i]
+            lost = games.goalsFor[i] < games.goalsAgainst[i]
+            p += (won and f > a) or (lost and f < a)
+        return p / (GAMES - 5)
+
+    def test_extract_features_joins_penalty_columns(self):
+        """
+        Penalty features requested with the derived features are joined onto every game, on both read paths.
+        """
+        columns = ['goalsFor', 'powerPlaySecondsFor', 'powerPlaySecondsAgainst']
+        for use_matrix in [False, True]:
+            feature_matrix.USE_FEATURE_MATRIX = use_matrix
+            df = feature_matrix.extract_features('BOS.csv', columns, 2015)
+
+            self.assertEqual(list(df.columns), feature_matrix.KEY_COLUMNS + columns)
+            np.testing.assert_array_equal(df.powerPlaySecondsFor, self.power_play_for)
+            np.testing.assert_array_equal(df.powerPlaySecondsAgainst, self.power_play_against)
+
+    def test_power_play_formula(self):
+        """
+        The formula's accuracy matches a direct computation, for any weight on the power play time.
+        """
+        self.assertIn('powerPlaySecondsFor', penalty_features.PENALTY_COLUMNS)
+        for mh_weight, pp_weight in [(1, 0), (0, 1), (1, 2.5)]:
+            self.assertAlmostEqual(
+                calculate_weights.last_five_med_high_danger_power_play_formula('BOS.csv', 2015, mh_weight, pp_weight),
+                self.expected_accuracy(mh_weight, pp_weight))
+
+
+if __name__ == "__main__":
+    unittest.main()
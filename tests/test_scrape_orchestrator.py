@@ -0,0 +1,111 @@
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+
+# The modules live at the top of the repository.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import NHL_data_web_scraper as scraper
+import scrape_orchestrator
+import scraper_fixtures
+
+# Box score with two penalties in the first period and one in the first overtime period.
+BOX_SCORE = ('<html><table id="penalty"><tr><th colspan="3">1st Period</th></tr>'
+             '<tr><td>13:02</td><td>TOR</td><td>Player 1</td><td>Hooking</td><td>2 min</td></tr>'
+             '<tr><td>15:25</td><td>BOS</td><td>Player 2</td><td>Tripping</td><td>2 min</td></tr>'
+             '<tr class="thead onecell"><td>1st OT Period</td></tr>'
+             '<tr><td>1:10</td><td>BOS</td><td>Player 3</td><td>Slashing</td><td>2 min</td></tr></table></html>')
+
+# Box score of a game without penalties (hockey-reference leaves out the table).
+NO_PENALTIES = '<html><table id="scoring"></table></html>'
+
+
+def season_page(games):
+    """
+    Builds a season page listing games.
+
+    :param games: A list of (box score path, date) tuples.
+    :return: The HTML of the page.
+    """
+    rows = ''.join('<tr><th><a href="' + path + '">' + date + '</a></th></tr>' for path, date in games)
+    return '<html><table id="games">' + rows + '</table></html>'
+
+
+class ScrapeSeasonsTest(unittest.TestCase):
+    """
+    Scrapes seasons from a local server replaying a small fixture archive.
+    """
+
+    def setUp(self):
+        """
+        Writes the fixture archive and starts the server. The 2018 season has a game with penalties, a game without
+        them and a game whose box score is missing, and the 2017 season page is missing.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        archive = os.path.join(self.directory.name, scraper_fixtures.FIXTURE_ARCHIVE)
+        games = [('/boxscores/201801010BOS.html', '2018-01-01'), ('/boxscores/201801020TOR.html', '2018-01-02'),
+                 ('/boxscores/201801030BOS.html', '2018-01-03')]
+
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('leagues/NHL_2018_games.html', season_page(games))
+            z.writestr('boxscores/201801010BOS.html', BOX_SCORE)
+            z.writestr('boxscores/201801020TOR.html', NO_PENALTIES)
+
+        scraper.breakers.clear()
+        self.server, self.base_url = scraper_fixtures.serve(archive)
+
+    def tearDown(self):
+        """
+        Stops the server and removes the fixture archive.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def scrape(self, years):
+        """
+        Scrapes seasons from the local server without a request budget or saving any file.
+
+        :param years: The years the seasons end in.
+        :return: The result of scrape_seasons.
+        """
+        return scrape_orchestrator.scrape_seasons(years, self.base_url, workers=2, requests_per_minute=float('inf'),
+                                                  save=False)
+
+    def test_scrapes_penalties_of_every_game(self):
+        """
+        The penalties of every game are found, a game without a penalty table has none, and a missing box score is
+        skipped without holding the season back.
+        """
+        frames = self.scrape([2018])
+
+        self.assertEqual(list(frames), [2018])
+        penalties = frames[2018]
+        self.assertEqual(penalties.shape[0], 3)
+        self.assertEqual(list(penalties.Date.unique()), ['2018-01-01'])
+        self.assertEqual(list(penalties.Period), [1, 1, 4])
+        self.assertEqual(list(penalties.Team), ['TOR', 'BOS', 'BOS'])
+
+    def test_reports_season_without_games_page(self):
+        """
+        A season whose page of games is missing is reported as failed.
+        """
+        with self.assertRaises(RuntimeError) as raised:
+            self.scrape([2017, 2018])
+        self.assertIn('2017', str(raised.exception))
+        self.assertNotIn('2018', str(raised.exception))
+
+    def test_missing_pages_do_not_open_breaker(self):
+        """
+        Missing pages are permanent errors, so they do not count toward the host's circuit breaker.
+        """
+        for _ in range(scraper.BREAKER_THRESHOLD + 1):
+            with self.assertRaises(RuntimeError):
+                self.scrape([2017])
+        self.assertEqual(len(self.scrape([2018])[2018]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import time
+
+import numpy as np
+
+import feature_matrix
+import window_kernels
+
+teams = ['ANA', 'ARI', 'BOS', 'BUF', 'CAR', 'CBJ', 'CGY', 'CHI', 'COL', 'DAL', 'DET', 'EDM', 'FLA', 'L.A', 'MIN', 'MTL',
+         'N.J', 'NSH', 'NYI', 'NYR', 'OTT', 'PHI', 'PIT', 'S.J', 'STL', 'T.B', 'TOR', 'VAN', 'VGK', 'WPG', 'WSH']
+
+# Variables of last_five_med_high_low_danger_formula (its weights are mh_weight and -l_weight).
+FORMULA_VARIABLES = ['mediumHighDangerShots', 'lowDangerShots']
+
+# Loss functions that can be minimized: 'logistic' or 'hinge'.
+LOSS = 'logistic'
+
+# Gradient descent settings. The variables are scaled to unit variance before fitting, so one learning rate fits all.
+# Descent stops early once the largest component of the gradient is below TOLERANCE.
+LEARNING_RATE = 0.5
+ITERATIONS = 2000
+REGULARIZATION = 1e-4
+TOLERANCE = 1e-6
+
+
+def main():
+    """
+    Fits the weights of the medium/high and low danger shots formula, and of a formula using every variable with a
+    window in the feature matrix, over every team-season of the team files in the current directory. Each game is
+    predicted from the five games before it, so the printed accuracy only uses what was known before the game.
+    """
+    filepaths = [team + '.csv' for team in teams if os.path.exists(team + '.csv')]
+
+    for variables in [FORMULA_VARIABLES, feature_matrix.WINDOW_FEATURES]:
+        start = time.perf_counter()
+        samples = load_samples(filepaths, variables)
+        weights = fit(samples)
+        elapsed = time.perf_counter() - start
+
+        print('Fitted weights (' + LOSS + ' loss, ' + str(samples['x'].shape[0]) + ' games, ' +
+              str(round(elapsed, 2)) + ' s):')
+        for variable, weight in zip(variables, weights / np.abs(weights[0])):
+            print('  ' + variable + ': ' + str(round(weight, 4)))
+        print('Accuracy: ' + str(round(accuracy(samples, weights), 4)))
+        print()
+
+
+def load_samples(filepaths, variables, include_game=False):
+    """
+    Builds one sample for every game predicted by the calculate_weights formulas (see window_kernels.predicted_games):
+    the difference between the team's and its opponent's totals of each variable over the five games before the game,
+    and whether the team won or lost the game.
+
+    :param filepaths: A list of paths to MoneyPuck CSV files (team files or all_teams.csv).
+    :param variables: The variables of the formula (from feature_matrix.WINDOW_FEATURES).
+    :param include_game: Whether the windows end with the game itself instead, as in the calculate_weights formulas
+    (the game's own totals then leak its result, e.g., through goals, so this is only for comparing with them).
+    :return: A dictionary holding the sample matrix (x), the won and lost arrays and the number of games the accuracy
+    is divided by (as in the formulas, the number of games minus five in each team-season).
+    """
+    windows = [(var + 'ForLast' + str(feature_matrix.WINDOW), var + 'AgainstLast' + str(feature_matrix.WINDOW))
+               for var in variables]
+    columns = ['goalsFor', 'goalsAgainst'] + [col for window in windows for col in window]
+
+    blocks = []
+    won = []
+    lost = []
+    games = 0
+
+    for filepath in filepaths:
+        matrix = feature_matrix.load(filepath)
+        for team in matrix['teams']:
+            for season in np.unique(matrix['keys'][:, 0]):
+                df = feature_matrix.select(filepath, columns, season, team)
+                if df.shape[0] - window_kernels.WINDOW <= 0:
+                    continue
+
+                # The window ending with the previous game holds the five games before each predicted game.
+                i = window_kernels.predicted_games(df.shape[0])
+                w = i if include_game else i - 1
+                blocks.append(np.column_stack([df[f].to_numpy()[w] - df[a].to_numpy()[w] for f, a in windows]))
+                won.append(df.goalsFor.to_numpy()[i] > df.goalsAgainst.to_numpy()[i])
+                lost.append(df.goalsFor.to_numpy()[i] < df.goalsAgainst.to_numpy()[i])
+                games += df.shape[0] - window_kernels.WINDOW
+
+    if not blocks:
+        return {'x': np.zeros((0, len(variables))), 'won': np.zeros(0, bool), 'lost': np.zeros(0, bool), 'games': 0}
+    return {'x': np.vstack(blocks), 'won': np.concatenate(won), 'lost': np.concatenate(lost), 'games': games}
+
+
+def fit(samples, loss=LOSS, learning_rate=LEARNING_RATE, iterations=ITERATIONS, regularization=REGULARIZATION,
+        tolerance=TOLERANCE):
+    """
+    Learns the weights of a linear formula by gradient descent on every sample at once. A formula predicts a win when
+    the weighted total of its variable differences is positive and a loss when it is negative, so no intercept is
+    fitted. Games that were neither won nor lost are left out of the fit.
+
+    :param samples: The samples returned by load_samples.
+    :param loss: 'logistic' or 'hinge'.
+    :param learning_rate: The step size of gradient descent.
+    :param iterations: The number of gradient descent steps.
+    :param regularization: The weight of the L2 penalty (it keeps the weights finite when the games are separable).
+    :param tolerance: The gradient size below which descent stops.
+    :return: A numpy array with one weight per variable.
+    """
+    decided = np.logical_or(samples['won'], samples['lost'])
+    x = samples['x'][decided]
+    y = np.where(samples['won'][decided], 1.0, -1.0)
+    if x.shape[0] == 0:
+        return np.zeros(samples['x'].shape[1])
+
+    # Scale each variable to unit variance so that the same learning rate suits every variable.
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1
+    x = x / scale
+
+    w = np.zeros(x.shape[1])
+    for _ in range(iterations):
+        margin = y * (x @ w)
+        if loss == 'logistic':
+            slope = -y / (1 + np.exp(np.clip(margin, -500, 500)))
+        elif loss == 'hinge':
+            slope = np.where(margin < 1, -y, 0.0)
+        else:
+            raise ValueError('Unknown loss: ' + loss)
+        gradient = x.T @ slope / x.shape[0] + regularization * w
+        if np.abs(gradient).max() < tolerance:
+            break
+        w -= learning_rate * gradient
+
+    return w / scale
+
+
+def accuracy(samples, weights):
+    """
+    Calculates the percentage of games predicted correctly by a linear formula, counted the same way as the
+    calculate_weights functions (over all team-seasons together).
+
+    :param samples: The samples returned by load_samples.
+    :param weights: A numpy array with one weight per variable.
+    :return: The percentage of games predicted correctly.
+    """
+    z = samples['x'] @ weights
+    correct = np.logical_or(np.logical_and(samples['won'], z > 0), np.logical_and(samples['lost'], z < 0))
+    return int(correct.sum()) / samples['games'] if samples['games'] else np.nan
+
+
+if __name__ == "__main__":
+    main()
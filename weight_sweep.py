@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import moneypuck_schema
+
+teams = ['ANA', 'ARI', 'BOS', 'BUF', 'CAR', 'CBJ', 'CGY', 'CHI', 'COL', 'DAL', 'DET', 'EDM', 'FLA', 'L.A', 'MIN', 'MTL',
+         'N.J', 'NSH', 'NYI', 'NYR', 'OTT', 'PHI', 'PIT', 'S.J', 'STL', 'T.B', 'TOR', 'VAN', 'VGK', 'WPG', 'WSH']
+
+# Rows of the shared game array (one column per game).
+GAME_ROWS = ['goalsFor', 'goalsAgainst', 'medHighFor', 'medHighAgainst', 'lowDangerShotsFor', 'lowDangerShotsAgainst',
+             'penalityMinutesFor', 'penalityMinutesAgainst', 'shotsOnGoalFor', 'shotsOnGoalAgainst']
+
+# The formulas of calculate_weights that can be swept, and the names of their two weights.
+FORMULAS = {
+    'med_high_low_danger': ['mh_weight', 'l_weight'],
+    'med_high_danger_penalty_minutes': ['mh_weight', 'p_weight'],
+    'med_high_danger_shots_on_goal': ['s_weight', 'unused']
+}
+
+# View of the shared game array in a worker process (set by attach_games).
+shared_games = None
+
+
+def main():
+    """
+    Sweeps the same weights as calculate_weights for every team file and season, and saves the accuracies in an Excel
+    file with one sheet per swept weight.
+    """
+    filepaths = [team + '.csv' for team in teams]
+    sweeps = [('Medium High Danger Weights', 'med_high_low_danger', 0),
+              ('Low Danger Weights', 'med_high_low_danger', 1),
+              ('Penalty Minutes Weights', 'med_high_danger_penalty_minutes', 0),
+              ('Shots On Goal Weights', 'med_high_danger_shots_on_goal', 0)]
+
+    with pd.ExcelWriter('Weight Sweeps.xlsx') as writer:
+        for sheet_name, formula, varying in sweeps:
+            weights = weight_grid(varying)
+            results = sweep(filepaths, formula, weights)
+            results.columns = weights[:, varying]
+            results.to_excel(writer, sheet_name=sheet_name)
+
+
+def weight_grid(varying):
+    """
+    Returns the weights evaluated by calculate_weights: one weight goes from 0.05 to 5 in steps of 0.05 while the other
+    is held at 1.
+
+    :param varying: The index (0 or 1) of the weight that varies.
+    :return: A numpy array with one (weight, weight) row per evaluation.
+    """
+    weights = np.ones((100, 2))
+    weights[:, varying] = np.arange(5, 505, 5) / 100.0
+    return weights
+
+
+def load_games(filepaths):
+    """
+    Reads the 'all' situation rows of each team file once and lays them out as one array with a column per game. The
+    games of each team-season are contiguous and in file order, as in calculate_weights.extract_data.
+
+    :param filepaths: A list of paths to team CSV files from MoneyPuck.
+    :return: A tuple containing the game array (len(GAME_ROWS) x games) and a list of (filepath, season, start, stop)
+    segments.
+    """
+    columns = ['season', 'situation', 'goalsFor', 'goalsAgainst', 'mediumDangerShotsFor', 'mediumDangerShotsAgainst',
+               'highDangerShotsFor', 'highDangerShotsAgainst', 'lowDangerShotsFor', 'lowDangerShotsAgainst',
+               'penalityMinutesFor', 'penalityMinutesAgainst', 'shotsOnGoalFor', 'shotsOnGoalAgainst']
+    blocks = []
+    segments = []
+    start = 0
+
+    for filepath in filepaths:
+        df = moneypuck_schema.read_moneypuck(filepath, columns)
+        df = df[df.situation == 'all']
+
+        for season in pd.unique(df.season):
+            games = df[df.season == season]
+            blocks.append(np.vstack([games.goalsFor, games.goalsAgainst,
+                                     games.mediumDangerShotsFor + games.highDangerShotsFor,
+                                     games.mediumDangerShotsAgainst + games.highDangerShotsAgainst,
+                                     games.lowDangerShotsFor, games.lowDangerShotsAgainst,
+                                     games.penalityMinutesFor, games.penalityMinutesAgainst,
+                                     games.shotsOnGoalFor, games.shotsOnGoalAgainst]).astype('float64'))
+            segments.append((filepath, int(season), start, start + games.shape[0]))
+            start += games.shape[0]
+
+    if not blocks:
+        return np.zeros((len(GAME_ROWS), 0)), segments
+    return np.hstack(blocks), segments
+
+
+def sweep(filepaths, formula, weights, processes=None, loaded=None):
+    """
+    Evaluates a calculate_weights formula for every team-season and every pair of weights. The game arrays are loaded
+    once into shared memory and each worker process evaluates its slice of team-seasons on a zero-copy view of them,
+    only sending back the small array of accuracies.
+
+    :param filepaths: A list of paths to team CSV files from MoneyPuck.
+    :param formula: The name of the formula (a key of FORMULAS).
+    :param weights: A numpy array with one (weight, weight) row per evaluation (see FORMULAS for their meaning).
+    :param processes: The number of worker processes (None uses one per CPU).
+    :param loaded: The result of load_games(filepaths) if the files were already loaded (optional).
+    :return: A DataFrame of accuracies indexed by (filepath, season) with one column per row of weights.
+    """
+    games, segments = loaded if loaded is not None else load_games(filepaths)
+
+    block = shared_memory.SharedMemory(create=True, size=max(games.nbytes, 1))
+    try:
+        np.ndarray(games.shape, dtype=games.dtype, buffer=block.buf)[:] = games
+
+        # Give each worker a contiguous slice of team-seasons.
+        processes = processes or os.cpu_count()
+        slices = np.array_split(np.arange(len(segments)), processes)
+        tasks = [([segments[i][2:] for i in indices], formula, weights) for indices in slices if indices.size]
+
+        with multiprocessing.Pool(processes, initializer=attach_games, initargs=(block.name, games.shape)) as pool:
+            accuracies = pool.map(evaluate_segments, tasks)
+    finally:
+        block.close()
+        block.unlink()
+
+    index = pd.MultiIndex.from_tuples([segment[:2] for segment in segments], names=['File', 'Season'])
+    return pd.DataFrame(np.vstack(accuracies) if accuracies else np.zeros((0, len(weights))), index=index)
+
+
+def attach_games(name, shape):
+    """
+    Attaches a worker process to the shared game array.
+
+    :param name: The name of the shared memory block.
+    :param shape: The shape of the game array.
+    """
+    global shared_games
+    block = shared_memory.SharedMemory(name=name)
+    shared_games = (block, np.ndarray(shape, dtype='float64', buffer=block.buf))
+
+
+def evaluate_segments(task):
+    """
+    Evaluates a formula on a slice of team-seasons of the shared game array.
+
+    :param task: A tuple containing a list of (start, stop) segments, the formula name and the weights.
+    :return: A numpy array of accuracies (segments x weights).
+    """
+    segments, formula, weights = task
+    games = shared_games[1]
+    return np.array([formula_accuracy(games[:, start:stop], formula, weights) for start, stop in segments])
+
+
+def formula_accuracy(games, formula, weights):
+    """
+    Calculates the percentage of games (except the first five) that a formula predicted correctly, for every pair of
+    weights at once. This gives exactly the same results as the calculate_weights functions: the formula is summed
+    over the five games ending with the current one, and the count is divided by the number of games minus five.
+
+    :param games: The part of the game array (len(GAME_ROWS) x games) belonging to one team-season.
+    :param formula: The name of the formula (a key of FORMULAS).
+    :param weights: A numpy array with one (weight, weight) row per evaluation.
+    :return: A numpy array with the accuracy for each row of weights.
+    """
+    g = dict(zip(GAME_ROWS, games))
+    w1 = weights[:, :1]
+    w2 = weights[:, 1:]
+
+    # Compute the formula for each game (rows are weights, columns are games), in the same order of operations.
+    if formula == 'med_high_low_danger':
+        for_team = w1 * g['medHighFor'] - w2 * g['lowDangerShotsFor']
+        against_team = w1 * g['medHighAgainst'] - w2 * g['lowDangerShotsAgainst']
+    elif formula == 'med_high_danger_penalty_minutes':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for_team = w1 * g['medHighFor'] * g['penalityMinutesFor'] / (w2 * (g['penalityMinutesFor'] + 1.0) ** 2)
+            against_team = w1 * g['medHighAgainst'] * g['penalityMinutesAgainst'] / (
+                    w2 * (g['penalityMinutesAgainst'] + 1.0) ** 2)
+    else:
+        for_team = g['medHighFor'] - w1 * g['shotsOnGoalFor']
+        against_team = g['medHighAgainst'] - w1 * g['shotsOnGoalAgainst']
+
+    fteam = np.cumsum(for_team, axis=1)
+    ateam = np.cumsum(against_team, axis=1)
+
+    n = games.shape[1] - 5
+    if n <= 0:
+        return np.full(len(weights), np.nan)
+
+    i = np.arange(6, max(n, 6))
+    f = fteam[:, i] - fteam[:, i - 5]
+    a = ateam[:, i] - ateam[:, i - 5]
+    won = g['goalsFor'][i] > g['goalsAgainst'][i]
+    lost = g['goalsFor'][i] < g['goalsAgainst'][i]
+
+    correct = np.logical_or(np.logical_and(won, f > a), np.logical_and(lost, f < a))
+    return correct.sum(axis=1) / n
+
+
+if __name__ == "__main__":
+    main()
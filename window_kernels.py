@@ -0,0 +1,133 @@
+import numpy as np
+
+# Numba is optional. Without it the kernels fall back to NumPy implementations that give exactly the same results.
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Set to False to use the NumPy kernels even if Numba is installed.
+USE_NUMBA = numba is not None
+
+# Number of previous games in each window, and the first game predicted (as in the predictive_variables loops).
+WINDOW = 5
+FIRST_GAME = 6
+
+
+def predicted_games(num_games):
+    """
+    Returns the positions of the games that are predicted from the games before them. As in the original loops, these
+    are the games from the seventh one up to (but not including) the fifth last one.
+
+    :param num_games: The number of games in the season.
+    :return: A numpy array of game positions.
+    """
+    return np.arange(FIRST_GAME, max(num_games - WINDOW, FIRST_GAME))
+
+
+def window_totals(values):
+    """
+    Returns the total of a per-game variable over the five games ending with each predicted game (the difference of
+    two prefix sums, as in the original loops).
+
+    :param values: A numpy array with one value per game.
+    :return: A numpy array with one total per predicted game.
+    """
+    i = predicted_games(values.size)
+    totals = np.cumsum(values.astype('int64'))
+    return totals[i] - totals[i - WINDOW]
+
+
+def correct_predictions(goals_for, goals_against, predicts_win, predicts_loss):
+    """
+    Returns whether each predicted game went the way its window predicted: the team won when a win was predicted, or
+    lost when a loss was predicted.
+
+    :param goals_for: A numpy array of the team's goals in every game.
+    :param goals_against: A numpy array of the opponent's goals in every game.
+    :param predicts_win: A boolean numpy array with one entry per predicted game.
+    :param predicts_loss: A boolean numpy array with one entry per predicted game.
+    :return: A boolean numpy array with one entry per predicted game.
+    """
+    i = predicted_games(goals_for.size)
+    won = goals_for[i] > goals_against[i]
+    lost = goals_for[i] < goals_against[i]
+    return np.logical_or(np.logical_and(won, predicts_win), np.logical_and(lost, predicts_loss))
+
+
+def window_majority(goals_for, goals_against, game_for, game_against):
+    """
+    Predicts each game from the five games before it: a win if more of them favoured the team than its opponents, a
+    loss if fewer did. Uses the compiled kernel if Numba is available and enabled, and the NumPy kernel otherwise.
+
+    :param goals_for: A numpy array of the team's goals in every game.
+    :param goals_against: A numpy array of the opponent's goals in every game.
+    :param game_for: A boolean numpy array indicating whether each game favoured the team.
+    :param game_against: A boolean numpy array indicating whether each game favoured the opponents.
+    :return: A boolean numpy array indicating whether each predicted game went the predicted way.
+    """
+    if USE_NUMBA and numba is not None:
+        return compiled_majority_kernel(goals_for, goals_against, game_for, game_against)
+    return numpy_majority_kernel(goals_for, goals_against, game_for, game_against)
+
+
+def loop_majority_kernel(goals_for, goals_against, game_for, game_against):
+    """
+    The window_majority loop, written the same way as the original predictive_variables loops so that Numba can
+    compile it.
+
+    :param goals_for: A numpy array of the team's goals in every game.
+    :param goals_against: A numpy array of the opponent's goals in every game.
+    :param game_for: A boolean numpy array indicating whether each game favoured the team.
+    :param game_against: A boolean numpy array indicating whether each game favoured the opponents.
+    :return: A boolean numpy array indicating whether each predicted game went the predicted way.
+    """
+    n = goals_for.size - WINDOW
+    correct = np.zeros(max(n - FIRST_GAME, 0), dtype=np.bool_)
+
+    for i in range(FIRST_GAME, n):
+
+        success_for = 0
+        success_against = 0
+
+        for j in range(1, WINDOW + 1):
+            if game_for[i - j]:
+                success_for += 1
+            elif game_against[i - j]:
+                success_against += 1
+
+        if goals_for[i] > goals_against[i] and success_for > success_against:
+            correct[i - FIRST_GAME] = True
+        elif goals_for[i] < goals_against[i] and success_for < success_against:
+            correct[i - FIRST_GAME] = True
+
+    return correct
+
+
+def numpy_majority_kernel(goals_for, goals_against, game_for, game_against):
+    """
+    The window_majority computation in NumPy: the number of games favouring each side in the five previous games is the
+    difference of two prefix sums.
+
+    :param goals_for: A numpy array of the team's goals in every game.
+    :param goals_against: A numpy array of the opponent's goals in every game.
+    :param game_for: A boolean numpy array indicating whether each game favoured the team.
+    :param game_against: A boolean numpy array indicating whether each game favoured the opponents.
+    :return: A boolean numpy array indicating whether each predicted game went the predicted way.
+    """
+    i = predicted_games(goals_for.size)
+
+    # Games favouring the opponents only count if they did not favour the team (the elif of the loop).
+    game_against = np.logical_and(game_against, np.logical_not(game_for))
+
+    favoured_for = np.concatenate([[0], np.cumsum(game_for, dtype='int64')])
+    favoured_against = np.concatenate([[0], np.cumsum(game_against, dtype='int64')])
+    success_for = favoured_for[i] - favoured_for[i - WINDOW]
+    success_against = favoured_against[i] - favoured_against[i - WINDOW]
+
+    return correct_predictions(goals_for, goals_against, success_for > success_against,
+                               success_for < success_against)
+
+
+if numba is not None:
+    compiled_majority_kernel = numba.njit(cache=True)(loop_majority_kernel)
@@ -0,0 +1,249 @@
+import hashlib
+import importlib
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import time
+
+import result_cache
+
+# Only the standard library and result_cache are imported here. Each stage imports its own modules in the process it
+# runs in.
+
+# File the input hash of each stage's last successful run is saved in.
+STATE_FILE = 'workflow_state.json'
+
+# Number of stages that can run at the same time.
+PARALLEL_STAGES = 3
+
+teams = ['ANA', 'ARI', 'BOS', 'BUF', 'CAR', 'CBJ', 'CGY', 'CHI', 'COL', 'DAL', 'DET', 'EDM', 'FLA', 'L.A', 'MIN', 'MTL',
+         'N.J', 'NSH', 'NYI', 'NYR', 'OTT', 'PHI', 'PIT', 'S.J', 'STL', 'T.B', 'TOR', 'VAN', 'VGK', 'WPG', 'WSH']
+
+TEAM_FILES = [team + '.csv' for team in teams]
+
+# Seasons scraped from hockey-reference (the years they end in), matching the seasons analyzed since 2008-09.
+SCRAPE_YEARS = list(range(2009, 2019))
+
+# Stages of the nightly analysis. Each stage runs a function ('module.function') with its arguments, and declares the
+# data files it reads and the files it writes. A stage depends on the stages that write its inputs, and it is skipped
+# if the hash of its inputs and of its code (its module and every local module it imports) has not changed since it
+# last succeeded and its outputs still exist.
+STAGES = [
+    {'name': 'scrape', 'run': 'scrape_orchestrator.scrape_seasons', 'args': (SCRAPE_YEARS,),
+     'inputs': [],
+     'outputs': ['penalties_' + str(year) + '.csv' for year in SCRAPE_YEARS]},
+    {'name': 'team records', 'run': 'produce_team_record.save_all_data', 'args': (),
+     'inputs': ['all_teams.csv'],
+     'outputs': ['team_records.csv']},
+    {'name': 'variable totals', 'run': 'analyze_hypothesis_variables.main', 'args': (),
+     'inputs': ['all_teams.csv'],
+     'outputs': ['Produced Totals By Team.xlsx', 'Produced Totals By Year.xlsx']},
+    {'name': 'hypothesis results', 'run': 'save_hypothesis_tests.results_cube', 'args': (),
+     'inputs': ['all_teams.csv'] + TEAM_FILES,
+     'outputs': ['hypothesis_results.npy', 'hypothesis_results.json']},
+    {'name': 'hypothesis reports', 'run': 'save_hypothesis_tests.save_reports', 'args': (),
+     'inputs': ['hypothesis_results.npy', 'Hypothesis Tests.xlsx', 'all_teams.csv'],
+     'outputs': ['Produced Hypothesis Tests.xlsx', 'Produced Hypothesis Tests By Year.xlsx']},
+    {'name': 'weights', 'run': 'cross_validation.main', 'args': (),
+     'inputs': TEAM_FILES,
+     'outputs': ['Cross Validation.xlsx']}
+]
+
+USAGE = '''Usage:
+  python workflow.py [STAGE ...]   Runs the stages whose inputs have changed, and the named stages in any case.'''
+
+
+def main(args=None):
+    """
+    Runs the nightly analysis.
+
+    :param args: The command line arguments (default is sys.argv[1:]): names of stages that run even if their inputs
+    have not changed.
+    :return: The exit status (0 if every stage succeeded or was skipped).
+    """
+    args = sys.argv[1:] if args is None else args
+    names = [stage['name'] for stage in STAGES]
+    if any(arg not in names for arg in args):
+        print(USAGE)
+        print('Stages: ' + ', '.join(names))
+        return 1
+
+    results = run(STAGES, force=args)
+    return 0 if all(result['status'] in ['ran', 'skipped'] for result in results.values()) else 1
+
+
+def run(stages, force=(), parallel=PARALLEL_STAGES):
+    """
+    Runs a workflow: every stage starts in its own process as soon as the stages it depends on have finished, with up
+    to parallel stages at a time. A stage whose inputs have the same hash as when it last succeeded is skipped, and a
+    stage that depends on a failed stage is not run. A report with the time of each stage and the critical path is
+    printed at the end.
+
+    :param stages: A list of stages (see STAGES).
+    :param force: Names of stages that run even if their inputs have not changed.
+    :param parallel: The number of stages that can run at the same time.
+    :return: A dictionary with the status ('ran', 'skipped', 'failed' or 'blocked') and seconds of each stage.
+    """
+    state = load_state()
+    upstream = dependencies(stages)
+    by_name = {stage['name']: stage for stage in stages}
+
+    results = {}
+    running = {}
+    start = time.perf_counter()
+
+    while len(results) < len(stages):
+
+        # Start (or skip) the stages whose dependencies have finished.
+        for stage in stages:
+            name = stage['name']
+            if name in results or name in running or any(dep not in results for dep in upstream[name]):
+                continue
+
+            if any(results[dep]['status'] in ['failed', 'blocked'] for dep in upstream[name]):
+                results[name] = {'status': 'blocked', 'seconds': 0.0}
+                continue
+
+            digest = input_hash(stage)
+            if (name not in force and state.get(name) == digest and
+                    all(os.path.exists(output) for output in stage['outputs'])):
+                results[name] = {'status': 'skipped', 'seconds': 0.0}
+                continue
+
+            if len(running) < parallel:
+                process = multiprocessing.Process(target=run_stage, args=(stage['run'], stage['args']))
+                process.start()
+                running[name] = (process, digest, time.perf_counter())
+                print('Started ' + name)
+
+        if not running:
+            continue
+
+        # Wait for a running stage to finish.
+        finished = multiprocessing.connection.wait([process.sentinel for process, _, _ in running.values()])
+        for name in [name for name, (process, _, _) in running.items() if process.sentinel in finished]:
+            process, digest, started = running.pop(name)
+            process.join()
+            seconds = time.perf_counter() - started
+
+            if process.exitcode == 0:
+                results[name] = {'status': 'ran', 'seconds': seconds}
+                state[name] = digest
+                save_state(state)
+            else:
+                results[name] = {'status': 'failed', 'seconds': seconds}
+            print('Finished ' + name + ' (' + results[name]['status'] + ', ' + str(round(seconds, 1)) + ' s)')
+
+    report(by_name, upstream, results, time.perf_counter() - start)
+    return results
+
+
+def run_stage(target, args):
+    """
+    Runs the function of a stage (in the stage's own process).
+
+    :param target: The function as 'module.function'.
+    :param args: The arguments of the function.
+    """
+    module, function = target.rsplit('.', 1)
+    getattr(importlib.import_module(module), function)(*args)
+
+
+def dependencies(stages):
+    """
+    Finds the stages each stage depends on: the earlier stages that write one of its inputs.
+
+    :param stages: A list of stages (see STAGES).
+    :return: A dictionary with the list of names of the stages each stage depends on.
+    """
+    upstream = {}
+    for i, stage in enumerate(stages):
+        upstream[stage['name']] = [other['name'] for other in stages[:i]
+                                   if set(other['outputs']) & set(stage['inputs'])]
+    return upstream
+
+
+def input_hash(stage):
+    """
+    Returns a hash of everything a stage's result depends on: its function, its arguments, the source code of its
+    module and every local module it imports, directly or not, and the contents of its input files (missing files are
+    hashed as missing).
+
+    :param stage: A stage (see STAGES).
+    :return: A hexadecimal string.
+    """
+    parts = [stage['run'], repr(stage['args']), result_cache.code_hash([stage['run'].rsplit('.', 1)[0]])]
+    for path in stage['inputs']:
+        parts.append(path + '=' + (result_cache.file_hash(path) if os.path.exists(path) else 'missing'))
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def critical_path(upstream, results):
+    """
+    Finds the chain of dependent stages that took the longest (skipped and blocked stages take no time).
+
+    :param upstream: The dependencies of each stage (see dependencies), in the order of the stages.
+    :param results: The results of the stages (see run).
+    :return: A tuple containing the names of the stages on the path and its total seconds.
+    """
+    finish = {}
+    previous = {}
+    for name in upstream:
+        deps = upstream[name]
+        previous[name] = max(deps, key=lambda dep: finish[dep]) if deps else None
+        finish[name] = results[name]['seconds'] + (finish[previous[name]] if deps else 0.0)
+
+    name = max(finish, key=finish.get)
+    path = []
+    while name is not None:
+        path.insert(0, name)
+        name = previous[name]
+    return path, finish[path[-1]]
+
+
+def report(stages, upstream, results, wall_seconds):
+    """
+    Prints the status and time of each stage, the critical path and the total time.
+
+    :param stages: A dictionary of the stages by name.
+    :param upstream: The dependencies of each stage (see dependencies).
+    :param results: The results of the stages (see run).
+    :param wall_seconds: The time the whole workflow took.
+    """
+    print()
+    for name in stages:
+        print(name.ljust(24) + results[name]['status'].ljust(10) + str(round(results[name]['seconds'], 1)) + ' s')
+
+    path, seconds = critical_path(upstream, results)
+    total = sum(result['seconds'] for result in results.values())
+    print('Critical path: ' + ' -> '.join(path) + ' (' + str(round(seconds, 1)) + ' s)')
+    print('Total stage time: ' + str(round(total, 1)) + ' s, wall time: ' + str(round(wall_seconds, 1)) + ' s')
+
+
+def load_state():
+    """
+    Returns the input hash of each stage's last successful run.
+
+    :return: A dictionary of hashes by stage name.
+    """
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE) as f:
+        return json.load(f)
+
+
+def save_state(state):
+    """
+    Saves the input hash of each stage's last successful run.
+
+    :param state: A dictionary of hashes by stage name.
+    """
+    with open(STATE_FILE + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(STATE_FILE + '.tmp', STATE_FILE)
+
+
+if __name__ == "__main__":
+    sys.exit(main())